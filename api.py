@@ -5,13 +5,17 @@ This module provides HTTP endpoints for running KYC investigations.
 Can be deployed to Cloud Run or run locally.
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
-import os
 import sys
+import json
+import re
+import time
 import traceback
+import uuid
 from typing import Dict, Any
-from graph import create_workflow, AgentState
+from config import get_float, get_int
+from graph import get_compiled_workflow, get_analysis_agent, AgentState, format_errors
 from logger import workflow_logger
 
 app = Flask(__name__)
@@ -22,6 +26,67 @@ CORS(app)
 import logging
 logging.basicConfig(level=logging.INFO)
 
+# Compile the workflow once per worker, before the first request
+get_compiled_workflow()
+
+
+# Caller-supplied investigation IDs key the checkpoint store
+INVESTIGATION_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+def investigation_deadline() -> float:
+    """
+    Deadline for the investigation(s) of the current request.
+    
+    WORKFLOW_TIME_BUDGET seconds (default 240) from now, inside the
+    gunicorn worker timeout of 300s, so nodes degrade to partial results
+    before the worker is killed.
+    
+    Returns:
+        time.time() timestamp for AgentState["deadline"]
+    """
+    return time.time() + get_float("WORKFLOW_TIME_BUDGET", 240.0)
+
+
+def format_sse(event: str, data: Dict[str, Any]) -> str:
+    """
+    Format one Server-Sent Events message.
+    
+    Args:
+        event: Event name
+        data: JSON-serializable payload
+        
+    Returns:
+        SSE message text
+    """
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def format_node_event(node_name: str, update: Dict[str, Any]) -> str:
+    """
+    Format the SSE message for a workflow node's state update.
+    
+    Args:
+        node_name: Node that finished
+        update: State update it returned
+        
+    Returns:
+        A node event for the screening nodes, a token event with the report
+        for the report nodes, or "" for nodes without output (e.g. the join)
+    """
+    if node_name == "search_agent":
+        return format_sse("node", {"node": node_name, "result_count": len(update.get("search_results", []))})
+    if node_name == "watchlist_agent":
+        watchlist_results = update.get("watchlist_results", {})
+        return format_sse("node", {
+            "node": node_name,
+            "matched": watchlist_results.get("matched", False),
+            "match_count": len(watchlist_results.get("matches", []))
+        })
+    if update.get("final_report"):
+        return format_sse("token", {"text": update["final_report"]})
+    return ""
+
 
 @app.route('/health', methods=['GET'])
 def health():
@@ -40,19 +105,27 @@ def investigate():
     
     Request body:
     {
-        "customer_name": "John Doe"
+        "customer_name": "John Doe",
+        "investigation_id": "optional; reuse it to retry, completed steps are not re-run"
     }
     
     Response:
     {
+        "investigation_id": "...",
         "customer_name": "John Doe",
         "search_results": [...],
         "watchlist_results": {...},
         "final_report": "...",
         "risk_level": "LOW|MEDIUM|HIGH",
         "execution_time": 8.5,
-        "error": ""
+        "error": "",
+        "truncated_nodes": []
     }
+    
+    error holds the agents' error messages joined with "; " (see
+    graph.format_errors), or "" if there were none. truncated_nodes lists
+    the nodes that ran out of the WORKFLOW_TIME_BUDGET and returned partial
+    results (e.g. ["analysis_agent"] with a fallback report).
     """
     try:
         data = request.get_json()
@@ -71,17 +144,24 @@ def investigate():
         if not is_valid:
             return jsonify({"error": f"Invalid customer name: {error_msg}"}), 400
         
+        investigation_id = data.get('investigation_id') or uuid.uuid4().hex
+        if not isinstance(investigation_id, str) or not INVESTIGATION_ID_PATTERN.match(investigation_id):
+            return jsonify({"error": "investigation_id must be 1-64 letters, digits, '-' or '_'"}), 400
+        
         # Run investigation
         workflow_logger.info(f"API request received for: {customer_name}")
         
-        # Create workflow and run investigation
-        workflow = create_workflow()
+        # Run the investigation on the shared compiled workflow
+        workflow = get_compiled_workflow()
         initial_state: AgentState = {
+            "investigation_id": investigation_id,
             "customer_name": customer_name.strip(),
             "search_results": [],
             "watchlist_results": {},
             "final_report": "",
-            "error": ""
+            "risk_level": "",
+            "error": [],
+            "deadline": investigation_deadline()
         }
         
         # Start performance tracking
@@ -95,48 +175,17 @@ def investigate():
             performance_tracker.end_investigation()
             raise
         
-        # Extract risk level from report using multiple patterns
-        def extract_risk_level(report_text: str) -> str:
-            """Extract risk level from report text using multiple patterns."""
-            if not report_text:
-                return "UNKNOWN"
-            
-            import re
-            patterns = [
-                # Pattern 1: "Risk Level: LOW" (standard format)
-                (r'Risk Level[:\s]+(LOW|MEDIUM|HIGH)', re.IGNORECASE),
-                # Pattern 2: "**Risk Level:** LOW" (markdown bold)
-                (r'\*\*Risk Level\*\*[:\s]+(LOW|MEDIUM|HIGH)', re.IGNORECASE),
-                # Pattern 3: "Risk Level is LOW" or "Risk Level - LOW"
-                (r'Risk Level\s+(?:is|:|-)\s+(LOW|MEDIUM|HIGH)', re.IGNORECASE),
-                # Pattern 4: "## Risk Level" or "2. Risk Level" (section headers)
-                (r'(?:##|#|\d+\.)\s*Risk Level[^.]{0,150}?\b(LOW|MEDIUM|HIGH)\b', re.IGNORECASE | re.DOTALL),
-                # Pattern 5: Look for "LOW", "MEDIUM", or "HIGH" within 200 chars after "Risk Level"
-                (r'Risk Level[^.]{0,200}?\b(LOW|MEDIUM|HIGH)\b', re.IGNORECASE | re.DOTALL),
-                # Pattern 6: Look for risk level in "**LOW**" format near "Risk Level"
-                (r'Risk Level[^.]{0,200}?\*\*(LOW|MEDIUM|HIGH)\*\*', re.IGNORECASE | re.DOTALL),
-            ]
-            
-            for pattern, flags in patterns:
-                match = re.search(pattern, report_text, flags)
-                if match:
-                    risk = match.group(1).upper()
-                    workflow_logger.debug(f"Risk level extracted using pattern: {pattern[:50]}... -> {risk}")
-                    return risk
-            
-            # If no pattern matches, log for debugging
-            workflow_logger.warning(f"Could not extract risk level from report. Report preview: {report_text[:500]}")
-            return "UNKNOWN"
-        
-        risk_level = extract_risk_level(final_state.get("final_report", ""))
+        risk_level = final_state.get("risk_level") or "UNKNOWN"
         
         response = {
+            "investigation_id": investigation_id,
             "customer_name": final_state.get("customer_name", customer_name),
             "search_results": final_state.get("search_results", []),
             "watchlist_results": final_state.get("watchlist_results", {}),
             "final_report": final_state.get("final_report", ""),
             "risk_level": risk_level,
-            "error": final_state.get("error", "")
+            "error": format_errors(final_state.get("error")),
+            "truncated_nodes": final_state.get("truncated_nodes", [])
         }
         
         workflow_logger.info(f"API request completed for: {customer_name}, risk_level: {risk_level}")
@@ -152,15 +201,204 @@ def investigate():
         }), 500
 
 
+@app.route('/api/v1/investigate/bulk', methods=['POST'])
+def investigate_bulk():
+    """
+    Run KYC investigations for many customers.
+    
+    Searches, watchlist screening and analyses are scheduled across the
+    customers with separate concurrency limits (BULK_*_CONCURRENCY).
+    
+    Request body:
+    {
+        "customer_names": ["John Doe", "Jane Roe"]
+    }
+    
+    Response:
+    {
+        "results": [{"investigation_id", "customer_name", "search_results",
+                     "watchlist_results", "final_report", "risk_level", "error",
+                     "truncated_nodes"}, ...],
+        "stage_stats": {"customers", "seconds", "customers_per_minute",
+                        "stages": {"search": {...}, "watchlist": {...}, "analysis": {...}},
+                        "bottleneck": "analysis"}
+    }
+    
+    Invalid names do not fail the request; their result carries the error.
+    All customers share one WORKFLOW_TIME_BUDGET.
+    """
+    try:
+        data = request.get_json(silent=True)
+        if not data:
+            return jsonify({"error": "Request body is required"}), 400
+        
+        customer_names = data.get('customer_names')
+        if not customer_names or not isinstance(customer_names, list):
+            return jsonify({"error": "customer_names must be a non-empty list"}), 400
+        
+        max_customers = get_int("BULK_MAX_CUSTOMERS", 100)
+        if len(customer_names) > max_customers:
+            return jsonify({"error": f"At most {max_customers} customers per request"}), 400
+        if not all(isinstance(name, str) for name in customer_names):
+            return jsonify({"error": "customer_names must be strings"}), 400
+        
+        workflow_logger.info(f"API bulk request received for {len(customer_names)} customers")
+        
+        from bulk import BulkInvestigator
+        investigator = BulkInvestigator.from_env()
+        investigation_ids = [uuid.uuid4().hex for _ in customer_names]
+        final_states = investigator.run(customer_names, investigation_ids, deadline=investigation_deadline())
+        
+        results = [
+            {
+                "investigation_id": investigation_id,
+                "customer_name": final_state.get("customer_name", ""),
+                "search_results": final_state.get("search_results", []),
+                "watchlist_results": final_state.get("watchlist_results", {}),
+                "final_report": final_state.get("final_report", ""),
+                "risk_level": final_state.get("risk_level") or "UNKNOWN",
+                "error": format_errors(final_state.get("error")),
+                "truncated_nodes": final_state.get("truncated_nodes", [])
+            }
+            for investigation_id, final_state in zip(investigation_ids, final_states)
+        ]
+        
+        workflow_logger.info(f"API bulk request completed for {len(results)} customers")
+        
+        return jsonify({"results": results, "stage_stats": investigator.get_stage_stats()}), 200
+    
+    except Exception as e:
+        error_msg = f"Error processing bulk request: {str(e)}"
+        workflow_logger.error(f"API error: {error_msg}\n{traceback.format_exc()}")
+        return jsonify({"error": error_msg}), 500
+
+
+@app.route('/api/v1/investigate/stream', methods=['POST'])
+def investigate_stream():
+    """
+    Run KYC investigation for a customer, streaming progress as Server-Sent Events.
+    
+    Request body:
+    {
+        "customer_name": "John Doe"
+    }
+    
+    Events (each "data" is JSON):
+    - node:   {"node": "search_agent", "result_count": 9} when screening nodes finish
+              ({"node": "watchlist_agent", "matched": false, "match_count": 0})
+    - token:  {"text": "..."} report text: the analysis report section by section as
+              Gemini generates it, or the deterministic sanctions report on an
+              exact watchlist match; the texts concatenate to final_report
+    - done:   {"customer_name", "search_results", "watchlist_results", "final_report",
+               "risk_level", "error", "truncated_nodes"}
+    - error:  {"error": "..."} if the investigation fails
+    """
+    data = request.get_json(silent=True)
+    if not data:
+        return jsonify({"error": "Request body is required"}), 400
+    
+    customer_name = data.get('customer_name')
+    if not customer_name:
+        return jsonify({"error": "customer_name is required"}), 400
+    
+    from error_handling import validate_customer_name
+    is_valid, error_msg = validate_customer_name(customer_name)
+    if not is_valid:
+        return jsonify({"error": f"Invalid customer name: {error_msg}"}), 400
+    
+    workflow_logger.info(f"API stream request received for: {customer_name}")
+    
+    def generate():
+        from logger import performance_tracker
+        
+        initial_state: AgentState = {
+            "customer_name": customer_name.strip(),
+            "search_results": [],
+            "watchlist_results": {},
+            "final_report": "",
+            "risk_level": "",
+            "error": [],
+            "deadline": investigation_deadline()
+        }
+        final_state = initial_state
+        report_streamed = False
+        performance_tracker.start_investigation(customer_name)
+        try:
+            # The same workflow as /investigate; each node's update is pushed as it
+            # completes, the analysis report as it is generated ("custom" chunks),
+            # and the last "values" chunk is the final state
+            workflow = get_compiled_workflow()
+            for mode, chunk in workflow.stream(
+                initial_state,
+                config={"configurable": {"stream_report": True}},
+                stream_mode=["updates", "custom", "values"]
+            ):
+                if mode == "values":
+                    final_state = chunk
+                elif mode == "custom":
+                    report_streamed = True
+                    yield format_sse("token", {"text": chunk["text"]})
+                else:
+                    for node_name, update in chunk.items():
+                        if node_name == "analysis_agent" and report_streamed:
+                            continue
+                        event = format_node_event(node_name, update or {})
+                        if event:
+                            yield event
+            
+            risk_level = final_state.get("risk_level") or "UNKNOWN"
+            workflow_logger.info(f"API stream request completed for: {customer_name}, risk_level: {risk_level}")
+            yield format_sse("done", {
+                "customer_name": final_state.get("customer_name", customer_name),
+                "search_results": final_state.get("search_results", []),
+                "watchlist_results": final_state.get("watchlist_results", {}),
+                "final_report": final_state.get("final_report", ""),
+                "risk_level": risk_level,
+                "error": format_errors(final_state.get("error")),
+                "truncated_nodes": final_state.get("truncated_nodes", [])
+            })
+        except Exception as e:
+            error_msg = f"Error processing request: {str(e)}"
+            workflow_logger.error(f"API stream error: {error_msg}\n{traceback.format_exc()}")
+            yield format_sse("error", {"error": error_msg})
+        finally:
+            performance_tracker.end_investigation()
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @app.route('/api/v1/metrics', methods=['GET'])
 def metrics():
-    """Get service metrics."""
-    # This would typically query a metrics database
-    # For now, return basic info
+    """
+    Get service metrics.
+    
+    Response includes "graph_paths": how many investigations took each
+    workflow path (analysis, sanctions_match, invalid_input), "llm":
+    Gemini usage since the process started, with
+    histograms of input tokens, output tokens, time to first token and
+    tokens/sec, a per-endpoint breakdown and the slowest requests, and
+    "cache": the LLM response cache's hits, misses and hit ratio (null
+    with LLM_CACHE=off or before the first analysis), "fast_path": how
+    many reports skipped Gemini on the rule-based fast path, and "hedge":
+    how many Gemini calls were hedged and their p99 latency with and
+    without hedging (both null before the first analysis).
+    """
+    from logger import performance_tracker
+    analysis_agent = get_analysis_agent(build=False)
+    response_cache = analysis_agent.response_cache if analysis_agent else None
     return jsonify({
         "service": "KYC Bot",
         "version": "1.0.0",
-        "status": "operational"
+        "status": "operational",
+        "graph_paths": performance_tracker.get_graph_paths(),
+        "llm": performance_tracker.get_llm_metrics(),
+        "cache": response_cache.get_stats() if response_cache else None,
+        "fast_path": analysis_agent.get_fast_path_stats() if analysis_agent else None,
+        "hedge": analysis_agent.get_hedge_stats() if analysis_agent else None
     }), 200
 
 
@@ -176,7 +414,7 @@ def internal_error(error):
 
 if __name__ == '__main__':
     # Get port from environment variable or default to 8080
-    port = int(os.environ.get('PORT', 8080))
+    port = get_int("PORT", 8080)
     
     # Run Flask app
     app.run(host='0.0.0.0', port=port, debug=False)
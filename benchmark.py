@@ -0,0 +1,797 @@
+"""
+Benchmarks for the KYC Bot workflow.
+
+Run against recorded fixtures so no network access is needed:
+
+    REPLAY_MODE=replay python benchmark.py workflow --names "John Smith" "Vladimir Petrov" --runs 5
+
+Record the fixtures first with REPLAY_MODE=record and real API keys.
+"""
+
+import argparse
+import math
+import statistics
+import time
+from typing import Dict, List
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """
+    Nearest-rank percentile of a list of values.
+    
+    Args:
+        values: Observations
+        pct: Percentile between 0 and 100
+    
+    Returns:
+        The percentile value (0.0 for an empty list)
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = math.ceil(pct / 100 * len(ordered))
+    return ordered[max(0, min(len(ordered), rank) - 1)]
+
+
+def summarize_latencies(latencies: List[float]) -> Dict[str, float]:
+    """
+    Summarize a list of latencies in seconds.
+    
+    Args:
+        latencies: Observed latencies
+    
+    Returns:
+        Dictionary with count, mean, p50, p95, p99 and max
+    """
+    return {
+        "count": len(latencies),
+        "mean": statistics.mean(latencies) if latencies else 0.0,
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+        "max": max(latencies) if latencies else 0.0
+    }
+
+
+def print_summary(title: str, summary: Dict[str, float]):
+    """Print a latency summary on one line."""
+    print(
+        f"{title}: n={summary['count']} mean={summary['mean']:.3f}s "
+        f"p50={summary['p50']:.3f}s p95={summary['p95']:.3f}s "
+        f"p99={summary['p99']:.3f}s max={summary['max']:.3f}s"
+    )
+
+
+def bench_workflow(names: List[str], runs: int, parallel: bool = True) -> Dict[str, float]:
+    """
+    Run full investigations through the LangGraph workflow.
+    
+    Args:
+        names: Customer names to investigate
+        runs: Number of passes over the names
+        parallel: Run search and watchlist screening in parallel (the default
+                  workflow) or one after the other
+    
+    Returns:
+        Latency summary for the investigations
+    """
+    from graph import create_workflow
+    
+    workflow = create_workflow(parallel=parallel)
+    latencies = []
+    for _ in range(runs):
+        for name in names:
+            start_time = time.perf_counter()
+            workflow.invoke({
+                "customer_name": name,
+                "search_results": [],
+                "watchlist_results": {},
+                "final_report": "",
+                "risk_level": "",
+                "error": []
+            })
+            latencies.append(time.perf_counter() - start_time)
+    
+    summary = summarize_latencies(latencies)
+    print_summary(f"workflow ({'parallel' if parallel else 'sequential'} screening)", summary)
+    
+    from graph import get_analysis_agent
+    analysis_agent = get_analysis_agent()
+    hedge_stats = analysis_agent.get_hedge_stats()
+    print(
+        f"gemini hedging: {hedge_stats['hedged']}/{hedge_stats['calls']} calls hedged "
+        f"({hedge_stats['hedge_rate']:.0%}), {hedge_stats['hedge_wins']} hedge wins, "
+        f"p99 {hedge_stats['p99_latency']:.3f}s vs {hedge_stats['p99_primary_latency']:.3f}s unhedged"
+    )
+    for tier, tier_stats in analysis_agent.get_router_stats().items():
+        print(
+            f"gemini {tier} tier ({tier_stats['model']}): {tier_stats['requests']} requests, "
+            f"mean {tier_stats['mean_latency']:.3f}s, max {tier_stats['max_latency']:.3f}s, "
+            f"{tier_stats['prompt_tokens']} prompt / {tier_stats['output_tokens']} output tokens"
+        )
+    return summary
+
+
+def bench_search(
+    names: List[str],
+    runs: int,
+    concurrency: int,
+    latency: str,
+    rate_429: float,
+    rate_5xx: float
+) -> Dict[str, float]:
+    """
+    Run SearchAgent against the local stub search server.
+    
+    Measures search latency including retry_with_backoff delays caused by
+    injected 429/5xx responses.
+    
+    Args:
+        names: Customer names to search
+        runs: Number of passes over the names
+        concurrency: Number of searches in flight at once
+        latency: Stub server latency spec (see search_stub_server.parse_latency_spec)
+        rate_429: Fraction of stub responses that are HTTP 429
+        rate_5xx: Fraction of stub responses that are HTTP 503
+    
+    Returns:
+        Latency summary for the searches
+    """
+    import os
+    from concurrent.futures import ThreadPoolExecutor
+    from search_stub_server import StubSearchServer
+    
+    server = StubSearchServer(latency=latency, rate_429=rate_429, rate_5xx=rate_5xx).start()
+    os.environ["GOOGLE_SEARCH_ENDPOINT"] = server.url
+    os.environ.setdefault("GOOGLE_API_KEY", "stub")
+    os.environ.setdefault("GOOGLE_SEARCH_ENGINE_ID", "stub")
+    
+    try:
+        from agents import SearchAgent
+        agent = SearchAgent()
+        
+        def timed_search(name: str) -> float:
+            start_time = time.perf_counter()
+            agent.search_adverse_media(name)
+            return time.perf_counter() - start_time
+        
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            latencies = list(executor.map(timed_search, names * runs))
+    finally:
+        server.stop()
+    
+    summary = summarize_latencies(latencies)
+    print_summary(f"search (concurrency={concurrency})", summary)
+    stats = agent.get_search_stats()
+    print(
+        f"stub server: {server.stats['requests']} requests for {stats['api_calls']} agent calls "
+        f"({server.stats['requests'] - stats['api_calls']} retries), "
+        f"{server.stats['responses_429']} x 429, {server.stats['responses_5xx']} x 5xx"
+    )
+    return summary
+
+
+def bench_order(names: List[str], runs: int, latency: str) -> Dict[str, Dict[str, float]]:
+    """
+    Parallel screening vs watchlist-first ordering with planned queries.
+    
+    Runs the screening workflow (search and watchlist, no analysis) against
+    the local stub search server in both orderings and counts the search
+    requests the server received per investigation.
+    
+    Args:
+        names: Customer names to investigate
+        runs: Number of passes over the names per ordering
+        latency: Stub server latency spec (see search_stub_server.parse_latency_spec)
+    
+    Returns:
+        Dictionary keyed by ordering ("parallel", "watchlist_first") with the
+        latency summary plus search_calls per investigation
+    """
+    import os
+    from search_stub_server import StubSearchServer
+    
+    server = StubSearchServer(latency=latency).start()
+    os.environ["GOOGLE_SEARCH_ENDPOINT"] = server.url
+    os.environ.setdefault("GOOGLE_API_KEY", "stub")
+    os.environ.setdefault("GOOGLE_SEARCH_ENGINE_ID", "stub")
+    os.environ["CHECKPOINTS"] = "off"
+    
+    from graph import create_workflow
+    from query_planner import get_query_planner
+    
+    results = {}
+    try:
+        for ordering in ("parallel", "watchlist_first"):
+            workflow = create_workflow(watchlist_first=ordering == "watchlist_first")
+            requests_before = server.stats["requests"]
+            latencies = []
+            for _ in range(runs):
+                for name in names:
+                    start_time = time.perf_counter()
+                    # Stop at the screening join, before the analysis
+                    for update in workflow.stream({"customer_name": name, "error": []}, stream_mode="updates"):
+                        if "screening_complete" in update:
+                            break
+                    latencies.append(time.perf_counter() - start_time)
+            
+            results[ordering] = summarize_latencies(latencies)
+            results[ordering]["search_calls"] = (server.stats["requests"] - requests_before) / len(latencies)
+            print_summary(f"screening ({ordering})", results[ordering])
+            print(f"   {results[ordering]['search_calls']:.2f} search requests per investigation")
+    finally:
+        server.stop()
+    
+    print(f"query plans: {get_query_planner().get_stats()}")
+    return results
+
+
+def bench_prompt(names: List[str], budgets: List[int], runs: int) -> Dict[int, Dict[str, float]]:
+    """
+    Measure report time-to-completion against prompt size.
+    
+    Screens each name once, then generates reports under each prompt token
+    budget (ANALYSIS_PROMPT_TOKENS) with the fast path and response cache
+    disabled. Each budget produces different prompts, so record fixtures for
+    every budget before replaying.
+    
+    Args:
+        names: Customer names to investigate
+        budgets: Prompt token budgets to compare
+        runs: Number of passes over the names per budget
+    
+    Returns:
+        Latency summary (plus mean_prompt_tokens) per budget
+    """
+    import os
+    os.environ["FAST_PATH"] = "off"
+    os.environ["LLM_CACHE"] = "off"
+    from agents import SearchAgent, WatchlistAgent, AnalysisAgent
+    
+    search_agent, watchlist_agent = SearchAgent(), WatchlistAgent()
+    inputs = [(name, search_agent.search_adverse_media(name), watchlist_agent.check_watchlists(name)) for name in names]
+    
+    summaries = {}
+    for budget in budgets:
+        os.environ["ANALYSIS_PROMPT_TOKENS"] = str(budget)
+        analysis_agent = AnalysisAgent()
+        prompt_tokens, latencies = [], []
+        for _ in range(runs):
+            for name, search_results, watchlist_results in inputs:
+                _, stats = analysis_agent.prompt_builder.build(name, search_results, watchlist_results)
+                prompt_tokens.append(stats["prompt_tokens"])
+                start_time = time.perf_counter()
+                analysis_agent.generate_assessment(name, search_results, watchlist_results)
+                latencies.append(time.perf_counter() - start_time)
+        
+        summary = summarize_latencies(latencies)
+        summary["mean_prompt_tokens"] = statistics.mean(prompt_tokens)
+        print_summary(f"budget={budget} (~{summary['mean_prompt_tokens']:.0f} prompt tokens)", summary)
+        summaries[budget] = summary
+    return summaries
+
+
+def bench_batch(names: List[str], batch_max: int) -> Dict[str, float]:
+    """
+    Compare analysis throughput of per-customer and batched Gemini calls.
+    
+    Screens each name once, then generates all reports one call per customer
+    and again through AnalysisAgent.generate_reports_batch(), with the fast
+    path and response cache disabled.
+    
+    Args:
+        names: Customer names to investigate
+        batch_max: Maximum customers per batch prompt (ANALYSIS_BATCH_MAX)
+    
+    Returns:
+        Dictionary with sequential and batched customers per minute
+    """
+    import os
+    os.environ["FAST_PATH"] = "off"
+    os.environ["LLM_CACHE"] = "off"
+    os.environ["ANALYSIS_BATCH_MAX"] = str(batch_max)
+    from agents import SearchAgent, WatchlistAgent, AnalysisAgent
+    
+    search_agent, watchlist_agent = SearchAgent(), WatchlistAgent()
+    customers = [
+        {
+            "customer_name": name,
+            "search_results": search_agent.search_adverse_media(name),
+            "watchlist_results": watchlist_agent.check_watchlists(name)
+        }
+        for name in names
+    ]
+    analysis_agent = AnalysisAgent()
+    
+    start_time = time.perf_counter()
+    for customer in customers:
+        analysis_agent.generate_assessment(
+            customer["customer_name"], customer["search_results"], customer["watchlist_results"]
+        )
+    sequential_seconds = time.perf_counter() - start_time
+    
+    analysis_agent.generate_reports_batch(customers)
+    batch_stats = analysis_agent.get_batch_stats()
+    
+    results = {
+        "sequential_customers_per_minute": len(customers) * 60 / sequential_seconds if sequential_seconds else 0.0,
+        "batched_customers_per_minute": batch_stats["customers_per_minute"]
+    }
+    print(f"sequential: {len(customers)} customers, {results['sequential_customers_per_minute']:.1f} customers/minute")
+    print(
+        f"batched (max {batch_max}): {batch_stats['batches']} batches, {batch_stats['gemini_calls']} Gemini calls, "
+        f"{batch_stats['fallbacks']} fallbacks, {results['batched_customers_per_minute']:.1f} customers/minute"
+    )
+    return results
+
+
+def bench_async(names: List[str], runs: int, concurrencies: List[int]) -> Dict[int, float]:
+    """
+    Measure how the async analysis path scales with in-flight Gemini calls.
+    
+    Screens each name once, then runs all reports concurrently on one event
+    loop through AnalysisAgent.agenerate_assessment() for each
+    GEMINI_MAX_CONCURRENCY value, with the fast path and response cache
+    disabled. Use replay mode so the recorded Gemini latency is the wait.
+    
+    Args:
+        names: Customer names to investigate
+        runs: Number of reports per name
+        concurrencies: GEMINI_MAX_CONCURRENCY values to compare
+    
+    Returns:
+        Customers per minute for each concurrency
+    """
+    import asyncio
+    import os
+    os.environ["FAST_PATH"] = "off"
+    os.environ["LLM_CACHE"] = "off"
+    from agents import SearchAgent, WatchlistAgent, AnalysisAgent
+    
+    search_agent, watchlist_agent = SearchAgent(), WatchlistAgent()
+    inputs = [(name, search_agent.search_adverse_media(name), watchlist_agent.check_watchlists(name)) for name in names]
+    jobs = inputs * runs
+    
+    async def timed_assessment(agent, name, search_results, watchlist_results):
+        start_time = time.perf_counter()
+        await agent.agenerate_assessment(name, search_results, watchlist_results)
+        return time.perf_counter() - start_time
+    
+    async def run_all(agent):
+        return await asyncio.gather(*[timed_assessment(agent, *job) for job in jobs])
+    
+    throughput = {}
+    for concurrency in concurrencies:
+        os.environ["GEMINI_MAX_CONCURRENCY"] = str(concurrency)
+        analysis_agent = AnalysisAgent()
+        start_time = time.perf_counter()
+        latencies = asyncio.run(run_all(analysis_agent))
+        elapsed = time.perf_counter() - start_time
+        
+        throughput[concurrency] = len(jobs) * 60 / elapsed if elapsed else 0.0
+        print_summary(f"async (max in flight={concurrency})", summarize_latencies(latencies))
+        print(f"   {len(jobs)} reports in {elapsed:.2f}s ({throughput[concurrency]:.1f} customers/minute)")
+    return throughput
+
+
+class ResourceSampler:
+    """Context manager sampling peak resident memory and thread count in the background."""
+    
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.base_rss = 0
+        self.peak_rss = 0
+        self.peak_threads = 0
+        self._stop = None
+        self._thread = None
+    
+    @staticmethod
+    def rss() -> int:
+        """Resident set size in bytes (0 where /proc is unavailable)."""
+        try:
+            with open("/proc/self/status") as status:
+                for line in status:
+                    if line.startswith("VmRSS:"):
+                        return int(line.split()[1]) * 1024
+        except OSError:
+            pass
+        return 0
+    
+    def _sample(self):
+        import threading
+        while not self._stop.is_set():
+            self.peak_rss = max(self.peak_rss, self.rss())
+            self.peak_threads = max(self.peak_threads, threading.active_count())
+            time.sleep(self.interval)
+    
+    def __enter__(self) -> "ResourceSampler":
+        import threading
+        self.base_rss = self.peak_rss = self.rss()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+    
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+
+def bench_memory(names: List[str], inflight: int) -> Dict[str, Dict[str, float]]:
+    """
+    Compare memory per in-flight investigation between threads and async.
+    
+    Runs `inflight` investigations at once, first one thread each through
+    invoke(), then as coroutines on one event loop through ainvoke() on the
+    async workflow. tracemalloc counts Python allocations only, so resident
+    memory (which includes thread stacks) and the peak thread count are
+    sampled as well. Use replay mode so the recorded latencies keep the
+    investigations in flight together.
+    
+    Args:
+        names: Customer names, cycled to `inflight` investigations
+        inflight: Investigations in flight at once
+    
+    Returns:
+        Dictionary keyed by model ("threads", "async") with seconds,
+        python_kib and rss_kib per investigation, and peak_threads
+    """
+    import asyncio
+    import os
+    import tracemalloc
+    from concurrent.futures import ThreadPoolExecutor
+    os.environ["LLM_CACHE"] = "off"
+    os.environ["CHECKPOINTS"] = "off"
+    from graph import get_compiled_workflow
+    
+    sync_workflow = get_compiled_workflow()
+    async_workflow = get_compiled_workflow(use_async=True)
+    customers = [names[i % len(names)] for i in range(inflight)]
+    
+    def initial_state(name: str) -> Dict:
+        return {"customer_name": name, "error": []}
+    
+    def run_threads():
+        with ThreadPoolExecutor(max_workers=inflight) as executor:
+            list(executor.map(lambda name: sync_workflow.invoke(initial_state(name)), customers))
+    
+    def run_async():
+        async def run_all():
+            await asyncio.gather(*[async_workflow.ainvoke(initial_state(name)) for name in customers])
+        asyncio.run(run_all())
+    
+    # Warm up agents and lazy imports outside the measurement
+    sync_workflow.invoke(initial_state(names[0]))
+    asyncio.run(async_workflow.ainvoke(initial_state(names[0])))
+    
+    results = {}
+    for model, run in (("threads", run_threads), ("async", run_async)):
+        tracemalloc.start()
+        base_python = tracemalloc.get_traced_memory()[0]
+        start_time = time.perf_counter()
+        with ResourceSampler() as sampler:
+            run()
+        elapsed = time.perf_counter() - start_time
+        peak_python = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        
+        results[model] = {
+            "seconds": elapsed,
+            "python_kib": (peak_python - base_python) / inflight / 1024,
+            "rss_kib": (sampler.peak_rss - sampler.base_rss) / inflight / 1024,
+            "peak_threads": sampler.peak_threads
+        }
+        print(
+            f"{model}: {inflight} investigations in {elapsed:.2f}s, per investigation "
+            f"{results[model]['python_kib']:.1f} KiB Python heap, {results[model]['rss_kib']:.1f} KiB resident; "
+            f"peak {sampler.peak_threads} threads"
+        )
+    return results
+
+
+def bench_state(names: List[str], runs: int) -> Dict[str, float]:
+    """
+    Python heap allocated per investigation through the workflow.
+    
+    Each investigation runs under tracemalloc with the peak reset, so the
+    peak is what the investigation had allocated at once (state updates,
+    reducers, agent results). Use replay mode so no network I/O is measured.
+    
+    Args:
+        names: Customer names to investigate
+        runs: Number of passes over the names
+    
+    Returns:
+        Dictionary with peak_kib and retained_kib per investigation
+    """
+    import os
+    import tracemalloc
+    os.environ["LLM_CACHE"] = "off"
+    os.environ["CHECKPOINTS"] = "off"
+    from graph import get_compiled_workflow
+    
+    workflow = get_compiled_workflow()
+    # Warm up agents and lazy imports outside the measurement
+    for name in names:
+        workflow.invoke({"customer_name": name})
+    
+    peaks, retained = [], []
+    tracemalloc.start()
+    for _ in range(runs):
+        for name in names:
+            base = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            workflow.invoke({"customer_name": name})
+            current, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - base)
+            retained.append(current - base)
+    tracemalloc.stop()
+    
+    results = {
+        "peak_kib": statistics.mean(peaks) / 1024,
+        "retained_kib": statistics.mean(retained) / 1024
+    }
+    print(
+        f"state: {len(peaks)} investigations, per investigation {results['peak_kib']:.1f} KiB peak Python heap, "
+        f"{results['retained_kib']:.1f} KiB retained"
+    )
+    return results
+
+
+def bench_startup(modules: List[str], runs: int) -> Dict[str, Dict[str, float]]:
+    """
+    Cold-start import time of entry point modules.
+    
+    Each run imports the module in a fresh interpreter with `python -X
+    importtime` and reads the module's cumulative import time from the last
+    line of the trace; the interpreter's total wall time is measured too.
+    
+    Args:
+        modules: Modules to import ("main" for the CLI, "api" for a worker)
+        runs: Fresh interpreters per module
+    
+    Returns:
+        Dictionary keyed by module with median import_ms, median process_ms
+        and google_modules (Google SDK modules loaded by the import)
+    """
+    import os
+    import subprocess
+    import sys
+    
+    repo_dir = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ, GOOGLE_API_KEY=os.getenv("GOOGLE_API_KEY", "benchmark"))
+    results = {}
+    for module in modules:
+        import_times, process_times = [], []
+        google_modules = 0
+        for _ in range(runs):
+            start_time = time.perf_counter()
+            completed = subprocess.run(
+                [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                cwd=repo_dir, env=env, capture_output=True, text=True, check=True
+            )
+            process_times.append(time.perf_counter() - start_time)
+            trace = [line for line in completed.stderr.splitlines() if line.startswith("import time:")]
+            # "import time: self [us] | cumulative | imported package"; the module itself is imported last
+            import_times.append(int(trace[-1].split("|")[1]) / 1e6)
+            google_modules = sum(
+                1 for line in trace if line.split("|")[2].strip().startswith(("google.", "googleapiclient"))
+            )
+        
+        results[module] = {
+            "import_ms": statistics.median(import_times) * 1000,
+            "process_ms": statistics.median(process_times) * 1000,
+            "google_modules": google_modules
+        }
+        print(
+            f"import {module}: {results[module]['import_ms']:.0f}ms import, "
+            f"{results[module]['process_ms']:.0f}ms process (median of {runs}), "
+            f"{google_modules} Google SDK modules loaded"
+        )
+    return results
+
+
+def bench_compile(runs: int) -> Dict[str, Dict[str, float]]:
+    """
+    Per-request workflow setup: compiling a StateGraph vs the shared registry.
+    
+    Args:
+        runs: Number of workflows to obtain each way
+    
+    Returns:
+        Latency summaries keyed by "compile" and "registry"
+    """
+    from graph import create_workflow, get_compiled_workflow
+    
+    summaries = {}
+    for label, obtain in (("compile", create_workflow), ("registry", get_compiled_workflow)):
+        latencies = []
+        for _ in range(runs):
+            start_time = time.perf_counter()
+            obtain()
+            latencies.append(time.perf_counter() - start_time)
+        summaries[label] = summarize_latencies(latencies)
+        print_summary(f"workflow setup ({label})", summaries[label])
+    
+    saved = summaries["compile"]["mean"] - summaries["registry"]["mean"]
+    print(f"   {saved * 1000:.2f}ms saved per request")
+    return summaries
+
+
+def bench_checkpoint(runs: int, results: int) -> Dict[str, float]:
+    """
+    Checkpoint write overhead per node.
+    
+    Args:
+        runs: Number of checkpoints written
+        results: Search results in the checkpointed state
+    
+    Returns:
+        Latency summary of the writes
+    """
+    import os
+    import tempfile
+    from checkpoints import CheckpointStore
+    
+    search_results = [
+        {"title": f"Article {i}", "snippet": "x" * 300, "link": f"https://example.com/{i}"}
+        for i in range(results)
+    ]
+    with tempfile.TemporaryDirectory() as directory:
+        store = CheckpointStore(os.path.join(directory, "checkpoints.sqlite3"))
+        latencies = []
+        for run in range(runs):
+            start_time = time.perf_counter()
+            store.save(f"investigation-{run}", "search_agent", "John Smith", {"search_results": search_results})
+            latencies.append(time.perf_counter() - start_time)
+    
+    summary = summarize_latencies(latencies)
+    print_summary(f"checkpoint write ({results} search results)", summary)
+    return summary
+
+
+def bench_bulk(names: List[str], repeat: int, search: int, watchlist: int, analysis: int) -> Dict:
+    """
+    Compare one-by-one workflow runs with a bulk run, and watchlist screening
+    one name at a time with the batched matcher.
+    
+    Args:
+        names: Customer names
+        repeat: Copies of the names in the bulk (distinct customers per copy)
+        search: Searches in flight (BULK_SEARCH_CONCURRENCY)
+        watchlist: Watchlist batches in flight (BULK_WATCHLIST_CONCURRENCY)
+        analysis: Analysis batches in flight (BULK_ANALYSIS_CONCURRENCY)
+    
+    Returns:
+        Dictionary with sequential customers per minute, the bulk stage stats,
+        and single / batched watchlist seconds
+    """
+    from bulk import BulkInvestigator
+    from graph import get_compiled_workflow
+    from tools import check_watchlist, check_watchlist_batch
+    
+    customers = [name if copy == 0 else f"{name} {copy}" for copy in range(repeat) for name in names]
+    
+    start_time = time.perf_counter()
+    for name in customers:
+        check_watchlist(name)
+    single_seconds = time.perf_counter() - start_time
+    start_time = time.perf_counter()
+    check_watchlist_batch(customers)
+    batch_seconds = time.perf_counter() - start_time
+    print(f"watchlist: {len(customers)} names one by one {single_seconds * 1000:.1f}ms, batched {batch_seconds * 1000:.1f}ms")
+    
+    workflow = get_compiled_workflow()
+    start_time = time.perf_counter()
+    for name in customers:
+        workflow.invoke({"customer_name": name, "error": []})
+    sequential_seconds = time.perf_counter() - start_time
+    sequential_rate = len(customers) * 60 / sequential_seconds if sequential_seconds else 0.0
+    print(f"one by one: {len(customers)} customers, {sequential_rate:.1f} customers/minute")
+    
+    investigator = BulkInvestigator(search, watchlist, analysis)
+    investigator.run(customers)
+    stats = investigator.get_stage_stats()
+    print(f"bulk: {len(customers)} customers, {stats['customers_per_minute']:.1f} customers/minute")
+    
+    return {
+        "sequential_customers_per_minute": sequential_rate,
+        "bulk": stats,
+        "watchlist_single_seconds": single_seconds,
+        "watchlist_batch_seconds": batch_seconds
+    }
+
+
+def main():
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="KYC Bot benchmarks")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    
+    workflow_parser = subparsers.add_parser("workflow", help="End-to-end investigation latency")
+    workflow_parser.add_argument("--names", nargs="+", default=["John Smith"], help="Customer names")
+    workflow_parser.add_argument("--runs", type=int, default=3, help="Passes over the names")
+    workflow_parser.add_argument("--sequential", action="store_true", help="Run search and watchlist screening one after the other")
+    
+    search_parser = subparsers.add_parser("search", help="SearchAgent against the local stub search server")
+    search_parser.add_argument("--names", nargs="+", default=["John Smith"], help="Customer names")
+    search_parser.add_argument("--runs", type=int, default=10, help="Passes over the names")
+    search_parser.add_argument("--concurrency", type=int, default=4, help="Searches in flight")
+    search_parser.add_argument("--latency", default="lognormal:0.3,0.4", help="Stub latency spec")
+    search_parser.add_argument("--rate-429", type=float, default=0.0, help="Fraction of 429 responses")
+    search_parser.add_argument("--rate-5xx", type=float, default=0.0, help="Fraction of 503 responses")
+    
+    order_parser = subparsers.add_parser("order", help="Parallel screening vs watchlist-first planned search")
+    order_parser.add_argument("--names", nargs="+", default=["John Smith", "Vladimir Petrov"], help="Customer names")
+    order_parser.add_argument("--runs", type=int, default=10, help="Passes over the names per ordering")
+    order_parser.add_argument("--latency", default="lognormal:0.3,0.4", help="Stub latency spec")
+    
+    prompt_parser = subparsers.add_parser("prompt", help="Report latency against prompt token budget")
+    prompt_parser.add_argument("--names", nargs="+", default=["John Smith"], help="Customer names")
+    prompt_parser.add_argument("--budgets", nargs="+", type=int, default=[400, 1000, 2000], help="Prompt token budgets")
+    prompt_parser.add_argument("--runs", type=int, default=3, help="Passes over the names per budget")
+    
+    batch_parser = subparsers.add_parser("batch", help="Per-customer vs batched analysis throughput")
+    batch_parser.add_argument("--names", nargs="+", default=["John Smith", "Vladimir Petrov"], help="Customer names")
+    batch_parser.add_argument("--batch-max", type=int, default=8, help="Maximum customers per batch prompt")
+    
+    async_parser = subparsers.add_parser("async", help="Async analysis throughput against in-flight call limit")
+    async_parser.add_argument("--names", nargs="+", default=["John Smith", "Vladimir Petrov"], help="Customer names")
+    async_parser.add_argument("--runs", type=int, default=8, help="Reports per name")
+    async_parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 4, 16], help="GEMINI_MAX_CONCURRENCY values")
+    
+    compile_parser = subparsers.add_parser("compile", help="Per-request workflow compile vs shared compiled workflow")
+    compile_parser.add_argument("--runs", type=int, default=200, help="Workflows obtained each way")
+    
+    checkpoint_parser = subparsers.add_parser("checkpoint", help="Checkpoint write overhead per node")
+    checkpoint_parser.add_argument("--runs", type=int, default=200, help="Checkpoints written")
+    checkpoint_parser.add_argument("--results", type=int, default=10, help="Search results in the checkpointed state")
+    
+    memory_parser = subparsers.add_parser("memory", help="Memory per in-flight investigation, threads vs async")
+    memory_parser.add_argument("--names", nargs="+", default=["John Smith", "Vladimir Petrov"], help="Customer names")
+    memory_parser.add_argument("--inflight", type=int, default=200, help="Investigations in flight at once")
+    
+    state_parser = subparsers.add_parser("state", help="Python heap allocated per investigation")
+    state_parser.add_argument("--names", nargs="+", default=["John Smith", "Vladimir Petrov"], help="Customer names")
+    state_parser.add_argument("--runs", type=int, default=20, help="Passes over the names")
+    
+    startup_parser = subparsers.add_parser("startup", help="Cold-start import time of the CLI and API worker")
+    startup_parser.add_argument("--modules", nargs="+", default=["main", "api"], help="Modules to import")
+    startup_parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per module")
+    
+    bulk_parser = subparsers.add_parser("bulk", help="One-by-one vs bulk investigation throughput per stage")
+    bulk_parser.add_argument("--names", nargs="+", default=["John Smith", "Vladimir Petrov"], help="Customer names")
+    bulk_parser.add_argument("--repeat", type=int, default=10, help="Copies of the names")
+    bulk_parser.add_argument("--search-concurrency", type=int, default=4, help="Searches in flight")
+    bulk_parser.add_argument("--watchlist-concurrency", type=int, default=1, help="Watchlist batches in flight")
+    bulk_parser.add_argument("--analysis-concurrency", type=int, default=4, help="Analysis batches in flight")
+    
+    args = parser.parse_args()
+    
+    if args.command == "workflow":
+        bench_workflow(args.names, args.runs, parallel=not args.sequential)
+    elif args.command == "search":
+        bench_search(args.names, args.runs, args.concurrency, args.latency, args.rate_429, args.rate_5xx)
+    elif args.command == "order":
+        bench_order(args.names, args.runs, args.latency)
+    elif args.command == "prompt":
+        bench_prompt(args.names, args.budgets, args.runs)
+    elif args.command == "batch":
+        bench_batch(args.names, args.batch_max)
+    elif args.command == "async":
+        bench_async(args.names, args.runs, args.concurrency)
+    elif args.command == "compile":
+        bench_compile(args.runs)
+    elif args.command == "checkpoint":
+        bench_checkpoint(args.runs, args.results)
+    elif args.command == "memory":
+        bench_memory(args.names, args.inflight)
+    elif args.command == "state":
+        bench_state(args.names, args.runs)
+    elif args.command == "startup":
+        bench_startup(args.modules, args.runs)
+    elif args.command == "bulk":
+        bench_bulk(args.names, args.repeat, args.search_concurrency, args.watchlist_concurrency, args.analysis_concurrency)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+"""
+Bulk investigations: many customers through the workflow stages at once.
+
+Each customer goes through the same nodes, routing, state reducers and
+checkpoints as the LangGraph workflow (graph.py), including its ordering
+(WATCHLIST_FIRST), but the stages are scheduled across customers with their
+own concurrency limits: adverse media searches run in one thread pool,
+watchlist screening runs batched (graph.watchlist_batch_node), and analysis
+runs batched (graph.analysis_batch_node) as customers finish screening, in
+a second pool. Throughput is measured per stage so the bottleneck is visible.
+
+Controlled by environment variables:
+- BULK_SEARCH_CONCURRENCY: searches in flight (default 4)
+- BULK_WATCHLIST_CONCURRENCY: watchlist batches in flight (default 1)
+- BULK_ANALYSIS_CONCURRENCY: analysis batches in flight (default 4)
+- BULK_ANALYSIS_BATCH_SIZE: customers per analysis batch (default 8)
+- BULK_MAX_CUSTOMERS: most customers per bulk API request (default 100)
+- WATCHLIST_FIRST: screen first and plan the searches (see graph.py)
+"""
+
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, List, Optional
+
+from config import get_int
+from checkpoints import checkpointed, checkpointed_batch
+from graph import (
+    AgentState, search_node, planned_search_node, watchlist_batch_node, analysis_batch_node,
+    invalid_input_node, sanctions_report_node, route_input, route_after_screening, apply_update,
+    watchlist_first_enabled
+)
+from logger import workflow_logger
+
+STAGES = ("search", "watchlist", "analysis")
+
+
+class StageStats:
+    """Thread-safe timing of one stage across customers."""
+    
+    def __init__(self, concurrency: int):
+        self.concurrency = concurrency
+        self.items = 0
+        self.item_seconds = 0.0
+        self.first_start: Optional[float] = None
+        self.last_end: Optional[float] = None
+        self._lock = threading.Lock()
+    
+    def record(self, start_time: float, end_time: float, items: int = 1):
+        """Record items processed between start_time and end_time (time.monotonic())."""
+        with self._lock:
+            self.items += items
+            self.item_seconds += end_time - start_time
+            self.first_start = start_time if self.first_start is None else min(self.first_start, start_time)
+            self.last_end = end_time if self.last_end is None else max(self.last_end, end_time)
+    
+    def snapshot(self) -> Dict[str, float]:
+        """
+        Get the stage statistics.
+        
+        Returns:
+            Dictionary with concurrency, items, seconds (first start to last
+            end), items_per_minute and mean_latency (per call)
+        """
+        with self._lock:
+            seconds = self.last_end - self.first_start if self.items else 0.0
+            return {
+                "concurrency": self.concurrency,
+                "items": self.items,
+                "seconds": seconds,
+                "items_per_minute": self.items * 60 / seconds if seconds else 0.0,
+                "mean_latency": self.item_seconds / self.items if self.items else 0.0
+            }
+
+
+class BulkInvestigator:
+    """Run many investigations with per-stage concurrency limits."""
+    
+    def __init__(
+        self,
+        search_concurrency: int = 4,
+        watchlist_concurrency: int = 1,
+        analysis_concurrency: int = 4,
+        analysis_batch_size: int = 8,
+        watchlist_first: Optional[bool] = None
+    ):
+        """
+        Initialize the investigator.
+        
+        Args:
+            search_concurrency: Searches in flight
+            watchlist_concurrency: Watchlist batches in flight (customers are
+                                   split into this many batches)
+            analysis_concurrency: Analysis batches in flight
+            analysis_batch_size: Customers per analysis batch; a batch starts
+                                 when this many have finished screening, or
+                                 when screening is over
+            watchlist_first: Screen first and plan each search from the
+                             watchlist result, as create_workflow(watchlist_first=True);
+                             defaults to the WATCHLIST_FIRST environment variable
+        """
+        self.search_concurrency = search_concurrency
+        self.watchlist_concurrency = watchlist_concurrency
+        self.analysis_concurrency = analysis_concurrency
+        self.analysis_batch_size = max(1, analysis_batch_size)
+        self.watchlist_first = watchlist_first_enabled() if watchlist_first is None else watchlist_first
+        self.stage_stats: Dict[str, StageStats] = {}
+        self.total_seconds = 0.0
+    
+    @classmethod
+    def from_env(cls) -> "BulkInvestigator":
+        """Create an investigator from the BULK_* and WATCHLIST_FIRST environment variables."""
+        return cls(
+            search_concurrency=get_int("BULK_SEARCH_CONCURRENCY", 4),
+            watchlist_concurrency=get_int("BULK_WATCHLIST_CONCURRENCY", 1),
+            analysis_concurrency=get_int("BULK_ANALYSIS_CONCURRENCY", 4),
+            analysis_batch_size=get_int("BULK_ANALYSIS_BATCH_SIZE", 8)
+        )
+    
+    def _timed(self, stage: str, batch_node: Callable, states: List[AgentState]) -> List[AgentState]:
+        start_time = time.monotonic()
+        try:
+            return batch_node(states)
+        finally:
+            self.stage_stats[stage].record(start_time, time.monotonic(), items=len(states))
+    
+    def run(
+        self,
+        customer_names: List[str],
+        investigation_ids: Optional[List[str]] = None,
+        deadline: Optional[float] = None
+    ) -> List[AgentState]:
+        """
+        Investigate many customers.
+        
+        Args:
+            customer_names: Customers to investigate
+            investigation_ids: Optional investigation ID per customer, to
+                               checkpoint and resume like single investigations
+            deadline: Optional time.time() deadline shared by all customers
+                      (see AgentState); nodes past it return partial results
+        
+        Returns:
+            Final state per customer, in order
+        """
+        start_time = time.monotonic()
+        self.stage_stats = {
+            "search": StageStats(self.search_concurrency),
+            "watchlist": StageStats(self.watchlist_concurrency),
+            "analysis": StageStats(self.analysis_concurrency)
+        }
+        
+        states: List[AgentState] = []
+        for position, customer_name in enumerate(customer_names):
+            state: AgentState = {
+                "customer_name": (customer_name or "").strip(),
+                "search_results": [],
+                "watchlist_results": {},
+                "final_report": "",
+                "risk_level": "",
+                "error": [],
+                "truncated_nodes": []
+            }
+            if deadline:
+                state["deadline"] = deadline
+            if investigation_ids and investigation_ids[position]:
+                state["investigation_id"] = investigation_ids[position]
+            states.append(state)
+        
+        # Invalid names end at once, as in the workflow
+        valid = []
+        for index, state in enumerate(states):
+            if route_input(state, watchlist_first=self.watchlist_first) == "invalid_input":
+                states[index] = apply_update(state, invalid_input_node(state))
+            else:
+                valid.append(index)
+        
+        # The workflow's nodes, as batch nodes (one update per state)
+        search = checkpointed("search_agent", planned_search_node if self.watchlist_first else search_node)
+        stages = {
+            "search": lambda batch: [search(batch[0])],
+            "watchlist": checkpointed_batch("watchlist_agent", watchlist_batch_node),
+            "analysis": checkpointed_batch("analysis_agent", analysis_batch_node)
+        }
+        # Screening steps left per customer: the search after the watchlist
+        # when watchlist-first, otherwise both in parallel
+        steps_left = {index: 2 for index in valid}
+        ready: List[int] = []
+        
+        with ThreadPoolExecutor(max_workers=self.search_concurrency, thread_name_prefix="bulk-search") as search_pool, \
+             ThreadPoolExecutor(max_workers=self.watchlist_concurrency, thread_name_prefix="bulk-watchlist") as watchlist_pool, \
+             ThreadPoolExecutor(max_workers=self.analysis_concurrency, thread_name_prefix="bulk-analysis") as analysis_pool:
+            pools = {"search": search_pool, "watchlist": watchlist_pool, "analysis": analysis_pool}
+            running = {}
+            
+            def submit(stage: str, indices: List[int]):
+                future = pools[stage].submit(self._timed, stage, stages[stage], [dict(states[index]) for index in indices])
+                running[future] = (stage, indices)
+            
+            chunk_count = max(1, min(self.watchlist_concurrency, len(valid)))
+            for chunk in (valid[start::chunk_count] for start in range(chunk_count)):
+                if chunk:
+                    submit("watchlist", chunk)
+            if not self.watchlist_first:
+                for index in valid:
+                    submit("search", [index])
+            
+            while running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stage, indices = running.pop(future)
+                    for index, update in zip(indices, future.result()):
+                        states[index] = apply_update(states[index], update)
+                        if stage == "analysis":
+                            continue
+                        steps_left[index] -= 1
+                        if stage == "watchlist" and self.watchlist_first:
+                            submit("search", [index])
+                        elif steps_left[index] == 0:
+                            # Screening done: exit early on an exact match, as the workflow does
+                            if route_after_screening(states[index]) == "sanctions_report":
+                                states[index] = apply_update(states[index], sanctions_report_node(states[index]))
+                            else:
+                                ready.append(index)
+                
+                screening = any(stage != "analysis" for stage, _ in running.values())
+                while len(ready) >= self.analysis_batch_size or (ready and not screening):
+                    submit("analysis", ready[:self.analysis_batch_size])
+                    ready = ready[self.analysis_batch_size:]
+        
+        self.total_seconds = time.monotonic() - start_time
+        self._report(len(states))
+        return states
+    
+    def get_stage_stats(self) -> Dict:
+        """
+        Get per-stage throughput of the last run.
+        
+        Returns:
+            Dictionary with customers, seconds, customers_per_minute, one
+            StageStats.snapshot() per stage under "stages", and "bottleneck":
+            the stage that was busy longest
+        """
+        stages = {stage: stats.snapshot() for stage, stats in self.stage_stats.items()}
+        customers = max((stats["items"] for stats in stages.values()), default=0)
+        busy = {stage: stats["seconds"] for stage, stats in stages.items() if stats["items"]}
+        return {
+            "customers": customers,
+            "seconds": self.total_seconds,
+            "customers_per_minute": customers * 60 / self.total_seconds if self.total_seconds else 0.0,
+            "stages": stages,
+            "bottleneck": max(busy, key=busy.get) if busy else None
+        }
+    
+    def _report(self, customers: int):
+        """Log and print per-stage throughput of the last run."""
+        stats = self.get_stage_stats()
+        print(f"[+] Bulk investigation: {customers} customers in {self.total_seconds:.2f}s")
+        for stage in STAGES:
+            stage_stats = stats["stages"][stage]
+            line = (
+                f"{stage}: {stage_stats['items']} items in {stage_stats['seconds']:.2f}s "
+                f"({stage_stats['items_per_minute']:.1f}/minute, {stage_stats['mean_latency']:.2f}s per call, "
+                f"concurrency {stage_stats['concurrency']})"
+            )
+            workflow_logger.info(f"Bulk stage {line}")
+            print(f"   {line}")
+        if stats["bottleneck"]:
+            workflow_logger.info(f"Bulk bottleneck stage: {stats['bottleneck']}")
+            print(f"   Bottleneck: {stats['bottleneck']}")
@@ -0,0 +1,338 @@
+"""
+SQLite checkpoints for resumable investigations.
+
+After each agent node succeeds, its state update is written under the
+investigation ID together with the (normalized) customer name. Running the
+same investigation ID for the same customer again replays the saved updates
+instead of re-running those nodes, so a retry after a failed or timed-out
+analysis does not pay for the search again. A checkpoint saved for another
+customer under the same ID is a miss: the node runs and replaces it.
+
+Updates that report an error, were truncated by the time budget, are a
+search that fell back to simulated results after an API error, or are an
+analysis that fell back to an UNKNOWN risk level, are not saved: the node
+runs again on the next attempt.
+
+Controlled by environment variables:
+- CHECKPOINTS: "on" (default) or "off"
+- CHECKPOINT_PATH: SQLite file (default: .cache/checkpoints.sqlite3)
+- CHECKPOINT_TTL: checkpoint lifetime in seconds (default: 86400)
+- CHECKPOINT_PURGE_EVERY: expired checkpoints are deleted at startup and
+  after every this many writes (default: 500)
+"""
+
+import inspect
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+from config import get_env, get_flag, get_float, get_int
+from tools import normalize_name, search_failed
+
+logger = logging.getLogger('kyc_bot.checkpoints')
+
+DEFAULT_CHECKPOINT_PATH = os.path.join(os.path.dirname(__file__), '.cache', 'checkpoints.sqlite3')
+
+
+def is_successful(update: Dict[str, Any]) -> bool:
+    """
+    Check whether a node's state update is worth keeping.
+    
+    Args:
+        update: State update returned by a node
+    
+    Returns:
+        False if the update carries an error, was truncated by the time
+        budget (partial results), holds search results standing in for a
+        failed search or has an UNKNOWN risk level
+    """
+    return (
+        not update.get("error") and not update.get("truncated_nodes")
+        and not search_failed(update.get("search_results", []))
+        and update.get("risk_level") != "UNKNOWN"
+    )
+
+
+class CheckpointStore:
+    """
+    Per-node checkpoints of investigations in a SQLite file.
+    
+    Thread-safe: every operation uses its own short-lived connection.
+    """
+    
+    def __init__(self, path: str = DEFAULT_CHECKPOINT_PATH, ttl: float = 86400, purge_every: int = 500):
+        """
+        Initialize the store.
+        
+        Args:
+            path: SQLite file
+            ttl: Checkpoint lifetime in seconds
+            purge_every: Delete expired checkpoints after this many writes, so
+                         a long-lived worker's file stays bounded by the TTL
+        """
+        self.path = path
+        self.ttl = ttl
+        self.purge_every = purge_every
+        self._writes_since_purge = 0
+        self._lock = threading.Lock()
+        self._write_latencies = deque(maxlen=1000)
+        self.stats = {"writes": 0, "skipped_failures": 0, "resumed_nodes": 0, "customer_mismatches": 0}
+        self._init_db()
+    
+    @contextmanager
+    def _connect(self):
+        """Open a short-lived connection that commits and closes on exit."""
+        conn = sqlite3.connect(self.path, timeout=5)
+        # WAL keeps commits to one sequential append instead of a journal rewrite
+        conn.execute("PRAGMA synchronous=NORMAL")
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+    
+    def _init_db(self):
+        """Create the table and purge expired checkpoints."""
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(checkpoints)")}
+            if columns and "customer_key" not in columns:
+                # Checkpoints written without the customer cannot be trusted on resume
+                conn.execute("DROP TABLE checkpoints")
+                logger.info("Dropped checkpoints saved without a customer name")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS checkpoints ("
+                "investigation_id TEXT, node TEXT, customer_key TEXT, update_json TEXT, created_at REAL, "
+                "PRIMARY KEY (investigation_id, node))"
+            )
+        self.purge()
+    
+    def purge(self) -> int:
+        """
+        Delete expired checkpoints.
+        
+        Returns:
+            Number of checkpoints deleted
+        """
+        with self._connect() as conn:
+            purged = conn.execute(
+                "DELETE FROM checkpoints WHERE created_at < ?", (time.time() - self.ttl,)
+            ).rowcount
+        if purged:
+            logger.info(f"Purged {purged} expired checkpoint(s)")
+        return purged
+    
+    def save(self, investigation_id: str, node: str, customer_name: str, update: Dict[str, Any]):
+        """
+        Save a node's state update.
+        
+        Args:
+            investigation_id: Investigation the node ran for
+            node: Node name
+            customer_name: Customer the node ran for
+            update: State update the node returned
+        """
+        start_time = time.perf_counter()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO checkpoints "
+                "(investigation_id, node, customer_key, update_json, created_at) VALUES (?, ?, ?, ?, ?)",
+                (investigation_id, node, normalize_name(customer_name), json.dumps(update), time.time())
+            )
+        latency = time.perf_counter() - start_time
+        with self._lock:
+            self.stats["writes"] += 1
+            self._write_latencies.append(latency)
+            self._writes_since_purge += 1
+            purge_due = self._writes_since_purge >= self.purge_every
+            if purge_due:
+                self._writes_since_purge = 0
+        logger.debug(f"Checkpoint saved: {investigation_id}/{node} ({latency * 1000:.2f}ms)")
+        if purge_due:
+            self.purge()
+    
+    def get(self, investigation_id: str, node: str, customer_name: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up a node's saved state update.
+        
+        Args:
+            investigation_id: Investigation ID
+            node: Node name
+            customer_name: Customer being investigated
+        
+        Returns:
+            The saved update, or None if the node has not completed (or
+            expired) or the checkpoint belongs to another customer
+        """
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT customer_key, update_json, created_at FROM checkpoints "
+                "WHERE investigation_id = ? AND node = ?",
+                (investigation_id, node)
+            ).fetchone()
+        if not row or time.time() - row[2] >= self.ttl:
+            return None
+        if row[0] != normalize_name(customer_name):
+            self.record("customer_mismatches")
+            logger.warning(f"Checkpoint {investigation_id}/{node} belongs to another customer, ignoring it")
+            return None
+        return json.loads(row[1])
+    
+    def delete(self, investigation_id: str):
+        """Remove all checkpoints of an investigation."""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM checkpoints WHERE investigation_id = ?", (investigation_id,))
+    
+    def record(self, key: str):
+        """Count a resumed node or a skipped failed update."""
+        with self._lock:
+            self.stats[key] += 1
+    
+    def get_stats(self) -> Dict:
+        """
+        Get checkpoint counters and write overhead.
+        
+        Returns:
+            Dictionary with writes, skipped_failures, resumed_nodes,
+            customer_mismatches and mean_write_ms / max_write_ms
+        """
+        with self._lock:
+            stats = dict(self.stats)
+            latencies = list(self._write_latencies)
+        stats["mean_write_ms"] = sum(latencies) / len(latencies) * 1000 if latencies else 0.0
+        stats["max_write_ms"] = max(latencies, default=0.0) * 1000
+        return stats
+
+
+_store: Optional[CheckpointStore] = None
+_store_lock = threading.Lock()
+
+
+def get_checkpoint_store() -> Optional[CheckpointStore]:
+    """
+    Lazy initialization of the process-wide checkpoint store from the environment.
+    
+    Returns:
+        The CheckpointStore, or None when CHECKPOINTS=off
+    """
+    global _store
+    if not get_flag("CHECKPOINTS", True):
+        return None
+    path = get_env("CHECKPOINT_PATH", DEFAULT_CHECKPOINT_PATH)
+    ttl = get_float("CHECKPOINT_TTL", 86400.0)
+    purge_every = get_int("CHECKPOINT_PURGE_EVERY", 500)
+    with _store_lock:
+        if _store is None or _store.path != path or _store.ttl != ttl or _store.purge_every != purge_every:
+            _store = CheckpointStore(path, ttl=ttl, purge_every=purge_every)
+        return _store
+
+
+def _resume(node_name: str, state: Dict[str, Any]):
+    # (store, saved update) for this node; store is None when not checkpointing
+    investigation_id = state.get("investigation_id")
+    store = get_checkpoint_store() if investigation_id else None
+    if store is None:
+        return None, None
+    
+    saved_update = store.get(investigation_id, node_name, state.get("customer_name", ""))
+    if saved_update is not None:
+        store.record("resumed_nodes")
+        logger.info(f"Resuming {investigation_id}: {node_name} restored from checkpoint")
+    return store, saved_update
+
+
+def _save(node_name: str, store: CheckpointStore, state: Dict[str, Any], update: Dict[str, Any]):
+    if is_successful(update):
+        store.save(state["investigation_id"], node_name, state.get("customer_name", ""), update)
+    else:
+        store.record("skipped_failures")
+
+
+def checkpointed(node_name: str, node: Callable[[Dict[str, Any]], Dict[str, Any]]) -> Callable[[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Wrap a LangGraph node so its successful update is checkpointed.
+    
+    States without an investigation_id, or CHECKPOINTS=off, run the node
+    unchanged. Async nodes get an async wrapper (the SQLite reads and writes
+    take about a millisecond and run inline).
+    
+    Args:
+        node_name: Node name, part of the checkpoint key
+        node: The node function
+    
+    Returns:
+        Node function that resumes from or writes a checkpoint
+    """
+    if inspect.iscoroutinefunction(node):
+        async def run(state: Dict[str, Any]) -> Dict[str, Any]:
+            store, saved_update = _resume(node_name, state)
+            if store is None:
+                return await node(state)
+            if saved_update is not None:
+                return saved_update
+            
+            update = await node(state)
+            _save(node_name, store, state, update)
+            return update
+    else:
+        def run(state: Dict[str, Any]) -> Dict[str, Any]:
+            store, saved_update = _resume(node_name, state)
+            if store is None:
+                return node(state)
+            if saved_update is not None:
+                return saved_update
+            
+            update = node(state)
+            _save(node_name, store, state, update)
+            return update
+    
+    run.__name__ = getattr(node, "__name__", node_name)
+    run.__doc__ = node.__doc__
+    return run
+
+
+def checkpointed_batch(
+    node_name: str,
+    batch_node: Callable[[List[Dict[str, Any]]], List[Dict[str, Any]]]
+) -> Callable[[List[Dict[str, Any]]], List[Dict[str, Any]]]:
+    """
+    Wrap a batch node (one update per state, in order) like checkpointed().
+    
+    Each state resumes from its own checkpoint under node_name, so batch and
+    single runs of an investigation share checkpoints; the batch node runs
+    only for the states without one.
+    
+    Args:
+        node_name: Node name, part of the checkpoint key
+        batch_node: The batch node function
+    
+    Returns:
+        Batch node function that resumes from or writes checkpoints
+    """
+    def run(states: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        updates: List[Optional[Dict[str, Any]]] = [None] * len(states)
+        pending = []
+        for position, state in enumerate(states):
+            store, saved_update = _resume(node_name, state)
+            if saved_update is not None:
+                updates[position] = saved_update
+            else:
+                pending.append((position, store))
+        
+        if pending:
+            for (position, store), update in zip(pending, batch_node([states[position] for position, _ in pending])):
+                if store is not None:
+                    _save(node_name, store, states[position], update)
+                updates[position] = update
+        return updates
+    
+    run.__name__ = getattr(batch_node, "__name__", node_name)
+    run.__doc__ = batch_node.__doc__
+    return run
@@ -0,0 +1,127 @@
+"""
+Environment configuration for the KYC Bot.
+
+Settings are environment variables. A .env file next to this module (or,
+failing that, in the working directory) is loaded into os.environ once per
+process, the first time load_env() runs; .env values take precedence over
+variables already set, as before. Components still read their own variables
+(e.g. ModelRouter.from_env()), through get_env() and the typed get_flag(),
+get_int() and get_float(), which run load_env() first.
+"""
+
+import os
+import threading
+from typing import Optional
+
+ENV_PATHS = (
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '.env'),  # Relative to this file
+    os.path.join(os.getcwd(), '.env')  # Current working directory
+)
+
+# On/off settings: anything else (or unset) keeps the setting's default
+TRUE_VALUES = ("on", "true", "1", "yes")
+FALSE_VALUES = ("off", "false", "0", "no")
+
+_loaded = False
+_env_path: Optional[str] = None
+_load_lock = threading.Lock()
+
+
+def load_env() -> Optional[str]:
+    """
+    Load the .env file into os.environ, once per process.
+    
+    Returns:
+        Path of the loaded .env file, or None if there is none
+    """
+    global _loaded, _env_path
+    if _loaded:
+        return _env_path
+    
+    with _load_lock:
+        if not _loaded:
+            _env_path = next((path for path in ENV_PATHS if os.path.exists(path)), None)
+            if _env_path:
+                from dotenv import load_dotenv
+                load_dotenv(_env_path, override=True, encoding='utf-8')
+            _loaded = True
+    return _env_path
+
+
+def get_env(name: str, default: Optional[str] = None) -> Optional[str]:
+    """
+    Read a setting, loading the .env file first if that has not happened yet.
+    
+    Args:
+        name: Environment variable name
+        default: Value if the variable is not set
+    
+    Returns:
+        The variable's value, or default
+    """
+    load_env()
+    return os.getenv(name, default)
+
+
+def get_flag(name: str, default: bool) -> bool:
+    """
+    Read an on/off setting.
+    
+    Args:
+        name: Environment variable name
+        default: Value if the variable is not set or not an on/off value
+    
+    Returns:
+        False for "off", "false", "0" or "no", True for "on", "true", "1" or
+        "yes" (in any case), otherwise default
+    """
+    value = (get_env(name) or "").strip().lower()
+    if value in FALSE_VALUES:
+        return False
+    if value in TRUE_VALUES:
+        return True
+    return default
+
+
+def _get_number(name: str, default, convert):
+    value = (get_env(name) or "").strip()
+    if not value:
+        return default
+    try:
+        return convert(value)
+    except ValueError:
+        raise ValueError(f"{name} must be {'an integer' if convert is int else 'a number'}, got {value!r}")
+
+
+def get_int(name: str, default: int) -> int:
+    """
+    Read an integer setting.
+    
+    Args:
+        name: Environment variable name
+        default: Value if the variable is not set or empty
+    
+    Returns:
+        The variable's value as an int, or default
+    
+    Raises:
+        ValueError: If the value is not an integer
+    """
+    return _get_number(name, default, int)
+
+
+def get_float(name: str, default: float) -> float:
+    """
+    Read a numeric setting.
+    
+    Args:
+        name: Environment variable name
+        default: Value if the variable is not set or empty
+    
+    Returns:
+        The variable's value as a float, or default
+    
+    Raises:
+        ValueError: If the value is not a number
+    """
+    return _get_number(name, default, float)
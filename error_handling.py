@@ -4,11 +4,12 @@ Error handling utilities for the KYC Bot system.
 Provides retry logic, error classification, and user-friendly error messages.
 """
 
+import asyncio
+import sys
 import time
 import logging
 from typing import Callable, Any, Optional, Tuple
 from functools import wraps
-from googleapiclient.errors import HttpError
 
 logger = logging.getLogger('kyc_bot.error_handling')
 
@@ -36,8 +37,10 @@ def classify_error(error: Exception) -> Tuple[bool, str]:
     error_str = str(error).lower()
     error_type = type(error).__name__
     
-    # HTTP errors from Google APIs
-    if isinstance(error, HttpError):
+    # HTTP errors from Google APIs (the client is imported lazily; if it is
+    # not loaded yet, the error cannot be one of its HttpErrors)
+    google_errors = sys.modules.get("googleapiclient.errors")
+    if google_errors is not None and isinstance(error, google_errors.HttpError):
         status_code = error.resp.status if hasattr(error, 'resp') else None
         
         # Rate limiting (429) - retryable
@@ -79,12 +82,61 @@ def classify_error(error: Exception) -> Tuple[bool, str]:
     return False, f"An error occurred: {str(error)}"
 
 
+def time_remaining(deadline: Optional[float]) -> Optional[float]:
+    """
+    Get the seconds left until a deadline.
+    
+    Args:
+        deadline: Absolute deadline as a time.time() timestamp, or None
+        
+    Returns:
+        Remaining seconds (zero or negative once passed), or None without a deadline
+    """
+    if not deadline:
+        return None
+    return deadline - time.time()
+
+
+def deadline_passed(deadline: Optional[float]) -> bool:
+    """
+    Check whether a deadline has passed.
+    
+    Args:
+        deadline: Absolute deadline as a time.time() timestamp, or None
+        
+    Returns:
+        True once the deadline has passed; always False without a deadline
+    """
+    remaining = time_remaining(deadline)
+    return remaining is not None and remaining <= 0
+
+
+def _check_budget(func_name: str, attempt: int, deadline: Optional[float], last_error: Optional[Exception]):
+    # Refuse to start an attempt once the time budget is spent
+    if deadline_passed(deadline):
+        logger.error(f"{func_name}: time budget exhausted before attempt {attempt + 1}")
+        raise NonRetryableError("Time budget exhausted") from last_error
+
+
+def _no_time_to_retry(func_name: str, attempt: int, delay: float, deadline: Optional[float], user_message: str) -> bool:
+    # True (and logged) when the backoff delay would run past the deadline
+    remaining = time_remaining(deadline)
+    if remaining is None or remaining > delay:
+        return False
+    logger.error(
+        f"{func_name} failed after {attempt + 1} attempts: {user_message}. "
+        f"Not retrying, {max(remaining, 0.0):.1f}s of time budget left"
+    )
+    return True
+
+
 def retry_with_backoff(
     max_retries: int = 3,
     initial_delay: float = 1.0,
     backoff_factor: float = 2.0,
     max_delay: float = 10.0,
-    retryable_exceptions: tuple = (Exception,)
+    retryable_exceptions: tuple = (Exception,),
+    deadline: Optional[float] = None
 ):
     """
     Decorator to retry a function with exponential backoff.
@@ -95,6 +147,9 @@ def retry_with_backoff(
         backoff_factor: Multiplier for delay after each retry
         max_delay: Maximum delay between retries
         retryable_exceptions: Tuple of exception types that should be retried
+        deadline: Optional time.time() deadline (e.g. AgentState["deadline"]);
+                  no attempt starts after it, and no retry is scheduled whose
+                  backoff delay would run past it
     """
     def decorator(func: Callable) -> Callable:
         @wraps(func)
@@ -103,6 +158,7 @@ def retry_with_backoff(
             last_error = None
             
             for attempt in range(max_retries + 1):
+                _check_budget(func.__name__, attempt, deadline, last_error)
                 try:
                     return func(*args, **kwargs)
                 except retryable_exceptions as e:
@@ -113,6 +169,8 @@ def retry_with_backoff(
                         # Don't retry or out of retries
                         logger.error(f"{func.__name__} failed after {attempt + 1} attempts: {user_message}")
                         raise NonRetryableError(user_message) from e
+                    if _no_time_to_retry(func.__name__, attempt, delay, deadline, user_message):
+                        raise NonRetryableError(user_message) from e
                     
                     # Log retry attempt
                     logger.warning(
@@ -131,6 +189,63 @@ def retry_with_backoff(
     return decorator
 
 
+def async_retry_with_backoff(
+    max_retries: int = 3,
+    initial_delay: float = 1.0,
+    backoff_factor: float = 2.0,
+    max_delay: float = 10.0,
+    retryable_exceptions: tuple = (Exception,),
+    deadline: Optional[float] = None
+):
+    """
+    Decorator to retry a coroutine function with exponential backoff.
+    
+    Same policy as retry_with_backoff, but waits with asyncio.sleep so other
+    tasks keep running on the event loop between attempts.
+    
+    Args:
+        max_retries: Maximum number of retry attempts
+        initial_delay: Initial delay in seconds
+        backoff_factor: Multiplier for delay after each retry
+        max_delay: Maximum delay between retries
+        retryable_exceptions: Tuple of exception types that should be retried
+        deadline: Optional time.time() deadline, as for retry_with_backoff
+    """
+    def decorator(func: Callable) -> Callable:
+        @wraps(func)
+        async def wrapper(*args, **kwargs) -> Any:
+            delay = initial_delay
+            last_error = None
+            
+            for attempt in range(max_retries + 1):
+                _check_budget(func.__name__, attempt, deadline, last_error)
+                try:
+                    return await func(*args, **kwargs)
+                except retryable_exceptions as e:
+                    last_error = e
+                    is_retryable, user_message = classify_error(e)
+                    
+                    if not is_retryable or attempt >= max_retries:
+                        logger.error(f"{func.__name__} failed after {attempt + 1} attempts: {user_message}")
+                        raise NonRetryableError(user_message) from e
+                    if _no_time_to_retry(func.__name__, attempt, delay, deadline, user_message):
+                        raise NonRetryableError(user_message) from e
+                    
+                    logger.warning(
+                        f"{func.__name__} failed (attempt {attempt + 1}/{max_retries + 1}): {user_message}. "
+                        f"Retrying in {delay:.1f}s..."
+                    )
+                    
+                    await asyncio.sleep(delay)
+                    delay = min(delay * backoff_factor, max_delay)
+            
+            if last_error:
+                raise NonRetryableError(f"Operation failed after {max_retries + 1} attempts: {str(last_error)}") from last_error
+            
+        return wrapper
+    return decorator
+
+
 def handle_api_error(operation_name: str, error: Exception, fallback_value: Any = None) -> Tuple[Any, str]:
     """
     Handle an API error and return a fallback value with a user-friendly message.
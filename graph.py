@@ -1,102 +1,292 @@
 """
 LangGraph workflow definition for the KYC Bot multi-agent system.
 
-This module defines the sequential workflow using LangGraph StateGraph
-to coordinate the three agents: SearchAgent, WatchlistAgent, and AnalysisAgent.
+This module defines the workflow using LangGraph StateGraph to coordinate the
+three agents: SearchAgent and WatchlistAgent screen the customer in parallel,
+then AnalysisAgent writes the report. Conditional edges short-circuit the
+graph: invalid input skips every agent, and an exact watchlist match goes
+straight to a deterministic HIGH report without analysis.
+
+Every agent node has an async twin (asearch_node, awatchlist_node,
+aanalysis_node); create_workflow(use_async=True) builds the same graph from
+them for ainvoke()/astream().
+
+create_workflow(watchlist_first=True) (WATCHLIST_FIRST=on) screens the
+watchlists first instead, and the search issues only the queries planned
+from the watchlist result (see query_planner.py).
 """
 
-from typing import List, Dict
+import operator
+import threading
+from typing import Callable, List, Dict, Optional, Tuple, Union
 try:
-    from typing import TypedDict
+    from typing import TypedDict, Annotated, get_type_hints
 except ImportError:
-    from typing_extensions import TypedDict
-from langgraph.graph import StateGraph, END
-import os
-from dotenv import load_dotenv
+    from typing_extensions import TypedDict, Annotated, get_type_hints
+from langgraph.graph import StateGraph, START, END
+from langgraph.config import get_config, get_stream_writer
+from config import load_env, get_flag
 
 # Load environment variables before importing agents
-# Try multiple paths for .env file
-env_paths = [
-    os.path.join(os.path.dirname(__file__), '.env'),  # Relative to this file
-    os.path.join(os.getcwd(), '.env'),  # Current working directory
-    '.env'  # Current directory
-]
-
-env_path = None
-for path in env_paths:
-    if os.path.exists(path):
-        env_path = path
-        break
-
-# Always try to load from .env file directly first
-if env_path:
-    try:
-        with open(env_path, 'r', encoding='utf-8') as f:
-            for line in f:
-                line = line.strip()
-                if line and not line.startswith('#') and '=' in line:
-                    key, value = line.split('=', 1)
-                    key = key.strip()
-                    value = value.strip().strip('"').strip("'")
-                    os.environ[key] = value
-    except Exception as e:
-        pass  # Silent fail, will try load_dotenv
+load_env()
 
-# Also try load_dotenv as backup
-if env_path:
-    load_dotenv(env_path, override=True)
-else:
-    load_dotenv(override=True)
+from agents import SearchAgent, WatchlistAgent, AnalysisAgent
+from logger import workflow_logger, performance_tracker, log_report_generation
+from error_handling import validate_customer_name, deadline_passed
+from tools import search_failed
+from reports import render_report
+from rules import EarlyExitRules, sanctions_assessment
+from checkpoints import checkpointed
+from query_planner import get_query_planner
 
-# Final verification - only raise error if still not found
-if not os.getenv('GOOGLE_API_KEY'):
-    # Last resort: try to read from current directory
-    try:
-        with open('.env', 'r', encoding='utf-8') as f:
-            for line in f:
-                line = line.strip()
-                if line.startswith('GOOGLE_API_KEY='):
-                    api_key = line.split('=', 1)[1].strip().strip('"').strip("'")
-                    os.environ['GOOGLE_API_KEY'] = api_key
-                    break
-    except Exception:
-        pass
 
-from agents import SearchAgent, WatchlistAgent, AnalysisAgent
-from logger import workflow_logger, performance_tracker
+def _error_messages(errors) -> List[str]:
+    # Accept the "; "-joined string form as well (e.g. "error": "" in an initial state)
+    if not errors:
+        return []
+    if isinstance(errors, str):
+        return [message for message in errors.split("; ") if message]
+    return list(errors)
+
+
+def merge_errors(current: List[str], update: List[str]) -> List[str]:
+    """
+    Reducer for the error field: append messages reported by nodes.
+    
+    Args:
+        current: Errors collected so far
+        update: Errors reported by a node
+        
+    Returns:
+        All distinct messages, in the order they were reported
+    """
+    messages = _error_messages(current)
+    for message in _error_messages(update):
+        if message not in messages:
+            messages.append(message)
+    return messages
+
+
+def format_errors(errors) -> str:
+    """
+    Join the collected error messages for output (API responses, CLI).
+    
+    Args:
+        errors: The state's error list
+        
+    Returns:
+        Messages joined with "; ", or "" if there were none
+    """
+    return "; ".join(_error_messages(errors))
 
 
 # AgentState TypedDict for managing state between agents
 class AgentState(TypedDict):
-    """State management for the multi-agent workflow."""
+    """
+    State management for the multi-agent workflow.
+    
+    search_node and watchlist_node run in the same step, so nodes return only
+    the fields they change; error collects messages from every node through
+    merge_errors and is joined with format_errors at the API / CLI boundary.
+    With an investigation_id, agent nodes are checkpointed (see checkpoints.py).
+    
+    deadline is the investigation's end-to-end time budget as a time.time()
+    timestamp. Agent nodes and their retries stop when it is reached and
+    return partial results; truncated_nodes lists the nodes that did.
+    """
+    investigation_id: str
     customer_name: str
     search_results: List[Dict[str, str]]
     watchlist_results: Dict
     final_report: str
-    error: str
+    risk_level: str
+    error: Annotated[List[str], merge_errors]
+    deadline: float
+    truncated_nodes: Annotated[List[str], operator.add]
+
+
+# Reducer per AgentState field that has one (error, truncated_nodes)
+STATE_REDUCERS = {
+    key: hint.__metadata__[0]
+    for key, hint in get_type_hints(AgentState, include_extras=True).items()
+    if hasattr(hint, "__metadata__")
+}
+
+
+def apply_update(state: AgentState, update: AgentState) -> AgentState:
+    """
+    Merge a node's update into a state the way the workflow does.
+    
+    Fields with a reducer in AgentState go through it, the others are
+    replaced; for running nodes outside the graph (see bulk.py).
+    
+    Args:
+        state: Current agent state
+        update: State update returned by a node
+    
+    Returns:
+        New state with the update applied
+    """
+    merged = dict(state)
+    for key, value in update.items():
+        reducer = STATE_REDUCERS.get(key)
+        merged[key] = reducer(merged.get(key, []), value) if reducer else value
+    return merged
 
 
 # Initialize agents (will be initialized once)
 _search_agent = None
 _watchlist_agent = None
 _analysis_agent = None
+_agents_lock = threading.Lock()
 
 
-def get_agents():
-    """Lazy initialization of agents."""
-    global _search_agent, _watchlist_agent, _analysis_agent
+def get_search_agent() -> SearchAgent:
+    """
+    Lazy initialization of the search agent.
     
+    Each node gets only the agent it runs, so a run that never searches or
+    never calls Gemini does not import or configure their SDKs. Parallel
+    nodes call the getters concurrently on first use; the lock makes sure
+    each agent (and its thread pools, caches and clients) is built once.
+    """
+    global _search_agent
     if _search_agent is None:
-        _search_agent = SearchAgent()
+        with _agents_lock:
+            if _search_agent is None:
+                _search_agent = SearchAgent()
+    return _search_agent
+
+
+def get_watchlist_agent() -> WatchlistAgent:
+    """Lazy initialization of the watchlist agent (see get_search_agent)."""
+    global _watchlist_agent
     if _watchlist_agent is None:
-        _watchlist_agent = WatchlistAgent()
-    if _analysis_agent is None:
-        _analysis_agent = AnalysisAgent()
+        with _agents_lock:
+            if _watchlist_agent is None:
+                _watchlist_agent = WatchlistAgent()
+    return _watchlist_agent
+
+
+def get_analysis_agent(build: bool = True) -> Optional[AnalysisAgent]:
+    """
+    Lazy initialization of the analysis agent (see get_search_agent).
     
-    return _search_agent, _watchlist_agent, _analysis_agent
+    Args:
+        build: If False, return None rather than build the agent, e.g. for
+               metrics that have nothing to report before the first analysis
+    """
+    global _analysis_agent
+    if _analysis_agent is None and build:
+        with _agents_lock:
+            if _analysis_agent is None:
+                _analysis_agent = AnalysisAgent()
+    return _analysis_agent
+
+
+def get_agents() -> Tuple[SearchAgent, WatchlistAgent, AnalysisAgent]:
+    """Get all three agents, building any not built yet."""
+    return get_search_agent(), get_watchlist_agent(), get_analysis_agent()
+
+
+MISSING_NAME_ERROR = "Customer name is required but was not provided"
+
+
+def _node_error(agent_name: str, error: Exception) -> str:
+    # Validation errors are not retried; report them as invalid input
+    if isinstance(error, ValueError):
+        return f"Invalid input: {str(error)}"
+    return f"{agent_name} error: {str(error)}"
+
 
+def _search_failure(error_msg: str) -> AgentState:
+    workflow_logger.error(f"Search node error: {error_msg}")
+    # Return empty results but continue workflow
+    return {
+        "error": [error_msg],
+        "search_results": []
+    }
 
-def search_node(state: AgentState) -> AgentState:
+
+def _watchlist_failure(error_msg: str) -> AgentState:
+    workflow_logger.error(f"Watchlist node error: {error_msg}")
+    # Return empty results but continue workflow
+    return {
+        "error": [error_msg],
+        "watchlist_results": {"matched": False, "watchlists_checked": [], "matches": []}
+    }
+
+
+def _analysis_failure(state: AgentState, error_msg: str) -> AgentState:
+    workflow_logger.error(f"Analysis node error: {error_msg}")
+    search_results = state.get("search_results", [])
+    watchlist_results = state.get("watchlist_results", {})
+    # Generate a basic error report
+    fallback_report = f"""## KYC Risk Assessment Report - {state.get('customer_name', 'Unknown')}
+
+**Error:** Unable to generate full risk assessment report.
+
+**Error Details:** {error_msg}
+
+**Available Data:**
+- Search Results: {len(search_results)} items
+- Watchlists Checked: {len(watchlist_results.get('watchlists_checked', []))}
+- Watchlist Matches: {len(watchlist_results.get('matches', []))}
+
+**Recommendation:** Please review the available data manually.
+"""
+    return {
+        "error": [error_msg],
+        "final_report": fallback_report,
+        "risk_level": "UNKNOWN"
+    }
+
+
+def _analysis_result(assessment: Dict, deadline: float = None) -> AgentState:
+    final_report = assessment["report"]
+    workflow_logger.info(f"Analysis node completed: report length={len(final_report)} characters, "
+                         f"risk_level={assessment['risk_level']}")
+    update = {
+        "final_report": final_report,
+        "risk_level": assessment["risk_level"]
+    }
+    # A rule-based report is complete even past the deadline; the fallback is not
+    if assessment["risk_level"] == "UNKNOWN":
+        return _mark_truncated(update, "analysis_agent", deadline)
+    return update
+
+
+def _mark_truncated(update: AgentState, node_name: str, deadline: float = None) -> AgentState:
+    # The time budget ran out while the node ran, so its result may be partial
+    if not deadline_passed(deadline):
+        return update
+    workflow_logger.warning(f"{node_name} ran out of time budget, returning partial results")
+    return {**update, "truncated_nodes": [node_name]}
+
+
+def _search_result(search_results: List[Dict[str, str]], deadline: float = None) -> AgentState:
+    workflow_logger.info(f"Search node completed: {len(search_results)} results found")
+    update = {"search_results": search_results}
+    if search_failed(search_results):
+        # Report the outage: the simulated stand-ins are not a clean search
+        workflow_logger.error("Search node error: search API failed, simulated results used")
+        update["error"] = ["SearchAgent error: search API failed, simulated results used"]
+    return _mark_truncated(update, "search_agent", deadline)
+
+
+def _search_skipped(customer_name: str) -> AgentState:
+    workflow_logger.warning(f"Time budget exhausted, skipping search for: {customer_name}")
+    return {"search_results": [], "truncated_nodes": ["search_agent"]}
+
+
+def _planned_queries(state: AgentState) -> Optional[List[str]]:
+    # Watchlist-first ordering: the watchlist result decides the search queries
+    plan = get_query_planner().plan(state.get("customer_name", ""), state.get("watchlist_results", {}))
+    workflow_logger.info(f"Search plan for {state.get('customer_name', '')}: {plan.kind} ({plan.reason})")
+    return plan.queries
+
+
+def search_node(state: AgentState, planned: bool = False) -> AgentState:
     """
     LangGraph node for SearchAgent.
     
@@ -104,50 +294,85 @@ def search_node(state: AgentState) -> AgentState:
     
     Args:
         state: Current agent state
+        planned: Plan the queries from the state's watchlist result
+                 (see query_planner.QueryPlanner)
         
     Returns:
-        Updated state with search_results
+        State update with search_results (and error on failure)
     """
-    search_agent, _, _ = get_agents()
+    search_agent = get_search_agent()
+    
+    customer_name = state.get("customer_name", "")
+    if not customer_name:
+        return _search_failure(MISSING_NAME_ERROR)
+    
+    deadline = state.get("deadline")
+    if deadline_passed(deadline):
+        return _search_skipped(customer_name)
     
     try:
-        customer_name = state.get("customer_name", "")
-        if not customer_name:
-            error_msg = "Customer name is required but was not provided"
-            workflow_logger.error(error_msg)
-            return {
-                **state,
-                "error": error_msg,
-                "search_results": []
-            }
-        
         workflow_logger.info(f"Executing search_node for: {customer_name}")
-        search_results = search_agent.search_adverse_media(customer_name)
-        workflow_logger.info(f"Search node completed: {len(search_results)} results found")
+        queries = _planned_queries(state) if planned else None
+        search_results = search_agent.search_adverse_media(customer_name, deadline=deadline, queries=queries)
+        return _search_result(search_results, deadline)
+    except Exception as e:
+        return _search_failure(_node_error("SearchAgent", e))
+
+
+async def asearch_node(state: AgentState, planned: bool = False) -> AgentState:
+    """
+    Async LangGraph node for SearchAgent (see search_node).
+    
+    Args:
+        state: Current agent state
+        planned: Plan the queries from the state's watchlist result
         
-        return {
-            **state,
-            "search_results": search_results,
-            "error": state.get("error", "")
-        }
-    except ValueError as e:
-        # Validation errors - don't retry
-        error_msg = f"Invalid input: {str(e)}"
-        workflow_logger.error(f"Search node validation error: {error_msg}")
-        return {
-            **state,
-            "error": error_msg,
-            "search_results": []
-        }
+    Returns:
+        State update with search_results (and error on failure)
+    """
+    search_agent = get_search_agent()
+    
+    customer_name = state.get("customer_name", "")
+    if not customer_name:
+        return _search_failure(MISSING_NAME_ERROR)
+    
+    deadline = state.get("deadline")
+    if deadline_passed(deadline):
+        return _search_skipped(customer_name)
+    
+    try:
+        workflow_logger.info(f"Executing asearch_node for: {customer_name}")
+        queries = _planned_queries(state) if planned else None
+        search_results = await search_agent.asearch_adverse_media(customer_name, deadline=deadline, queries=queries)
+        return _search_result(search_results, deadline)
     except Exception as e:
-        error_msg = f"SearchAgent error: {str(e)}"
-        workflow_logger.error(f"Search node error: {error_msg}")
-        # Return empty results but continue workflow
-        return {
-            **state,
-            "error": error_msg,
-            "search_results": []
-        }
+        return _search_failure(_node_error("SearchAgent", e))
+
+
+def planned_search_node(state: AgentState) -> AgentState:
+    """
+    LangGraph node for SearchAgent after watchlist screening (watchlist-first ordering).
+    
+    Args:
+        state: Current agent state, with watchlist_results
+        
+    Returns:
+        State update with search_results (and error on failure)
+    """
+    return search_node(state, planned=True)
+
+
+async def aplanned_search_node(state: AgentState) -> AgentState:
+    """
+    Async LangGraph node for SearchAgent after watchlist screening (see planned_search_node).
+    
+    Args:
+        state: Current agent state, with watchlist_results
+        
+    Returns:
+        State update with search_results (and error on failure)
+    """
+    return await asearch_node(state, planned=True)
 
 
 def watchlist_node(state: AgentState) -> AgentState:
@@ -160,136 +385,425 @@ def watchlist_node(state: AgentState) -> AgentState:
         state: Current agent state
         
     Returns:
-        Updated state with watchlist_results
+        State update with watchlist_results (and error on failure)
     """
-    _, watchlist_agent, _ = get_agents()
+    watchlist_agent = get_watchlist_agent()
+    
+    customer_name = state.get("customer_name", "")
+    if not customer_name:
+        return _watchlist_failure(MISSING_NAME_ERROR)
     
     try:
-        customer_name = state.get("customer_name", "")
-        if not customer_name:
-            error_msg = "Customer name is required but was not provided"
-            workflow_logger.error(error_msg)
-            return {
-                **state,
-                "error": f"{state.get('error', '')}; {error_msg}".strip('; '),
-                "watchlist_results": {"matched": False, "watchlists_checked": [], "matches": []}
-            }
-        
         workflow_logger.info(f"Executing watchlist_node for: {customer_name}")
         watchlist_results = watchlist_agent.check_watchlists(customer_name)
         workflow_logger.info(f"Watchlist node completed: matched={watchlist_results.get('matched', False)}")
+        return {"watchlist_results": watchlist_results}
+    except Exception as e:
+        return _watchlist_failure(_node_error("WatchlistAgent", e))
+
+
+async def awatchlist_node(state: AgentState) -> AgentState:
+    """
+    Async LangGraph node for WatchlistAgent (see watchlist_node).
+    
+    Args:
+        state: Current agent state
         
-        return {
-            **state,
-            "watchlist_results": watchlist_results,
-            "error": state.get("error", "")
-        }
-    except ValueError as e:
-        # Validation errors - don't retry
-        error_msg = f"Invalid input: {str(e)}"
-        workflow_logger.error(f"Watchlist node validation error: {error_msg}")
-        return {
-            **state,
-            "error": f"{state.get('error', '')}; {error_msg}".strip('; '),
-            "watchlist_results": {"matched": False, "watchlists_checked": [], "matches": []}
-        }
+    Returns:
+        State update with watchlist_results (and error on failure)
+    """
+    watchlist_agent = get_watchlist_agent()
+    
+    customer_name = state.get("customer_name", "")
+    if not customer_name:
+        return _watchlist_failure(MISSING_NAME_ERROR)
+    
+    try:
+        workflow_logger.info(f"Executing awatchlist_node for: {customer_name}")
+        watchlist_results = await watchlist_agent.acheck_watchlists(customer_name)
+        workflow_logger.info(f"Watchlist node completed: matched={watchlist_results.get('matched', False)}")
+        return {"watchlist_results": watchlist_results}
     except Exception as e:
-        error_msg = f"WatchlistAgent error: {str(e)}"
-        workflow_logger.error(f"Watchlist node error: {error_msg}")
-        # Return empty results but continue workflow
-        return {
-            **state,
-            "error": f"{state.get('error', '')}; {error_msg}".strip('; '),
-            "watchlist_results": {"matched": False, "watchlists_checked": [], "matches": []}
-        }
+        return _watchlist_failure(_node_error("WatchlistAgent", e))
+
+
+def watchlist_batch_node(states: List[AgentState]) -> List[AgentState]:
+    """
+    Batch counterpart of watchlist_node for bulk investigations.
+    
+    All names are screened with one batched match
+    (WatchlistAgent.check_watchlists_batch); a failure degrades every
+    customer the way watchlist_node does.
+    
+    Args:
+        states: Agent states with valid customer names
+    
+    Returns:
+        One state update per state, in order (see watchlist_node)
+    """
+    watchlist_agent = get_watchlist_agent()
+    
+    try:
+        workflow_logger.info(f"Executing watchlist_batch_node for {len(states)} customers")
+        results = watchlist_agent.check_watchlists_batch([state.get("customer_name", "") for state in states])
+        return [{"watchlist_results": watchlist_results} for watchlist_results in results]
+    except Exception as e:
+        error_msg = _node_error("WatchlistAgent", e)
+        return [_watchlist_failure(error_msg) for _ in states]
+
+
+def _report_text_writer() -> Optional[Callable[[str], None]]:
+    # Set when the run streams the report: stream_mode "custom" with
+    # config={"configurable": {"stream_report": True}}
+    try:
+        config = get_config()
+    except RuntimeError:
+        return None
+    if not config.get("configurable", {}).get("stream_report"):
+        return None
+    writer = get_stream_writer()
+    return lambda text: writer({"node": "analysis_agent", "text": text})
 
 
 def analysis_node(state: AgentState) -> AgentState:
     """
     LangGraph node for AnalysisAgent.
     
-    Generates final risk assessment report.
+    Generates final risk assessment report. When the workflow is streamed
+    with stream_mode "custom" and configurable stream_report=True, the
+    report text is written to the stream as it is generated, as
+    {"node": "analysis_agent", "text": "..."} chunks.
     
     Args:
         state: Current agent state
         
     Returns:
-        Updated state with final_report
+        State update with final_report and risk_level (and error on failure)
     """
-    _, _, analysis_agent = get_agents()
+    analysis_agent = get_analysis_agent()
+    
+    customer_name = state.get("customer_name", "")
+    if not customer_name:
+        return {**_analysis_failure(state, MISSING_NAME_ERROR), "final_report": f"Error: {MISSING_NAME_ERROR}"}
     
     try:
-        customer_name = state.get("customer_name", "")
-        search_results = state.get("search_results", [])
-        watchlist_results = state.get("watchlist_results", {})
-        
-        if not customer_name:
-            error_msg = "Customer name is required but was not provided"
-            workflow_logger.error(error_msg)
-            return {
-                **state,
-                "error": f"{state.get('error', '')}; {error_msg}".strip('; '),
-                "final_report": f"Error: {error_msg}"
-            }
-        
         workflow_logger.info(f"Executing analysis_node for: {customer_name}")
-        final_report = analysis_agent.generate_report(
+        on_text = _report_text_writer()
+        kwargs = {"on_text": on_text} if on_text else {}
+        assessment = analysis_agent.generate_assessment(
             customer_name,
-            search_results,
-            watchlist_results
+            state.get("search_results", []),
+            state.get("watchlist_results", {}),
+            deadline=state.get("deadline"),
+            **kwargs
         )
-        workflow_logger.info(f"Analysis node completed: report length={len(final_report)} characters")
+        return _analysis_result(assessment, state.get("deadline"))
+    except Exception as e:
+        return _analysis_failure(state, f"AnalysisAgent error: {str(e)}")
+
+
+async def aanalysis_node(state: AgentState) -> AgentState:
+    """
+    Async LangGraph node for AnalysisAgent (see analysis_node).
+    
+    The Gemini call is awaited (generate_content_async), so the event loop
+    serves other investigations while the report is generated.
+    
+    Args:
+        state: Current agent state
         
-        return {
-            **state,
-            "final_report": final_report,
-            "error": state.get("error", "")
-        }
+    Returns:
+        State update with final_report and risk_level (and error on failure)
+    """
+    analysis_agent = get_analysis_agent()
+    
+    customer_name = state.get("customer_name", "")
+    if not customer_name:
+        return {**_analysis_failure(state, MISSING_NAME_ERROR), "final_report": f"Error: {MISSING_NAME_ERROR}"}
+    
+    try:
+        workflow_logger.info(f"Executing aanalysis_node for: {customer_name}")
+        assessment = await analysis_agent.agenerate_assessment(
+            customer_name,
+            state.get("search_results", []),
+            state.get("watchlist_results", {}),
+            deadline=state.get("deadline")
+        )
+        return _analysis_result(assessment, state.get("deadline"))
     except Exception as e:
-        error_msg = f"AnalysisAgent error: {str(e)}"
-        workflow_logger.error(f"Analysis node error: {error_msg}")
-        # Generate a basic error report
-        fallback_report = f"""## KYC Risk Assessment Report - {state.get('customer_name', 'Unknown')}
+        return _analysis_failure(state, f"AnalysisAgent error: {str(e)}")
 
-**Error:** Unable to generate full risk assessment report.
 
-**Error Details:** {error_msg}
+def analysis_batch_node(states: List[AgentState]) -> List[AgentState]:
+    """
+    Batch counterpart of analysis_node for bulk investigations.
+    
+    The reports are generated with batched Gemini calls
+    (AnalysisAgent.generate_reports_batch), bounded by each state's deadline.
+    Customers whose time budget has run out go through analysis_node one by
+    one, which falls back at once.
+    
+    Args:
+        states: Agent states after screening, with valid customer names
+    
+    Returns:
+        One state update per state, in order (see analysis_node)
+    """
+    analysis_agent = get_analysis_agent()
+    
+    updates: List[Optional[AgentState]] = [None] * len(states)
+    batch = []
+    for position, state in enumerate(states):
+        if deadline_passed(state.get("deadline")):
+            updates[position] = analysis_node(state)
+        else:
+            batch.append(position)
+    if not batch:
+        return updates
+    
+    try:
+        workflow_logger.info(f"Executing analysis_batch_node for {len(batch)} customers")
+        assessments = analysis_agent.generate_reports_batch([
+            {
+                "customer_name": states[position]["customer_name"],
+                "search_results": states[position].get("search_results", []),
+                "watchlist_results": states[position].get("watchlist_results", {}),
+                "deadline": states[position].get("deadline")
+            }
+            for position in batch
+        ])
+        for position, assessment in zip(batch, assessments):
+            updates[position] = _analysis_result(assessment, states[position].get("deadline"))
+    except Exception as e:
+        for position in batch:
+            updates[position] = _analysis_failure(states[position], f"AnalysisAgent error: {str(e)}")
+    return updates
 
-**Available Data:**
-- Search Results: {len(search_results)} items
-- Watchlists Checked: {len(watchlist_results.get('watchlists_checked', []))}
-- Watchlist Matches: {len(watchlist_results.get('matches', []))}
 
-**Recommendation:** Please review the available data manually.
-"""
-        return {
-            **state,
-            "error": f"{state.get('error', '')}; {error_msg}".strip('; '),
-            "final_report": fallback_report
-        }
+def route_input(state: AgentState, parallel: bool = True, watchlist_first: bool = False) -> Union[str, List[str]]:
+    """
+    Conditional entry: skip the agents when the customer name is invalid.
+    
+    Args:
+        state: Initial agent state
+        parallel: Whether screening fans out to both nodes
+        watchlist_first: Whether watchlist screening runs before the search
+        
+    Returns:
+        "invalid_input", or the screening node(s) to run
+    """
+    is_valid, _ = validate_customer_name(state.get("customer_name", ""))
+    if not is_valid:
+        performance_tracker.track_graph_path("invalid_input")
+        return "invalid_input"
+    if watchlist_first:
+        return "watchlist_agent"
+    return ["search_agent", "watchlist_agent"] if parallel else "search_agent"
+
 
+def route_after_screening(state: AgentState) -> str:
+    """
+    Conditional edge after screening: exit early on an exact watchlist match.
+    
+    Args:
+        state: Agent state with search and watchlist results
+        
+    Returns:
+        "sanctions_report" or "analysis_agent"
+    """
+    if EarlyExitRules.from_env().exact_match(state.get("watchlist_results", {})):
+        performance_tracker.track_graph_path("sanctions_match")
+        return "sanctions_report"
+    performance_tracker.track_graph_path("analysis")
+    return "analysis_agent"
 
-def create_workflow() -> StateGraph:
+
+def invalid_input_node(state: AgentState) -> AgentState:
+    """
+    LangGraph node for invalid input: report the error without running any agent.
+    
+    Args:
+        state: Current agent state
+        
+    Returns:
+        State update with error, final_report and risk_level UNKNOWN
+    """
+    _, error_msg = validate_customer_name(state.get("customer_name", ""))
+    error_msg = f"Invalid input: {error_msg}"
+    workflow_logger.error(f"Skipping investigation: {error_msg}")
+    return {
+        "error": [error_msg],
+        "search_results": [],
+        "watchlist_results": {"matched": False, "watchlists_checked": [], "matches": []},
+        "final_report": f"Error: {error_msg}",
+        "risk_level": "UNKNOWN"
+    }
+
+
+def screening_complete_node(state: AgentState) -> AgentState:
+    """
+    LangGraph join node: both screening nodes have finished.
+    
+    Conditional edges cannot start from several nodes at once, so the
+    post-screening route is taken from here.
+    
+    Args:
+        state: Current agent state
+        
+    Returns:
+        Empty state update
+    """
+    return {}
+
+
+def sanctions_report_node(state: AgentState) -> AgentState:
+    """
+    LangGraph node for an exact watchlist match: deterministic HIGH report.
+    
+    Args:
+        state: Current agent state
+        
+    Returns:
+        State update with final_report and risk_level HIGH
+    """
+    customer_name = state.get("customer_name", "")
+    search_results = state.get("search_results", [])
+    watchlist_results = state.get("watchlist_results", {})
+    match = EarlyExitRules.from_env().exact_match(watchlist_results) or {}
+    
+    assessment = sanctions_assessment(customer_name, search_results, watchlist_results, match)
+    final_report = render_report(customer_name, assessment)
+    workflow_logger.info(
+        f"Early exit for {customer_name}: exact {match.get('watchlist', 'watchlist')} match "
+        f"(similarity {match.get('similarity', 0.0):.2f}), analysis skipped"
+    )
+    log_report_generation(workflow_logger, customer_name, len(final_report), "HIGH")
+    return {
+        "final_report": final_report,
+        "risk_level": "HIGH"
+    }
+
+
+def create_workflow(
+    parallel: bool = True,
+    use_async: bool = False,
+    watchlist_first: bool = False
+) -> StateGraph:
     """
     Create and configure the LangGraph workflow.
     
+    Paths (counted in performance_tracker.get_graph_paths()):
+    - invalid_input: invalid customer name, no agent runs
+    - sanctions_match: exact watchlist match, deterministic HIGH report
+    - analysis: screening followed by AnalysisAgent
+    
+    Args:
+        parallel: If True (default), search and watchlist screening start
+                  together from the entry point and join before analysis;
+                  if False they run one after the other (for benchmarking)
+        use_async: If True, the agent nodes are coroutines (asearch_node,
+                   awatchlist_node, aanalysis_node) and the workflow must be
+                   run with ainvoke()/astream(), so one event loop can
+                   multiplex many investigations
+        watchlist_first: If True, watchlist screening runs first and its
+                         result plans the search queries (see query_planner);
+                         overrides parallel
+    
     Returns:
         Compiled StateGraph ready for execution
     """
     # Create the StateGraph
     workflow = StateGraph(AgentState)
+    if use_async:
+        search, watchlist, analysis = asearch_node, awatchlist_node, aanalysis_node
+        if watchlist_first:
+            search = aplanned_search_node
+    else:
+        search, watchlist, analysis = search_node, watchlist_node, analysis_node
+        if watchlist_first:
+            search = planned_search_node
     
     # Add nodes for each agent
-    workflow.add_node("search_agent", search_node)
-    workflow.add_node("watchlist_agent", watchlist_node)
-    workflow.add_node("analysis_agent", analysis_node)
-    
-    # Define the sequential flow
-    workflow.set_entry_point("search_agent")
-    workflow.add_edge("search_agent", "watchlist_agent")
-    workflow.add_edge("watchlist_agent", "analysis_agent")
+    workflow.add_node("invalid_input", invalid_input_node)
+    # Agent nodes resume from checkpoints when the state has an investigation_id
+    workflow.add_node("search_agent", checkpointed("search_agent", search))
+    workflow.add_node("watchlist_agent", checkpointed("watchlist_agent", watchlist))
+    workflow.add_edge("invalid_input", END)
+    
+    # Entry: invalid input exits at once, otherwise screening starts
+    workflow.add_conditional_edges(
+        START,
+        lambda state: route_input(state, parallel, watchlist_first),
+        ["invalid_input", "search_agent", "watchlist_agent"]
+    )
+    if watchlist_first:
+        # The search waits for the watchlist result that plans its queries
+        workflow.add_edge("watchlist_agent", "search_agent")
+        screening_done = ["search_agent"]
+    elif parallel:
+        # Fan out: both screening nodes run in the first step
+        screening_done = ["search_agent", "watchlist_agent"]
+    else:
+        workflow.add_edge("search_agent", "watchlist_agent")
+        screening_done = ["watchlist_agent"]
+    
+    # Fan in, then exit early on an exact watchlist match
+    workflow.add_node("screening_complete", screening_complete_node)
+    workflow.add_node("sanctions_report", sanctions_report_node)
+    workflow.add_node("analysis_agent", checkpointed("analysis_agent", analysis))
+    workflow.add_edge(screening_done, "screening_complete")
+    workflow.add_conditional_edges(
+        "screening_complete", route_after_screening, ["sanctions_report", "analysis_agent"]
+    )
+    workflow.add_edge("sanctions_report", END)
     workflow.add_edge("analysis_agent", END)
     
     # Compile the workflow
     return workflow.compile()
 
+
+def watchlist_first_enabled() -> bool:
+    """Whether the WATCHLIST_FIRST environment variable ("off") selects watchlist-first ordering."""
+    return get_flag("WATCHLIST_FIRST", False)
+
+
+# Compiled workflows, one per (parallel, use_async, watchlist_first) variant
+_compiled_workflows: Dict[Tuple[bool, bool, bool], StateGraph] = {}
+_compiled_workflows_lock = threading.Lock()
+
+
+def get_compiled_workflow(
+    parallel: bool = True,
+    use_async: bool = False,
+    watchlist_first: Optional[bool] = None
+) -> StateGraph:
+    """
+    Get the process-wide compiled workflow, compiling it on first use.
+    
+    A compiled graph holds no per-run state (there is no checkpointer), so
+    one instance serves concurrent invoke()/stream() calls from every thread,
+    or ainvoke()/astream() calls on any event loop for use_async=True.
+    
+    Args:
+        parallel: See create_workflow()
+        use_async: See create_workflow()
+        watchlist_first: See create_workflow(); defaults to the
+                         WATCHLIST_FIRST environment variable ("off")
+    
+    Returns:
+        Compiled StateGraph shared by all callers
+    """
+    if watchlist_first is None:
+        watchlist_first = watchlist_first_enabled()
+    key = (parallel, use_async, watchlist_first)
+    workflow = _compiled_workflows.get(key)
+    if workflow is None:
+        with _compiled_workflows_lock:
+            workflow = _compiled_workflows.get(key)
+            if workflow is None:
+                workflow = create_workflow(parallel=parallel, use_async=use_async, watchlist_first=watchlist_first)
+                _compiled_workflows[key] = workflow
+                workflow_logger.info(
+                    f"Compiled workflow (parallel={parallel}, use_async={use_async}, watchlist_first={watchlist_first})"
+                )
+    return workflow
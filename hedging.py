@@ -0,0 +1,272 @@
+"""
+Hedged calls for tail-latency control.
+
+A hedged call starts a second, identical request when the first one has not
+returned by a latency percentile of recent calls, and takes whichever
+finishes first. An overall deadline bounds the wait. call() runs attempts on
+a thread pool; acall() runs them as tasks on the running event loop.
+
+Controlled by environment variables:
+- GEMINI_HEDGE: "on" (default) or "off"
+- GEMINI_HEDGE_PERCENTILE: observed-latency percentile that triggers the hedge (default 95)
+- GEMINI_HEDGE_DELAY: hedge delay in seconds until enough latencies are observed (default 8)
+"""
+
+import asyncio
+import logging
+import math
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+
+from config import get_flag, get_float
+
+logger = logging.getLogger('kyc_bot.hedging')
+
+
+class DeadlineExceededError(Exception):
+    """Raised when a hedged call does not finish before its deadline."""
+    pass
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    # Nearest-rank percentile, 0.0 for no values
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = math.ceil(pct / 100 * len(ordered))
+    return ordered[max(0, min(len(ordered), rank) - 1)]
+
+
+class HedgedCaller:
+    """
+    Run calls with a latency-percentile hedge and an overall deadline.
+    
+    Thread-safe. Abandoned thread attempts (call()) cannot be cancelled once
+    started; they finish in the background and only feed the latency
+    statistics. Abandoned async attempts (acall()) are cancelled.
+    """
+    
+    def __init__(
+        self,
+        enabled: bool = True,
+        percentile: float = 95,
+        default_delay: float = 8.0,
+        min_samples: int = 20,
+        window: int = 200,
+        max_workers: int = 16
+    ):
+        """
+        Initialize the caller.
+        
+        Args:
+            enabled: If False, calls run once with only the deadline applied
+            percentile: Percentile of recent call latencies used as hedge delay
+            default_delay: Hedge delay until min_samples latencies are observed
+            min_samples: Observations needed before the percentile is trusted
+            window: Number of recent latencies kept
+            max_workers: Threads available for attempts in flight
+        """
+        self.enabled = enabled
+        self.percentile = percentile
+        self.default_delay = default_delay
+        self.min_samples = min_samples
+        self._latencies: Deque[float] = deque(maxlen=window)
+        self._primary_latencies: Deque[float] = deque(maxlen=window)
+        self._call_latencies: Deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="hedge")
+        self.stats = {"calls": 0, "hedged": 0, "hedge_wins": 0, "deadline_exceeded": 0}
+    
+    @classmethod
+    def from_env(cls) -> "HedgedCaller":
+        """Create a caller from the GEMINI_HEDGE* environment variables."""
+        return cls(
+            enabled=get_flag("GEMINI_HEDGE", True),
+            percentile=get_float("GEMINI_HEDGE_PERCENTILE", 95.0),
+            default_delay=get_float("GEMINI_HEDGE_DELAY", 8.0)
+        )
+    
+    def hedge_delay(self) -> float:
+        """
+        Get the current hedge delay.
+        
+        Returns:
+            The configured percentile of recent attempt latencies, or
+            default_delay while fewer than min_samples were observed
+        """
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return self.default_delay
+            return _percentile(list(self._latencies), self.percentile)
+    
+    def _observer(self, primary: bool) -> Callable[[Any], None]:
+        # Done callback recording the latency of a successful attempt
+        start_time = time.monotonic()
+        
+        def observe(done):
+            if done.cancelled() or done.exception() is not None:
+                return
+            latency = time.monotonic() - start_time
+            with self._lock:
+                self._latencies.append(latency)
+                if primary:
+                    self._primary_latencies.append(latency)
+        
+        return observe
+    
+    def _submit(self, func: Callable[[], Any], primary: bool) -> Future:
+        observe = self._observer(primary)
+        future = self._executor.submit(func)
+        future.add_done_callback(observe)
+        return future
+    
+    def _start_task(self, func: Callable[[], Awaitable[Any]], primary: bool) -> asyncio.Future:
+        observe = self._observer(primary)
+        task = asyncio.ensure_future(func())
+        task.add_done_callback(observe)
+        return task
+    
+    def call(self, func: Callable[[], Any], deadline: float) -> Any:
+        """
+        Run func, hedging it once if it is slow.
+        
+        Args:
+            func: Zero-argument callable; must be safe to run twice
+            deadline: Seconds to wait in total
+        
+        Returns:
+            The result of the first attempt to succeed
+        
+        Raises:
+            DeadlineExceededError: If no attempt succeeded before the deadline
+            Exception: The error of the last attempt if all attempts failed
+        """
+        start_time = time.monotonic()
+        with self._lock:
+            self.stats["calls"] += 1
+        
+        primary = self._submit(func, primary=True)
+        pending = {primary}
+        hedge: Optional[Future] = None
+        last_error: Optional[BaseException] = None
+        
+        while True:
+            remaining = deadline - (time.monotonic() - start_time)
+            timeout = remaining
+            if self.enabled and hedge is None:
+                timeout = min(remaining, max(0.0, self.hedge_delay() - (time.monotonic() - start_time)))
+            
+            done, pending = wait(pending, timeout=max(0.0, timeout), return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        with self._lock:
+                            self.stats["hedge_wins"] += 1
+                    with self._lock:
+                        self._call_latencies.append(time.monotonic() - start_time)
+                    return future.result()
+                last_error = future.exception()
+            
+            elapsed = time.monotonic() - start_time
+            if elapsed >= deadline:
+                with self._lock:
+                    self.stats["deadline_exceeded"] += 1
+                raise DeadlineExceededError(f"Call did not complete within the {deadline:.1f}s deadline")
+            
+            if self.enabled and hedge is None and pending:
+                # Primary is slow: fire the hedge
+                hedge = self._submit(func, primary=False)
+                pending.add(hedge)
+                with self._lock:
+                    self.stats["hedged"] += 1
+                logger.info(f"Hedging slow call after {elapsed:.2f}s")
+            elif not pending:
+                raise last_error
+    
+    async def acall(self, func: Callable[[], Awaitable[Any]], deadline: float) -> Any:
+        """
+        Async variant of call(): await func(), hedging it once if it is slow.
+        
+        Args:
+            func: Zero-argument callable returning a new awaitable per attempt;
+                  must be safe to run twice
+            deadline: Seconds to wait in total
+        
+        Returns:
+            The result of the first attempt to succeed
+        
+        Raises:
+            DeadlineExceededError: If no attempt succeeded before the deadline
+            Exception: The error of the last attempt if all attempts failed
+        """
+        start_time = time.monotonic()
+        with self._lock:
+            self.stats["calls"] += 1
+        
+        primary = self._start_task(func, primary=True)
+        pending = {primary}
+        hedge: Optional[asyncio.Future] = None
+        last_error: Optional[BaseException] = None
+        
+        try:
+            while True:
+                remaining = deadline - (time.monotonic() - start_time)
+                timeout = remaining
+                if self.enabled and hedge is None:
+                    timeout = min(remaining, max(0.0, self.hedge_delay() - (time.monotonic() - start_time)))
+                
+                done, pending = await asyncio.wait(
+                    pending, timeout=max(0.0, timeout), return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is None:
+                        with self._lock:
+                            if task is hedge:
+                                self.stats["hedge_wins"] += 1
+                            self._call_latencies.append(time.monotonic() - start_time)
+                        return task.result()
+                    last_error = task.exception()
+                
+                elapsed = time.monotonic() - start_time
+                if elapsed >= deadline:
+                    with self._lock:
+                        self.stats["deadline_exceeded"] += 1
+                    raise DeadlineExceededError(f"Call did not complete within the {deadline:.1f}s deadline")
+                
+                if self.enabled and hedge is None and pending:
+                    # Primary is slow: fire the hedge
+                    hedge = self._start_task(func, primary=False)
+                    pending.add(hedge)
+                    with self._lock:
+                        self.stats["hedged"] += 1
+                    logger.info(f"Hedging slow call after {elapsed:.2f}s")
+                elif not pending:
+                    raise last_error
+        finally:
+            # The losing (or timed out) attempts are not needed any more
+            for task in pending:
+                task.cancel()
+    
+    def get_stats(self) -> Dict:
+        """
+        Get hedging counters and tail latencies.
+        
+        Returns:
+            Dictionary with calls, hedged, hedge_wins, deadline_exceeded,
+            hedge_rate, hedge_delay, p99_latency (what callers saw),
+            p99_primary_latency (what they would have seen without hedging)
+            and p99_improvement
+        """
+        with self._lock:
+            stats = dict(self.stats)
+            call_p99 = _percentile(list(self._call_latencies), 99)
+            primary_p99 = _percentile(list(self._primary_latencies), 99)
+        stats["hedge_rate"] = stats["hedged"] / stats["calls"] if stats["calls"] else 0.0
+        stats["hedge_delay"] = self.hedge_delay()
+        stats["p99_latency"] = call_p99
+        stats["p99_primary_latency"] = primary_p99
+        stats["p99_improvement"] = primary_p99 - call_p99 if call_p99 and primary_p99 else 0.0
+        return stats
@@ -0,0 +1,251 @@
+"""
+Content-addressed response cache for LLM calls.
+
+Responses are keyed on a hash of the model ID and the exact prompt and kept in
+two tiers: an in-memory LRU and an optional persistent SQLite file. Entries
+expire after a TTL and are invalidated when the prompt template changes.
+
+Controlled by environment variables:
+- LLM_CACHE: "off", "memory" (default) or "disk" (memory + SQLite)
+- LLM_CACHE_PATH: SQLite file for the disk tier (default: .cache/llm_responses.sqlite3)
+- LLM_CACHE_TTL: entry lifetime in seconds (default: 86400)
+- LLM_CACHE_MAX_ENTRIES: in-memory LRU capacity (default: 256)
+"""
+
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+
+from config import get_env, get_float, get_int
+
+logger = logging.getLogger('kyc_bot.llm_cache')
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(__file__), '.cache', 'llm_responses.sqlite3')
+CACHE_MODES = ("off", "memory", "disk")
+
+
+def template_fingerprint(template: str) -> str:
+    """
+    Fingerprint a prompt template so cached responses can be tied to it.
+    
+    Args:
+        template: The prompt template text
+    
+    Returns:
+        Short hex digest of the template
+    """
+    return hashlib.sha256(template.encode("utf-8")).hexdigest()[:16]
+
+
+class ResponseCache:
+    """
+    Two-tier (memory LRU + SQLite) cache of LLM response texts.
+    
+    Thread-safe. Disk entries written under a different template fingerprint
+    are purged when the cache is opened.
+    """
+    
+    def __init__(
+        self,
+        template_version: str,
+        ttl: float = 86400,
+        max_entries: int = 256,
+        path: Optional[str] = None
+    ):
+        """
+        Initialize the cache.
+        
+        Args:
+            template_version: Fingerprint of the prompt template (see template_fingerprint)
+            ttl: Entry lifetime in seconds
+            max_entries: Capacity of the in-memory LRU tier
+            path: SQLite file for the persistent tier (None = memory only)
+        """
+        self.template_version = template_version
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.path = path
+        self._memory: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "writes": 0}
+        
+        if self.path:
+            self._init_disk()
+    
+    @contextmanager
+    def _connect(self):
+        """Open a short-lived connection that commits and closes on exit."""
+        conn = sqlite3.connect(self.path, timeout=5)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+    
+    def _init_disk(self):
+        """Create the table and drop entries from other template versions."""
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, template_version TEXT, response TEXT, created_at REAL)"
+            )
+            purged = conn.execute(
+                "DELETE FROM responses WHERE template_version != ?", (self.template_version,)
+            ).rowcount
+        if purged:
+            logger.info(f"Purged {purged} cached response(s) from previous prompt templates")
+    
+    def make_key(self, model_id: str, prompt: str) -> str:
+        """
+        Build the content address for a request.
+        
+        Args:
+            model_id: Model identifier
+            prompt: The exact prompt text
+        
+        Returns:
+            Hex SHA-256 digest of template version, model ID and prompt
+        """
+        payload = f"{self.template_version}\0{model_id}\0{prompt}"
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    
+    def get(self, model_id: str, prompt: str) -> Optional[str]:
+        """
+        Look up a cached response.
+        
+        Args:
+            model_id: Model identifier
+            prompt: The exact prompt text
+        
+        Returns:
+            The cached response text, or None on a miss or expired entry
+        """
+        key = self.make_key(model_id, prompt)
+        now = time.time()
+        
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry and now - entry[1] < self.ttl:
+                self._memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return entry[0]
+            if entry:
+                del self._memory[key]
+        
+        if self.path:
+            with self._connect() as conn:
+                row = conn.execute(
+                    "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+            if row and now - row[1] < self.ttl:
+                with self._lock:
+                    self._remember(key, row[0], row[1])
+                    self.stats["disk_hits"] += 1
+                return row[0]
+        
+        with self._lock:
+            self.stats["misses"] += 1
+        return None
+    
+    def put(self, model_id: str, prompt: str, response: str):
+        """
+        Store a response in both tiers.
+        
+        Args:
+            model_id: Model identifier
+            prompt: The exact prompt text
+            response: Response text to cache
+        """
+        key = self.make_key(model_id, prompt)
+        created_at = time.time()
+        
+        with self._lock:
+            self._remember(key, response, created_at)
+            self.stats["writes"] += 1
+        
+        if self.path:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO responses (key, template_version, response, created_at) "
+                    "VALUES (?, ?, ?, ?)",
+                    (key, self.template_version, response, created_at)
+                )
+    
+    def delete(self, model_id: str, prompt: str):
+        """
+        Remove a response from both tiers, e.g. one that no longer parses.
+        
+        Args:
+            model_id: Model identifier
+            prompt: The exact prompt text
+        """
+        key = self.make_key(model_id, prompt)
+        with self._lock:
+            self._memory.pop(key, None)
+        if self.path:
+            with self._connect() as conn:
+                conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+    
+    def _remember(self, key: str, response: str, created_at: float):
+        # Caller holds self._lock
+        self._memory[key] = (response, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+    
+    def clear(self):
+        """Remove all entries from both tiers."""
+        with self._lock:
+            self._memory.clear()
+        if self.path:
+            with self._connect() as conn:
+                conn.execute("DELETE FROM responses")
+    
+    def get_stats(self) -> Dict:
+        """
+        Get hit/miss counters.
+        
+        Returns:
+            Dictionary with memory_hits, disk_hits, misses, writes,
+            memory_entries and hit_ratio
+        """
+        with self._lock:
+            stats = dict(self.stats)
+            stats["memory_entries"] = len(self._memory)
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_ratio"] = (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+        return stats
+
+
+def create_response_cache(template: str) -> Optional[ResponseCache]:
+    """
+    Create a response cache for a prompt template from the environment.
+    
+    Args:
+        template: The prompt template whose responses will be cached
+    
+    Returns:
+        A ResponseCache, or None when LLM_CACHE=off
+    
+    Raises:
+        ValueError: If LLM_CACHE is set to an unknown value
+    """
+    mode = get_env("LLM_CACHE", "memory").lower()
+    if mode not in CACHE_MODES:
+        raise ValueError(f"Unknown LLM_CACHE mode: {mode}. Use one of {', '.join(CACHE_MODES)}.")
+    if mode == "off":
+        return None
+    
+    return ResponseCache(
+        template_version=template_fingerprint(template),
+        ttl=get_float("LLM_CACHE_TTL", 86400.0),
+        max_entries=get_int("LLM_CACHE_MAX_ENTRIES", 256),
+        path=get_env("LLM_CACHE_PATH", DEFAULT_CACHE_PATH) if mode == "disk" else None
+    )
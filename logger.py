@@ -6,10 +6,14 @@ features for the multi-agent system.
 """
 
 import logging
+import math
 import time
 import json
+import hashlib
+import threading
+from collections import deque
 from datetime import datetime
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 from functools import wraps
 from contextlib import contextmanager
 
@@ -58,10 +62,74 @@ workflow_logger = logging.getLogger('kyc_bot.workflow')
 api_logger = logging.getLogger('kyc_bot.api')
 
 
+# Upper bucket bounds of the LLM usage histograms
+LLM_HISTOGRAM_BUCKETS = {
+    'input_tokens': (100, 250, 500, 1000, 2000, 4000, 8000),
+    'output_tokens': (50, 100, 250, 500, 1000, 2000),
+    'ttft_seconds': (0.25, 0.5, 1, 2, 4, 8, 16),
+    'tokens_per_second': (10, 25, 50, 100, 200, 400)
+}
+
+
+class Histogram:
+    """Fixed-bucket histogram that also keeps recent values for percentiles."""
+    
+    def __init__(self, buckets: tuple, window: int = 1000):
+        """
+        Initialize the histogram.
+        
+        Args:
+            buckets: Ascending upper bounds; larger values fall in "+Inf"
+            window: Number of recent values kept for percentiles
+        """
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.recent = deque(maxlen=window)
+    
+    def observe(self, value: float):
+        """Add one observation."""
+        index = next((i for i, bound in enumerate(self.buckets) if value <= bound), len(self.buckets))
+        self.counts[index] += 1
+        self.count += 1
+        self.total += value
+        self.recent.append(value)
+    
+    def _percentile(self, pct: float) -> float:
+        ordered = sorted(self.recent)
+        if not ordered:
+            return 0.0
+        return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Get the histogram as a dictionary.
+        
+        Returns:
+            Dictionary with count, sum, mean, p50, p95, max and cumulative
+            bucket counts keyed by upper bound
+        """
+        cumulative = 0
+        buckets = {}
+        for bound, count in zip([str(bound) for bound in self.buckets] + ['+Inf'], self.counts):
+            cumulative += count
+            buckets[bound] = cumulative
+        return {
+            'count': self.count,
+            'sum': self.total,
+            'mean': self.total / self.count if self.count else 0.0,
+            'p50': self._percentile(50),
+            'p95': self._percentile(95),
+            'max': max(self.recent, default=0.0),
+            'buckets': buckets
+        }
+
+
 class PerformanceTracker:
     """Track performance metrics for agents and operations."""
     
-    def __init__(self):
+    def __init__(self, slowest_kept: int = 10):
         self.metrics: Dict[str, Any] = {
             'agent_executions': {},
             'api_calls': {},
@@ -69,6 +137,122 @@ class PerformanceTracker:
             'start_time': None,
             'end_time': None
         }
+        # LLM usage spans investigations, so start_investigation() does not reset it
+        self._llm_lock = threading.Lock()
+        self.slowest_kept = slowest_kept
+        self.reset_llm_usage()
+        # Workflow paths taken, also counted across investigations
+        self._paths_lock = threading.Lock()
+        self.graph_paths: Dict[str, int] = {}
+    
+    def track_graph_path(self, path: str):
+        """
+        Count one investigation taking a workflow path.
+        
+        Args:
+            path: Path name, e.g. "analysis", "sanctions_match" or "invalid_input"
+        """
+        with self._paths_lock:
+            self.graph_paths[path] = self.graph_paths.get(path, 0) + 1
+        workflow_logger.info(f"Workflow path taken: {path}")
+    
+    def get_graph_paths(self) -> Dict[str, int]:
+        """
+        Get how often each workflow path was taken.
+        
+        Returns:
+            Dictionary mapping path name to investigation count
+        """
+        with self._paths_lock:
+            return dict(self.graph_paths)
+    
+    def reset_llm_usage(self):
+        """Clear the LLM usage histograms."""
+        with self._llm_lock:
+            self.llm_histograms = {
+                name: Histogram(buckets) for name, buckets in LLM_HISTOGRAM_BUCKETS.items()
+            }
+            self.llm_endpoints: Dict[str, Dict[str, float]] = {}
+            self.llm_slowest: List[Dict[str, Any]] = []
+    
+    def track_llm_usage(self, endpoint: str, model: str, prompt: str, input_tokens: int,
+                        output_tokens: int, latency: float, ttft: Optional[float] = None):
+        """
+        Track token counts and timing of one LLM request.
+        
+        Args:
+            endpoint: Call label, e.g. "generate_content (small)"
+            model: Model that served the request
+            prompt: Prompt sent (only its fingerprint is kept)
+            input_tokens: Prompt tokens
+            output_tokens: Generated tokens
+            latency: Seconds until the full response arrived
+            ttft: Seconds until the first token arrived; the full latency
+                  for non-streamed calls
+        """
+        ttft = latency if ttft is None else ttft
+        tokens_per_second = output_tokens / latency if latency > 0 else 0.0
+        request = {
+            'timestamp': datetime.now().isoformat(),
+            'endpoint': endpoint,
+            'model': model,
+            'prompt_fingerprint': hashlib.sha256(prompt.encode('utf-8')).hexdigest()[:12],
+            'input_tokens': input_tokens,
+            'output_tokens': output_tokens,
+            'latency': latency,
+            'ttft': ttft,
+            'tokens_per_second': tokens_per_second
+        }
+        
+        with self._llm_lock:
+            self.llm_histograms['input_tokens'].observe(input_tokens)
+            self.llm_histograms['output_tokens'].observe(output_tokens)
+            self.llm_histograms['ttft_seconds'].observe(ttft)
+            self.llm_histograms['tokens_per_second'].observe(tokens_per_second)
+            
+            totals = self.llm_endpoints.setdefault(
+                endpoint, {'requests': 0, 'input_tokens': 0, 'output_tokens': 0, 'total_latency': 0.0}
+            )
+            totals['requests'] += 1
+            totals['input_tokens'] += input_tokens
+            totals['output_tokens'] += output_tokens
+            totals['total_latency'] += latency
+            
+            self.llm_slowest.append(request)
+            self.llm_slowest.sort(key=lambda item: item['latency'], reverse=True)
+            del self.llm_slowest[self.slowest_kept:]
+        
+        api_logger.info(
+            f"LLM usage: {endpoint} on {model}: {input_tokens} input / {output_tokens} output tokens, "
+            f"{latency:.2f}s, ttft {ttft:.2f}s, {tokens_per_second:.1f} tokens/s "
+            f"(prompt {request['prompt_fingerprint']})"
+        )
+    
+    def get_llm_metrics(self) -> Dict[str, Any]:
+        """
+        Get the LLM usage histograms.
+        
+        Returns:
+            Dictionary with:
+            - histograms: input_tokens, output_tokens, ttft_seconds and
+              tokens_per_second (see Histogram.snapshot)
+            - endpoints: per call label requests, tokens and average_latency
+            - slowest: the slowest requests with their prompt fingerprints
+        """
+        with self._llm_lock:
+            return {
+                'histograms': {name: histogram.snapshot() for name, histogram in self.llm_histograms.items()},
+                'endpoints': {
+                    endpoint: {
+                        'requests': totals['requests'],
+                        'input_tokens': totals['input_tokens'],
+                        'output_tokens': totals['output_tokens'],
+                        'average_latency': totals['total_latency'] / totals['requests']
+                    }
+                    for endpoint, totals in self.llm_endpoints.items()
+                },
+                'slowest': [dict(request) for request in self.llm_slowest]
+            }
     
     def start_investigation(self, customer_name: str):
         """Start tracking a new investigation."""
@@ -180,6 +364,8 @@ class PerformanceTracker:
                 )
             }
         
+        summary['llm'] = self.get_llm_metrics()
+        summary['graph_paths'] = self.get_graph_paths()
         return summary
     
     def log_summary(self):
@@ -210,6 +396,21 @@ class PerformanceTracker:
                 f"{data['success_count']} success, "
                 f"{data['error_count']} errors"
             )
+        llm_histograms = summary['llm']['histograms']
+        if llm_histograms['input_tokens']['count']:
+            workflow_logger.info("")
+            workflow_logger.info(
+                f"LLM Usage: {llm_histograms['input_tokens']['count']} requests, "
+                f"p95 {llm_histograms['input_tokens']['p95']:.0f} input / "
+                f"{llm_histograms['output_tokens']['p95']:.0f} output tokens, "
+                f"p95 ttft {llm_histograms['ttft_seconds']['p95']:.2f}s, "
+                f"median {llm_histograms['tokens_per_second']['p50']:.1f} tokens/s"
+            )
+        if summary['graph_paths']:
+            workflow_logger.info("")
+            workflow_logger.info(
+                "Workflow Paths: " + ", ".join(f"{path}={count}" for path, count in summary['graph_paths'].items())
+            )
         workflow_logger.info("=" * 60)
         
         # Also print to console for visibility
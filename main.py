@@ -5,40 +5,25 @@ This is the main entry point for the KYC Bot agent system.
 It orchestrates a sequential multi-agent workflow using LangGraph to automate KYC compliance checks.
 """
 
-import os
 import argparse
-from dotenv import load_dotenv
-from graph import create_workflow, AgentState
+import sys
+import uuid
+from config import load_env
+from graph import get_compiled_workflow, AgentState, format_errors
 from logger import performance_tracker, workflow_logger
 
-# Load environment variables
-# Try multiple methods to load .env file
-env_path = os.path.join(os.path.dirname(__file__), '.env')
-if os.path.exists(env_path):
-    load_dotenv(env_path, override=True)
-else:
-    load_dotenv(override=True)  # Fallback to default behavior
-
-# Verify API key is loaded, if not try to set from .env file directly
-if not os.getenv('GOOGLE_API_KEY'):
-    # Last resort: read .env file directly
-    try:
-        with open(env_path, 'r', encoding='utf-8') as f:
-            for line in f:
-                if line.startswith('GOOGLE_API_KEY='):
-                    api_key = line.split('=', 1)[1].strip()
-                    os.environ['GOOGLE_API_KEY'] = api_key
-                    break
-    except Exception:
-        pass
+# Load environment variables (a no-op if graph already did)
+load_env()
 
 
-def main(customer_name: str = None):
+def main(customer_name: str = None, investigation_id: str = None):
     """
     Main entry point for the KYC Bot.
     
     Args:
         customer_name: Optional customer name. If not provided, will be read from command line args.
+        investigation_id: Optional investigation ID. Re-running an ID resumes it:
+                          steps that already completed are restored from checkpoints.
         
     Returns:
         Dictionary with investigation results, or exit code if run from command line.
@@ -49,8 +34,11 @@ def main(customer_name: str = None):
     if customer_name is None:
         parser = argparse.ArgumentParser(description="KYC Bot - Automated KYC Compliance Agent")
         parser.add_argument("--name", type=str, required=True, help="Customer name to investigate")
+        parser.add_argument("--investigation-id", type=str, default=None,
+                            help="Investigation ID; reuse it to resume a failed investigation")
         args = parser.parse_args()
         customer_name = args.name
+        investigation_id = args.investigation_id
     
     # Validate customer name
     is_valid, error_msg = validate_customer_name(customer_name)
@@ -58,16 +46,20 @@ def main(customer_name: str = None):
         print(f"[ERROR] Invalid customer name: {error_msg}")
         return 1
     
+    investigation_id = investigation_id or uuid.uuid4().hex
+    
     # Initialize state
     initial_state: AgentState = {
+        "investigation_id": investigation_id,
         "customer_name": customer_name.strip(),
         "search_results": [],
         "watchlist_results": {},
         "final_report": "",
-        "error": ""
+        "risk_level": "",
+        "error": []
     }
     
-    print(f"[*] Starting KYC investigation for: {customer_name}")
+    print(f"[*] Starting KYC investigation for: {customer_name} (investigation ID: {investigation_id})")
     print("=" * 60)
     print()
     
@@ -78,9 +70,9 @@ def main(customer_name: str = None):
     workflow_logger.info("=" * 60)
     
     try:
-        # Create and run the LangGraph workflow
-        workflow = create_workflow()
-        workflow_logger.info("Workflow created successfully")
+        # Run the shared compiled LangGraph workflow
+        workflow = get_compiled_workflow()
+        workflow_logger.info("Workflow ready")
         
         # Execute the workflow
         final_state = workflow.invoke(initial_state)
@@ -93,7 +85,7 @@ def main(customer_name: str = None):
         print("=" * 60)
         
         if final_state.get("error"):
-            print(f"\n[!] Errors encountered: {final_state['error']}")
+            print(f"\n[!] Errors encountered: {format_errors(final_state['error'])}")
         
         print("\n[REPORT] FINAL RISK ASSESSMENT REPORT:")
         print("-" * 60)
@@ -102,6 +94,7 @@ def main(customer_name: str = None):
         
         # Summary statistics
         print("\n[SUMMARY]")
+        print(f"   - Risk Level: {final_state.get('risk_level') or 'UNKNOWN'}")
         print(f"   - Search Results: {len(final_state.get('search_results', []))} items found")
         print(f"   - Watchlists Checked: {len(final_state.get('watchlist_results', {}).get('watchlists_checked', []))}")
         print(f"   - Watchlist Matches: {len(final_state.get('watchlist_results', {}).get('matches', []))}")
@@ -126,7 +119,8 @@ def main(customer_name: str = None):
             "search_results": [],
             "watchlist_results": {},
             "final_report": "",
-            "error": str(e)
+            "risk_level": "",
+            "error": [str(e)]
         }
         
         # If called from command line, exit with code
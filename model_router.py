@@ -0,0 +1,145 @@
+"""
+Model tier routing for report generation.
+
+Investigations without a watchlist match and with little relevant adverse
+media go to a smaller, faster model; watchlist hits and heavy adverse media go
+to the larger model. Route decisions, per-tier latency and per-tier token
+counts are recorded.
+
+Controlled by environment variables:
+- MODEL_ROUTING: "on" (default) or "off" (always use the large model)
+- GEMINI_SMALL_MODEL: small tier model (default models/gemini-2.0-flash-lite)
+- GEMINI_LARGE_MODEL: large tier model (default models/gemini-2.0-flash-exp)
+- ROUTER_MAX_SMALL_HITS: most real search hits routed to the small tier (default 5)
+- ROUTER_MAX_SMALL_RELEVANCE: highest hit relevance routed to the small tier (default 0.75)
+"""
+
+import statistics
+import threading
+from collections import deque, namedtuple
+from typing import Any, Dict, List
+
+from config import get_env, get_flag, get_float, get_int
+from tools import calculate_hit_relevance, response_token_counts
+
+TIERS = ("small", "large")
+
+Route = namedtuple("Route", ["tier", "model_name", "reason"])
+
+
+class ModelRouter:
+    """Pick a model tier from investigation inputs and record per-tier usage."""
+    
+    def __init__(
+        self,
+        enabled: bool = True,
+        small_model: str = "models/gemini-2.0-flash-lite",
+        large_model: str = "models/gemini-2.0-flash-exp",
+        max_small_hits: int = 5,
+        max_small_relevance: float = 0.75
+    ):
+        """
+        Initialize the router.
+        
+        Args:
+            enabled: If False, every investigation goes to the large tier
+            small_model: Model name of the small tier
+            large_model: Model name of the large tier
+            max_small_hits: Most real search hits still routed to the small tier
+            max_small_relevance: Highest hit relevance still routed to the small tier
+        """
+        self.enabled = enabled
+        self.models = {"small": small_model, "large": large_model}
+        self.max_small_hits = max_small_hits
+        self.max_small_relevance = max_small_relevance
+        self._lock = threading.Lock()
+        self._tier_stats = {
+            tier: {"requests": 0, "latencies": deque(maxlen=1000), "prompt_tokens": 0, "output_tokens": 0}
+            for tier in TIERS
+        }
+    
+    @classmethod
+    def from_env(cls) -> "ModelRouter":
+        """Create a router from the MODEL_ROUTING / GEMINI_*_MODEL / ROUTER_* environment variables."""
+        return cls(
+            enabled=get_flag("MODEL_ROUTING", True),
+            small_model=get_env("GEMINI_SMALL_MODEL", "models/gemini-2.0-flash-lite"),
+            large_model=get_env("GEMINI_LARGE_MODEL", "models/gemini-2.0-flash-exp"),
+            max_small_hits=get_int("ROUTER_MAX_SMALL_HITS", 5),
+            max_small_relevance=get_float("ROUTER_MAX_SMALL_RELEVANCE", 0.75)
+        )
+    
+    def route(self, customer_name: str, search_results: List[Dict], watchlist_results: Dict) -> Route:
+        """
+        Choose the model tier for an investigation.
+        
+        Args:
+            customer_name: The customer name
+            search_results: Results from adverse media searches
+            watchlist_results: Results from watchlist checks
+        
+        Returns:
+            Route with tier, model_name and reason
+        """
+        if not self.enabled:
+            return self._route("large", "routing disabled")
+        if watchlist_results.get("matched") or watchlist_results.get("matches"):
+            return self._route("large", "watchlist match")
+        
+        real_hits = [result for result in search_results if not result.get("simulated")]
+        if len(real_hits) > self.max_small_hits:
+            return self._route("large", f"{len(real_hits)} search hits")
+        
+        top_relevance = max(
+            (calculate_hit_relevance(customer_name, hit) for hit in real_hits), default=0.0
+        )
+        if top_relevance > self.max_small_relevance:
+            return self._route("large", f"relevant search hit (score {top_relevance:.2f})")
+        
+        return self._route("small", f"no watchlist match, {len(real_hits)} hit(s), top relevance {top_relevance:.2f}")
+    
+    def _route(self, tier: str, reason: str) -> Route:
+        return Route(tier, self.models[tier], reason)
+    
+    def record(self, tier: str, latency: float, prompt: str, response: Any):
+        """
+        Record a completed call on a tier.
+        
+        Token counts come from the response's usage_metadata when available
+        and are estimated from the text otherwise (e.g. replayed responses).
+        
+        Args:
+            tier: Tier the call was routed to
+            latency: Call latency in seconds
+            prompt: Prompt sent to the model
+            response: Model response
+        """
+        prompt_tokens, output_tokens = response_token_counts(prompt, response)
+        
+        with self._lock:
+            stats = self._tier_stats[tier]
+            stats["requests"] += 1
+            stats["latencies"].append(latency)
+            stats["prompt_tokens"] += prompt_tokens
+            stats["output_tokens"] += output_tokens
+    
+    def get_stats(self) -> Dict[str, Dict]:
+        """
+        Get per-tier usage.
+        
+        Returns:
+            Dictionary keyed by tier with model, requests, mean_latency,
+            max_latency, prompt_tokens and output_tokens
+        """
+        with self._lock:
+            return {
+                tier: {
+                    "model": self.models[tier],
+                    "requests": stats["requests"],
+                    "mean_latency": statistics.mean(stats["latencies"]) if stats["latencies"] else 0.0,
+                    "max_latency": max(stats["latencies"], default=0.0),
+                    "prompt_tokens": stats["prompt_tokens"],
+                    "output_tokens": stats["output_tokens"]
+                }
+                for tier, stats in self._tier_stats.items()
+            }
@@ -0,0 +1,325 @@
+"""
+Token-budgeted prompt construction for AnalysisAgent.
+
+Gemini latency and cost scale with input tokens, so the analysis prompt is
+built against a fixed budget: duplicate snippets are merged, long snippets
+are truncated, results are ranked and cut to fit, and investigations with no
+evidence (no watchlist match and no relevant real search hit) get a compact
+prompt without the per-field instructions (the response schema already
+enforces the structure).
+
+Batch prompts pack several customers' evidence into one request; customers
+are grouped so each batch stays within its own token budget.
+
+Controlled by environment variables:
+- ANALYSIS_PROMPT_TOKENS: total prompt budget in estimated tokens (default 1000);
+  in batch prompts, the budget per customer section
+- ANALYSIS_SNIPPET_CHARS: maximum characters kept per snippet (default 300)
+- ANALYSIS_TOP_N: maximum number of search results forwarded (default 10)
+- ANALYSIS_BATCH_TOKENS: total budget of a batch prompt (default 6000)
+- ANALYSIS_BATCH_MAX: maximum customers per batch prompt (default 8)
+"""
+
+from typing import Dict, List, Tuple
+
+from config import get_int
+from tools import (
+    calculate_hit_relevance, deduplicate_search_results, rank_search_results, estimate_tokens, search_failed
+)
+
+
+# Full prompt, used when there is evidence to weigh (see PromptBuilder.is_compact)
+REPORT_PROMPT_TEMPLATE = """You are a KYC (Know Your Customer) compliance analyst. Analyze the following information and produce a risk assessment.
+
+Customer Name: {customer_name}
+
+ADVERSE MEDIA SEARCH RESULTS:
+{search_summary}
+
+WATCHLIST CHECK RESULTS:
+{watchlist_summary}
+
+Respond with a JSON object containing:
+- executive_summary: 2-3 sentences
+- risk_level: LOW, MEDIUM, or HIGH
+- findings: key findings from the adverse media search, one per item
+- watchlist_summary: summary of the watchlist check
+- recommendations: recommendations for the compliance officer, one per item
+- overall_assessment: overall assessment in 1-3 sentences"""
+
+# Compact prompt for investigations without a watchlist match or relevant hits
+COMPACT_PROMPT_TEMPLATE = """KYC risk assessment. Customer Name: {customer_name}
+
+ADVERSE MEDIA SEARCH RESULTS:
+{search_summary}
+
+WATCHLIST CHECK RESULTS: {watchlist_summary}"""
+
+# Batch prompt: one section per customer, answered as a list of assessments
+BATCH_PROMPT_TEMPLATE = """You are a KYC (Know Your Customer) compliance analyst. Analyze each customer below independently and produce a risk assessment for each.
+
+{customer_sections}
+
+Respond with a JSON object whose "assessments" list holds one entry per customer, with its customer_id and:
+- executive_summary: 2-3 sentences
+- risk_level: LOW, MEDIUM, or HIGH
+- findings: key findings from the adverse media search, one per item
+- watchlist_summary: summary of the watchlist check
+- recommendations: recommendations for the compliance officer, one per item
+- overall_assessment: overall assessment in 1-3 sentences"""
+
+BATCH_SECTION_TEMPLATE = """=== customer_id: {customer_id} ===
+Customer Name: {customer_name}
+
+ADVERSE MEDIA SEARCH RESULTS:
+{search_summary}
+
+WATCHLIST CHECK RESULTS: {watchlist_summary}"""
+
+# Their fingerprint is part of the LLM response cache key, so editing any
+# template invalidates cached reports (batch answers are cached per customer)
+PROMPT_TEMPLATES = (REPORT_PROMPT_TEMPLATE, COMPACT_PROMPT_TEMPLATE, BATCH_PROMPT_TEMPLATE, BATCH_SECTION_TEMPLATE)
+
+
+def truncate_snippet(text: str, max_chars: int) -> str:
+    """
+    Shorten a snippet to at most max_chars, cutting at a word boundary.
+    
+    Args:
+        text: Snippet text
+        max_chars: Maximum length including the trailing "..."
+    
+    Returns:
+        The snippet, unchanged if it already fits
+    """
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max(0, max_chars - 3)]
+    if " " in cut:
+        cut = cut[:cut.rindex(" ")]
+    return cut.rstrip(" ,;:") + "..."
+
+
+class PromptBuilder:
+    """Build the AnalysisAgent prompt within a token budget."""
+    
+    def __init__(
+        self,
+        token_budget: int = 1000,
+        snippet_chars: int = 300,
+        top_n: int = 10,
+        batch_token_budget: int = 6000,
+        max_batch_size: int = 8
+    ):
+        """
+        Initialize the builder.
+        
+        Args:
+            token_budget: Total prompt budget in estimated tokens (per customer
+                          section in batch prompts)
+            snippet_chars: Maximum characters kept per snippet
+            top_n: Maximum number of search results forwarded
+            batch_token_budget: Total budget of a batch prompt
+            max_batch_size: Maximum customers per batch prompt
+        """
+        self.token_budget = token_budget
+        self.snippet_chars = snippet_chars
+        self.top_n = top_n
+        self.batch_token_budget = batch_token_budget
+        self.max_batch_size = max_batch_size
+    
+    @classmethod
+    def from_env(cls) -> "PromptBuilder":
+        """Create a builder from the ANALYSIS_* environment variables."""
+        return cls(
+            token_budget=get_int("ANALYSIS_PROMPT_TOKENS", 1000),
+            snippet_chars=get_int("ANALYSIS_SNIPPET_CHARS", 300),
+            top_n=get_int("ANALYSIS_TOP_N", 10),
+            batch_token_budget=get_int("ANALYSIS_BATCH_TOKENS", 6000),
+            max_batch_size=get_int("ANALYSIS_BATCH_MAX", 8)
+        )
+    
+    def _fill(
+        self,
+        template: str,
+        customer_name: str,
+        search_results: List[Dict[str, str]],
+        watchlist_results: Dict,
+        **fields
+    ) -> Tuple[str, Dict]:
+        """Fill a template with the compacted evidence for one customer."""
+        watchlists = watchlist_results.get("watchlists_checked", [])
+        matched = bool(watchlist_results.get("matched") or watchlist_results.get("matches"))
+        
+        if matched:
+            watchlist_summary = f"""
+- Matched: True
+- Watchlists Checked: {', '.join(watchlists)}
+- Number of Matches: {len(watchlist_results.get('matches', []))}
+"""
+        else:
+            watchlist_summary = f"no matches on {', '.join(watchlists) or 'no watchlists'}"
+        
+        # Whatever the template and watchlist summary leave is the evidence budget
+        skeleton = template.format(
+            customer_name=customer_name, search_summary="", watchlist_summary=watchlist_summary, **fields
+        )
+        evidence_budget = max(0, self.token_budget - estimate_tokens(skeleton))
+        
+        stats = {
+            "results_input": len(search_results),
+            "results_forwarded": 0,
+            "duplicates_removed": 0,
+            "snippets_truncated": 0,
+            "matched": matched
+        }
+        
+        search_summary = "No adverse media found."
+        if search_results:
+            unique_results, dedup_stats = deduplicate_search_results(search_results)
+            stats["duplicates_removed"] = dedup_stats["duplicates_removed"]
+            
+            shortened = []
+            for result in unique_results:
+                snippet = result.get("snippet", "N/A")
+                short_snippet = truncate_snippet(snippet, self.snippet_chars)
+                if short_snippet != snippet:
+                    stats["snippets_truncated"] += 1
+                shortened.append({**result, "snippet": short_snippet})
+            
+            ranked_results = rank_search_results(
+                customer_name, shortened, top_n=self.top_n, token_budget=evidence_budget
+            )
+            stats["results_forwarded"] = len(ranked_results)
+            search_summary = "\n".join(
+                f"- {result.get('title', 'N/A')}: {result.get('snippet', 'N/A')}"
+                for result in ranked_results
+            )
+        
+        text = template.format(
+            customer_name=customer_name,
+            search_summary=search_summary,
+            watchlist_summary=watchlist_summary,
+            **fields
+        )
+        stats["prompt_tokens"] = estimate_tokens(text)
+        return text, stats
+    
+    def is_compact(self, customer_name: str, search_results: List[Dict[str, str]], watchlist_results: Dict) -> bool:
+        """
+        Decide whether an investigation gets the compact template.
+        
+        Args:
+            customer_name: The customer name
+            search_results: Results from adverse media searches
+            watchlist_results: Results from watchlist checks
+        
+        Returns:
+            True when there is no watchlist match, no failed search and no
+            real (non-simulated) search hit mentions the customer or a risk keyword
+        """
+        if watchlist_results.get("matched") or watchlist_results.get("matches"):
+            return False
+        if search_failed(search_results):
+            return False
+        return not any(
+            calculate_hit_relevance(customer_name, result) > 0
+            for result in search_results if not result.get("simulated")
+        )
+    
+    def build(
+        self,
+        customer_name: str,
+        search_results: List[Dict[str, str]],
+        watchlist_results: Dict
+    ) -> Tuple[str, Dict]:
+        """
+        Build the analysis prompt.
+        
+        The template and watchlist summary are laid out first; the search
+        evidence gets whatever is left of the budget. The most relevant result
+        is always included, so a very small budget can be exceeded.
+        
+        Args:
+            customer_name: The customer name
+            search_results: Results from adverse media searches
+            watchlist_results: Results from watchlist checks
+        
+        Returns:
+            Tuple of (prompt, stats) where stats contains:
+            - prompt_tokens: int - Estimated tokens of the prompt
+            - results_input / results_forwarded: int
+            - duplicates_removed / snippets_truncated: int
+            - compact: bool - Whether the compact template was used
+        """
+        compact = self.is_compact(customer_name, search_results, watchlist_results)
+        template = COMPACT_PROMPT_TEMPLATE if compact else REPORT_PROMPT_TEMPLATE
+        prompt, stats = self._fill(template, customer_name, search_results, watchlist_results)
+        stats.pop("matched")
+        stats["compact"] = compact
+        return prompt, stats
+    
+    def build_section(
+        self,
+        customer_id: str,
+        customer_name: str,
+        search_results: List[Dict[str, str]],
+        watchlist_results: Dict
+    ) -> Tuple[str, Dict]:
+        """
+        Build one customer's section of a batch prompt.
+        
+        Args:
+            customer_id: ID the model must echo back for this customer
+            customer_name: The customer name
+            search_results: Results from adverse media searches
+            watchlist_results: Results from watchlist checks
+        
+        Returns:
+            Tuple of (section, stats) with the same stats as build()
+        """
+        section, stats = self._fill(
+            BATCH_SECTION_TEMPLATE, customer_name, search_results, watchlist_results, customer_id=customer_id
+        )
+        stats.pop("matched")
+        return section, stats
+    
+    def build_batch(self, sections: List[str]) -> str:
+        """
+        Assemble a batch prompt from customer sections.
+        
+        Args:
+            sections: Sections from build_section()
+        
+        Returns:
+            The batch prompt
+        """
+        return BATCH_PROMPT_TEMPLATE.format(customer_sections="\n\n".join(sections))
+    
+    def plan_batches(self, section_tokens: List[int]) -> List[List[int]]:
+        """
+        Group customer sections into batches that fit the batch budget.
+        
+        Sections are packed in order until the next one would push the batch
+        prompt over batch_token_budget or the batch reaches max_batch_size, so
+        customers with little evidence share a request with more neighbours.
+        
+        Args:
+            section_tokens: Estimated tokens of each section
+        
+        Returns:
+            Batches as lists of section indices; every batch holds at least one section
+        """
+        overhead = estimate_tokens(BATCH_PROMPT_TEMPLATE.format(customer_sections=""))
+        batches: List[List[int]] = []
+        current: List[int] = []
+        tokens_used = overhead
+        for index, tokens in enumerate(section_tokens):
+            if current and (len(current) >= self.max_batch_size or tokens_used + tokens > self.batch_token_budget):
+                batches.append(current)
+                current, tokens_used = [], overhead
+            current.append(index)
+            tokens_used += tokens
+        if current:
+            batches.append(current)
+        return batches
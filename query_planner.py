@@ -0,0 +1,144 @@
+"""
+Search query planning from the watchlist result (watchlist-first ordering).
+
+When watchlist screening runs before the adverse media search (see
+graph.create_workflow(watchlist_first=True)), its result decides which
+queries the search issues:
+- watchlist match: one sanctions / adverse media query over the customer
+  name, the matched watchlist names and their aliases; no generic queries
+- clean result: the single combined query on the customer name, one API call
+- no usable watchlist result (screening failed): the SearchAgent's own
+  search mode, as in the default ordering
+
+Controlled by environment variables:
+- WATCHLIST_FIRST: "on" or "off" (default); workflow ordering, see graph.py
+- PLANNER_MAX_NAMES: most name variants in a watchlist match query (default 6)
+"""
+
+import threading
+from collections import namedtuple
+from typing import Dict, List, Optional
+
+from config import get_int
+from tools import (
+    format_alias_search_query, format_combined_search_query, get_watchlist_aliases, normalize_name
+)
+
+PLAN_KINDS = ("watchlist_match", "clean", "default")
+
+# Query types per plan: match queries skip the generic fraud template
+MATCH_QUERY_TYPES = ["sanctions", "adverse_media"]
+CLEAN_QUERY_TYPES = ["adverse_media", "fraud", "sanctions"]
+
+# queries is None for the "default" plan: the SearchAgent picks the queries
+QueryPlan = namedtuple("QueryPlan", ["kind", "queries", "reason"])
+
+
+class QueryPlanner:
+    """Plan the adverse media queries of an investigation from its watchlist result."""
+    
+    def __init__(self, max_names: int = 6):
+        """
+        Initialize the planner.
+        
+        Args:
+            max_names: Most name variants (customer name, listed names,
+                       aliases) OR'ed into a watchlist match query
+        """
+        self.max_names = max_names
+        self._lock = threading.Lock()
+        self.stats = {kind: 0 for kind in PLAN_KINDS}
+        self.stats["queries"] = 0
+    
+    @classmethod
+    def from_env(cls) -> "QueryPlanner":
+        """Create a planner from the PLANNER_MAX_NAMES environment variable."""
+        return cls(max_names=get_int("PLANNER_MAX_NAMES", 6))
+    
+    def plan(self, customer_name: str, watchlist_results: Dict) -> QueryPlan:
+        """
+        Choose the search queries for an investigation.
+        
+        Args:
+            customer_name: The customer name
+            watchlist_results: Results from watchlist checks
+        
+        Returns:
+            QueryPlan with kind, queries (None for the default search) and reason
+        """
+        if not watchlist_results or not watchlist_results.get("watchlists_checked"):
+            return self._plan("default", None, "no watchlist result")
+        
+        matches = watchlist_results.get("matches", [])
+        if watchlist_results.get("matched") and matches:
+            names = self.match_names(customer_name, matches)
+            watchlists = sorted({match.get("watchlist", "watchlist") for match in matches})
+            return self._plan(
+                "watchlist_match",
+                [format_alias_search_query(names, MATCH_QUERY_TYPES)],
+                f"{', '.join(watchlists)} match, {len(names)} name variant(s)"
+            )
+        
+        return self._plan(
+            "clean",
+            [format_combined_search_query(customer_name, CLEAN_QUERY_TYPES)],
+            "no watchlist match"
+        )
+    
+    def match_names(self, customer_name: str, matches: List[Dict]) -> List[str]:
+        """
+        Name variants to search for a watchlist match, best match first.
+        
+        Args:
+            customer_name: The customer name
+            matches: Watchlist matches (see tools.check_watchlist)
+        
+        Returns:
+            The customer name, then each matched listed name and its aliases,
+            without duplicates (compared normalized), at most max_names
+        """
+        names: List[str] = []
+        seen = set()
+        
+        def add(name: str):
+            key = normalize_name(name)
+            if key and key not in seen:
+                seen.add(key)
+                names.append(name)
+        
+        add(customer_name)
+        for match in sorted(matches, key=lambda match: match.get("similarity", 0.0), reverse=True):
+            add(match["name"])
+            for alias in get_watchlist_aliases(match.get("watchlist", ""), match["name"]):
+                add(alias)
+        return names[:self.max_names]
+    
+    def _plan(self, kind: str, queries: Optional[List[str]], reason: str) -> QueryPlan:
+        with self._lock:
+            self.stats[kind] += 1
+            self.stats["queries"] += len(queries) if queries else 0
+        return QueryPlan(kind, queries, reason)
+    
+    def get_stats(self) -> Dict[str, int]:
+        """
+        Get plan counts.
+        
+        Returns:
+            Dictionary with the number of plans per kind and the total
+            queries planned (default plans not counted)
+        """
+        with self._lock:
+            return dict(self.stats)
+
+
+_planner: Optional[QueryPlanner] = None
+_planner_lock = threading.Lock()
+
+
+def get_query_planner() -> QueryPlanner:
+    """Lazy initialization of the process-wide query planner from the environment."""
+    global _planner
+    with _planner_lock:
+        if _planner is None:
+            _planner = QueryPlanner.from_env()
+        return _planner
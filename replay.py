@@ -0,0 +1,338 @@
+"""
+Record/replay layer for the KYC Bot's external API calls.
+
+Captures real Google Custom Search and Gemini responses to local JSON
+fixtures and replays them offline with the recorded latency distribution,
+so the full LangGraph workflow can be benchmarked without network access.
+
+Controlled by environment variables:
+- REPLAY_MODE: "off" (default), "record" or "replay"
+- REPLAY_DIR: fixture directory (default: fixtures/replay next to this file)
+- REPLAY_SPEED: latency multiplier in replay mode (1.0 = real time, 0 = no delay)
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import random
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import get_env, get_float
+
+logger = logging.getLogger('kyc_bot.replay')
+
+DEFAULT_REPLAY_DIR = os.path.join(os.path.dirname(__file__), 'fixtures', 'replay')
+REPLAY_MODES = ("off", "record", "replay")
+
+
+class ReplayMissError(LookupError):
+    """Raised in replay mode when no fixture was recorded for a request."""
+    pass
+
+
+def get_replay_mode() -> str:
+    """
+    Get the configured replay mode.
+    
+    Returns:
+        "off", "record" or "replay"
+    
+    Raises:
+        ValueError: If REPLAY_MODE is set to an unknown value
+    """
+    mode = get_env("REPLAY_MODE", "off").lower()
+    if mode not in REPLAY_MODES:
+        raise ValueError(f"Unknown REPLAY_MODE: {mode}. Use one of {', '.join(REPLAY_MODES)}.")
+    return mode
+
+
+class ReplayStore:
+    """
+    Fixture store for recorded API responses.
+    
+    Each distinct request is stored as one JSON file under <directory>/<kind>/
+    holding the request, the response and every latency observed for it.
+    Replaying a request sleeps for a latency sampled from those observations.
+    """
+    
+    def __init__(self, directory: str = DEFAULT_REPLAY_DIR, speed: float = 1.0, seed: Optional[int] = None):
+        """
+        Initialize the store.
+        
+        Args:
+            directory: Directory holding the fixture files
+            speed: Latency multiplier applied on replay (0 disables sleeping)
+            seed: Optional seed for latency sampling
+        """
+        self.directory = directory
+        self.speed = speed
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def make_key(kind: str, request: Dict[str, Any]) -> str:
+        """
+        Build the fixture key for a request.
+        
+        Args:
+            kind: Request kind (e.g. "search", "gemini")
+            request: JSON-serializable request parameters
+        
+        Returns:
+            Hex SHA-256 digest of the kind and canonical request JSON
+        """
+        payload = json.dumps({"kind": kind, "request": request}, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    
+    def _path(self, kind: str, key: str) -> str:
+        return os.path.join(self.directory, kind, f"{key}.json")
+    
+    def record(self, kind: str, request: Dict[str, Any], response: Any, latency: float):
+        """
+        Save a response and add its latency to the request's fixture.
+        
+        Args:
+            kind: Request kind
+            request: JSON-serializable request parameters
+            response: JSON-serializable response
+            latency: Observed latency in seconds
+        """
+        key = self.make_key(kind, request)
+        path = self._path(kind, key)
+        with self._lock:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            latencies: List[float] = []
+            if os.path.exists(path):
+                with open(path, 'r', encoding='utf-8') as f:
+                    latencies = json.load(f).get("latencies", [])
+            latencies.append(round(latency, 4))
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump({
+                    "kind": kind,
+                    "request": request,
+                    "response": response,
+                    "latencies": latencies
+                }, f, indent=2, ensure_ascii=False)
+        logger.debug(f"Recorded {kind} fixture {key[:12]} ({latency:.2f}s)")
+    
+    def lookup(self, kind: str, request: Dict[str, Any]) -> Tuple[Any, float]:
+        """
+        Load a recorded response and sample a latency for it.
+        
+        Args:
+            kind: Request kind
+            request: JSON-serializable request parameters
+        
+        Returns:
+            Tuple of (response, latency_in_seconds)
+        
+        Raises:
+            ReplayMissError: If the request was never recorded
+        """
+        key = self.make_key(kind, request)
+        path = self._path(kind, key)
+        if not os.path.exists(path):
+            raise ReplayMissError(f"No recorded {kind} fixture for request {key[:12]}")
+        with open(path, 'r', encoding='utf-8') as f:
+            fixture = json.load(f)
+        latencies = fixture.get("latencies") or [0.0]
+        with self._lock:
+            latency = self._random.choice(latencies)
+        return fixture["response"], latency
+    
+    def replay(self, kind: str, request: Dict[str, Any]) -> Any:
+        """
+        Return a recorded response after waiting for a sampled latency.
+        
+        Args:
+            kind: Request kind
+            request: JSON-serializable request parameters
+        
+        Returns:
+            The recorded response
+        
+        Raises:
+            ReplayMissError: If the request was never recorded
+        """
+        response, latency = self.lookup(kind, request)
+        if self.speed > 0:
+            time.sleep(latency * self.speed)
+        return response
+    
+    async def areplay(self, kind: str, request: Dict[str, Any]) -> Any:
+        """
+        Async variant of replay() that waits without blocking the event loop.
+        
+        Args:
+            kind: Request kind
+            request: JSON-serializable request parameters
+        
+        Returns:
+            The recorded response
+        
+        Raises:
+            ReplayMissError: If the request was never recorded
+        """
+        response, latency = self.lookup(kind, request)
+        if self.speed > 0:
+            await asyncio.sleep(latency * self.speed)
+        return response
+
+
+_store: Optional[ReplayStore] = None
+
+
+def get_replay_store() -> ReplayStore:
+    """Lazy initialization of the process-wide replay store from the environment."""
+    global _store
+    directory = get_env("REPLAY_DIR", DEFAULT_REPLAY_DIR)
+    speed = get_float("REPLAY_SPEED", 1.0)
+    if _store is None or _store.directory != directory or _store.speed != speed:
+        _store = ReplayStore(directory, speed=speed)
+    return _store
+
+
+def _search_request(params: Dict[str, Any]) -> Dict[str, Any]:
+    # The search engine ID differs between environments, so it is not part of the key
+    return {key: value for key, value in params.items() if key != "cx"}
+
+
+class _SearchRequest:
+    """Mimics the googleapiclient HttpRequest returned by cse().list()."""
+    
+    def __init__(self, store: ReplayStore, params: Dict[str, Any], inner: Any = None):
+        self._store = store
+        self._params = params
+        self._inner = inner
+    
+    def execute(self, **kwargs) -> Dict:
+        request = _search_request(self._params)
+        if self._inner is None:
+            return self._store.replay("search", request)
+        start_time = time.time()
+        response = self._inner.execute(**kwargs)
+        self._store.record("search", request, response, time.time() - start_time)
+        return response
+
+
+class _SearchResource:
+    """Mimics the cse() resource of the Custom Search service."""
+    
+    def __init__(self, store: ReplayStore, inner: Any = None):
+        self._store = store
+        self._inner = inner
+    
+    def list(self, **params) -> _SearchRequest:
+        inner_request = self._inner.list(**params) if self._inner is not None else None
+        return _SearchRequest(self._store, params, inner_request)
+
+
+class ReplaySearchService:
+    """
+    Drop-in replacement for the Custom Search service object.
+    
+    With an inner service it records every cse().list().execute() call;
+    without one it replays recorded responses and never touches the network.
+    """
+    
+    def __init__(self, store: ReplayStore, inner: Any = None):
+        self._store = store
+        self._inner = inner
+    
+    def cse(self) -> _SearchResource:
+        return _SearchResource(self._store, self._inner.cse() if self._inner is not None else None)
+
+
+class ReplayResponse:
+    """Minimal stand-in for a Gemini GenerateContentResponse."""
+    
+    def __init__(self, text: str):
+        self.text = text
+
+
+class ReplayModel:
+    """
+    Drop-in replacement for genai.GenerativeModel.
+    
+    With an inner model it records every generate_content() and
+    generate_content_async() call; without one it replays recorded responses
+    and never touches the network.
+    """
+    
+    def __init__(self, store: ReplayStore, model_name: str, inner: Any = None):
+        self._store = store
+        self._inner = inner
+        self.model_name = model_name
+    
+    def generate_content(self, prompt: str, stream: bool = False, **kwargs) -> Any:
+        request = {"model": self.model_name, "prompt": prompt}
+        if self._inner is None:
+            response = ReplayResponse(self._store.replay("gemini", request)["text"])
+            # A replayed stream delivers the whole text as one chunk
+            return [response] if stream else response
+        start_time = time.time()
+        if stream:
+            return self._record_stream(request, self._inner.generate_content(prompt, stream=True, **kwargs), start_time)
+        response = self._inner.generate_content(prompt, **kwargs)
+        self._store.record("gemini", request, {"text": response.text}, time.time() - start_time)
+        return response
+    
+    async def generate_content_async(self, prompt: str, **kwargs) -> Any:
+        request = {"model": self.model_name, "prompt": prompt}
+        if self._inner is None:
+            return ReplayResponse((await self._store.areplay("gemini", request))["text"])
+        start_time = time.time()
+        response = await self._inner.generate_content_async(prompt, **kwargs)
+        self._store.record("gemini", request, {"text": response.text}, time.time() - start_time)
+        return response
+    
+    def _record_stream(self, request: Dict[str, Any], stream: Any, start_time: float):
+        """Pass stream chunks through and record the full text once it ends."""
+        texts = []
+        for chunk in stream:
+            texts.append(getattr(chunk, "text", "") or "")
+            yield chunk
+        self._store.record("gemini", request, {"text": "".join(texts)}, time.time() - start_time)
+
+
+def wrap_search_service(service: Any) -> Any:
+    """
+    Wrap a Custom Search service according to REPLAY_MODE.
+    
+    Args:
+        service: The real service (may be None in replay mode)
+    
+    Returns:
+        The service itself ("off"), a recording wrapper ("record") or a
+        replaying stand-in ("replay")
+    """
+    mode = get_replay_mode()
+    if mode == "record" and service is not None:
+        return ReplaySearchService(get_replay_store(), inner=service)
+    if mode == "replay":
+        return ReplaySearchService(get_replay_store())
+    return service
+
+
+def wrap_model(model: Any, model_name: str) -> Any:
+    """
+    Wrap a Gemini model according to REPLAY_MODE.
+    
+    Args:
+        model: The real model (may be None in replay mode)
+        model_name: Model identifier, part of the fixture key
+    
+    Returns:
+        The model itself ("off"), a recording wrapper ("record") or a
+        replaying stand-in ("replay")
+    """
+    mode = get_replay_mode()
+    if mode == "record" and model is not None:
+        return ReplayModel(get_replay_store(), model_name, inner=model)
+    if mode == "replay":
+        return ReplayModel(get_replay_store(), model_name)
+    return model
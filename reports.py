@@ -0,0 +1,311 @@
+"""
+Structured risk assessments and their markdown rendering.
+
+AnalysisAgent asks Gemini for a JSON object matching REPORT_SCHEMA instead of
+free text, so the risk level is a field read rather than a regex over the
+report. The markdown report is rendered locally from that object; when the
+response is streamed, AssessmentStreamParser renders each section as soon as
+its field is complete.
+"""
+
+import json
+import time
+from typing import Any, Dict, List
+
+RISK_LEVELS = ("LOW", "MEDIUM", "HIGH")
+
+# Response schema for Gemini structured output (OpenAPI subset)
+REPORT_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "executive_summary": {"type": "string"},
+        "risk_level": {"type": "string", "enum": list(RISK_LEVELS)},
+        "findings": {"type": "array", "items": {"type": "string"}},
+        "watchlist_summary": {"type": "string"},
+        "recommendations": {"type": "array", "items": {"type": "string"}},
+        "overall_assessment": {"type": "string"}
+    },
+    "required": [
+        "executive_summary", "risk_level", "findings",
+        "watchlist_summary", "recommendations", "overall_assessment"
+    ]
+}
+
+REPORT_GENERATION_CONFIG = {
+    "response_mime_type": "application/json",
+    "response_schema": REPORT_SCHEMA
+}
+
+# Several customers in one response, each tagged with the ID from the prompt
+BATCH_REPORT_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "assessments": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {"customer_id": {"type": "string"}, **REPORT_SCHEMA["properties"]},
+                "required": ["customer_id"] + REPORT_SCHEMA["required"]
+            }
+        }
+    },
+    "required": ["assessments"]
+}
+
+BATCH_GENERATION_CONFIG = {
+    "response_mime_type": "application/json",
+    "response_schema": BATCH_REPORT_SCHEMA
+}
+
+# Sections of the rendered report, in order: (field, heading)
+REPORT_SECTIONS = (
+    ("executive_summary", "1. Executive Summary"),
+    ("risk_level", "2. Risk Level"),
+    ("findings", "3. Key Findings from Adverse Media Search"),
+    ("watchlist_summary", "4. Watchlist Check Summary"),
+    ("recommendations", "5. Recommendations for Compliance Officer"),
+    ("overall_assessment", "6. Overall Assessment")
+)
+
+
+def validate_field(field: str, value: Any) -> Any:
+    """
+    Validate one field of a structured assessment.
+    
+    Args:
+        field: REPORT_SCHEMA field name
+        value: The field's value from the model response
+    
+    Returns:
+        The value, with risk_level normalized to upper case
+    
+    Raises:
+        ValueError: If the value does not match the schema
+    """
+    if field == "risk_level":
+        risk_level = str(value).strip().upper()
+        if risk_level not in RISK_LEVELS:
+            raise ValueError(f"Model response has invalid risk_level: {value}")
+        return risk_level
+    if field in ("findings", "recommendations") and not isinstance(value, list):
+        raise ValueError(f"Model response field '{field}' must be a list")
+    return value
+
+
+def parse_assessment(response_text: str) -> Dict[str, Any]:
+    """
+    Parse and validate a structured assessment returned by the model.
+    
+    Args:
+        response_text: JSON text of the model response
+    
+    Returns:
+        Assessment dictionary with the REPORT_SCHEMA fields
+    
+    Raises:
+        ValueError: If the text is not JSON or does not match the schema
+    """
+    try:
+        assessment = json.loads(response_text)
+    except (TypeError, json.JSONDecodeError) as e:
+        raise ValueError(f"Model response is not valid JSON: {e}")
+    if not isinstance(assessment, dict):
+        raise ValueError("Model response is not a JSON object")
+    
+    missing = [field for field in REPORT_SCHEMA["required"] if field not in assessment]
+    if missing:
+        raise ValueError(f"Model response is missing fields: {', '.join(missing)}")
+    
+    for field in REPORT_SCHEMA["required"]:
+        assessment[field] = validate_field(field, assessment[field])
+    
+    return assessment
+
+
+def parse_batch_assessments(response_text: str, customer_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    Parse a batched response and split it into per-customer assessments.
+    
+    Assessments that do not match the schema or carry an unknown customer ID
+    are left out, so the caller can retry just the missing customers.
+    
+    Args:
+        response_text: JSON text of the model response (see BATCH_REPORT_SCHEMA)
+        customer_ids: IDs of the customers in the batch prompt
+    
+    Returns:
+        Dictionary mapping customer ID to its validated assessment
+    
+    Raises:
+        ValueError: If the response is not JSON or has no assessments list
+    """
+    try:
+        batch = json.loads(response_text)
+    except (TypeError, json.JSONDecodeError) as e:
+        raise ValueError(f"Model response is not valid JSON: {e}")
+    if not isinstance(batch, dict) or not isinstance(batch.get("assessments"), list):
+        raise ValueError("Model response has no assessments list")
+    
+    assessments = {}
+    for item in batch["assessments"]:
+        if not isinstance(item, dict):
+            continue
+        item = dict(item)
+        customer_id = str(item.pop("customer_id", ""))
+        if customer_id not in customer_ids or customer_id in assessments:
+            continue
+        try:
+            assessments[customer_id] = parse_assessment(json.dumps(item))
+        except ValueError:
+            continue
+    return assessments
+
+
+def _bullets(items: List[str]) -> str:
+    return "\n".join(f"- {item}" for item in items) if items else "- None"
+
+
+def render_report_header(customer_name: str) -> str:
+    """
+    Render the title and date lines that open every report.
+    
+    Args:
+        customer_name: The customer name
+    
+    Returns:
+        Markdown report header
+    """
+    return f"## KYC Risk Assessment Report - {customer_name}\n\n**Date:** {time.strftime('%Y-%m-%d')}\n"
+
+
+def render_section(field: str, value: Any) -> str:
+    """
+    Render one report section from an assessment field.
+    
+    Args:
+        field: A REPORT_SECTIONS field
+        value: The field's value
+    
+    Returns:
+        Markdown section, starting with the blank line that separates it
+        from the previous one
+    """
+    heading = dict(REPORT_SECTIONS)[field]
+    if field == "risk_level":
+        return f"\n**{heading}:** {value}\n"
+    body = _bullets(value) if isinstance(value, list) else value
+    return f"\n**{heading}:**\n\n{body}\n"
+
+
+def render_report(customer_name: str, assessment: Dict[str, Any]) -> str:
+    """
+    Render an assessment as the markdown risk report.
+    
+    Args:
+        customer_name: The customer name
+        assessment: Assessment dictionary (see parse_assessment)
+    
+    Returns:
+        Markdown report with the six standard sections
+    """
+    return render_report_header(customer_name) + "".join(
+        render_section(field, assessment[field]) for field, _ in REPORT_SECTIONS
+    )
+
+
+class AssessmentStreamParser:
+    """
+    Incremental reader of a streamed structured assessment.
+    
+    Gemini streams the JSON response in chunks. feed() returns the rendered
+    report text that became available: the header first, then each section
+    as soon as its field is complete. Gemini may emit the fields in another
+    order than the report (e.g. alphabetically), so the sections come in
+    arrival order; the concatenated output holds the same header and
+    sections as render_report(). The complete response is still validated
+    with parse_assessment() once the stream ends.
+    """
+    
+    def __init__(self, customer_name: str):
+        """
+        Initialize the parser.
+        
+        Args:
+            customer_name: The customer name, for the report header
+        """
+        self.customer_name = customer_name
+        self._buffer = ""
+        self._position = 0
+        self._opened = False
+        self._header_sent = False
+        self._fields: Dict[str, Any] = {}
+        self._completed: List[str] = []
+        self._decoder = json.JSONDecoder()
+    
+    def feed(self, text: str) -> str:
+        """
+        Add a chunk of the response.
+        
+        Args:
+            text: Next chunk of the JSON response text
+        
+        Returns:
+            Report text completed by this chunk ("" if none)
+        
+        Raises:
+            ValueError: If a completed field does not match the schema
+        """
+        self._buffer += text
+        self._read_fields()
+        
+        output = []
+        if self._opened and not self._header_sent:
+            self._header_sent = True
+            output.append(render_report_header(self.customer_name))
+        for field in self._completed:
+            output.append(render_section(field, self._fields[field]))
+        self._completed.clear()
+        return "".join(output)
+    
+    def _skip_whitespace(self, position: int) -> int:
+        while position < len(self._buffer) and self._buffer[position].isspace():
+            position += 1
+        return position
+    
+    def _read_fields(self):
+        # Consume complete "key": value pairs; stop at the first incomplete one
+        while True:
+            position = self._skip_whitespace(self._position)
+            if position >= len(self._buffer):
+                return
+            if not self._opened:
+                if self._buffer[position] != "{":
+                    raise ValueError("Model response is not a JSON object")
+                self._opened = True
+                self._position = position + 1
+                continue
+            if self._buffer[position] in ",}":
+                self._position = position + 1
+                continue
+            try:
+                key, end = self._decoder.raw_decode(self._buffer, position)
+                end = self._skip_whitespace(end)
+                if end >= len(self._buffer):
+                    return
+                if self._buffer[end] != ":":
+                    raise ValueError("Model response is not a JSON object")
+                end = self._skip_whitespace(end + 1)
+                if end >= len(self._buffer):
+                    return
+                value, end = self._decoder.raw_decode(self._buffer, end)
+            except json.JSONDecodeError:
+                # Incomplete so far; a truly invalid response fails parse_assessment()
+                return
+            if end >= len(self._buffer) and not isinstance(value, (str, list, dict)):
+                # A number or literal may continue in the next chunk
+                return
+            if key in REPORT_SCHEMA["properties"]:
+                if key not in self._fields:
+                    self._completed.append(key)
+                self._fields[key] = validate_field(key, value)
+            self._position = end
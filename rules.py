@@ -0,0 +1,222 @@
+"""
+Deterministic rule-based fast path for report generation.
+
+Provably clean investigations (no watchlist match and no real adverse media
+hits, only simulated results or none, and no failed search) always come back LOW risk from the
+model, so they get a templated LOW report without an LLM call. At the other end, an exact watchlist match
+mandates HIGH risk whatever the media says, so the workflow exits early with
+a templated HIGH report.
+
+Controlled by environment variables:
+- FAST_PATH: "on" (default) or "off"
+- FAST_PATH_MAX_HITS: most real (non-simulated) search hits still considered clean
+  (default 0: any real hit goes to the model)
+- FAST_PATH_MAX_RELEVANCE: opt-in, with FAST_PATH_MAX_HITS > 0: highest relevance of
+  those hits still considered clean (default 0.5, see tools.calculate_hit_relevance).
+  Relevance is a heuristic: a hit naming the customer without a listed keyword
+  ("jailed over Ponzi scheme") scores only 0.5
+- EARLY_EXIT: "on" (default) or "off"
+- EARLY_EXIT_SIMILARITY: lowest watchlist similarity treated as an exact match (default 0.99)
+"""
+
+from typing import Dict, List, Optional, Tuple
+
+from config import get_flag, get_float, get_int
+from tools import calculate_hit_relevance, search_failed
+
+
+class FastPathRules:
+    """Decide whether an investigation is clean enough to skip the LLM."""
+    
+    def __init__(self, enabled: bool = True, max_hit_relevance: float = 0.5, max_hits: int = 0):
+        """
+        Initialize the rules.
+        
+        Args:
+            enabled: Whether the fast path may be taken at all
+            max_hit_relevance: Highest hit relevance still considered clean,
+                               when max_hits allows real hits at all
+            max_hits: Most real search hits still considered clean (0: only
+                      simulated results or none)
+        """
+        self.enabled = enabled
+        self.max_hit_relevance = max_hit_relevance
+        self.max_hits = max_hits
+    
+    @classmethod
+    def from_env(cls) -> "FastPathRules":
+        """Create rules from the FAST_PATH* environment variables."""
+        return cls(
+            enabled=get_flag("FAST_PATH", True),
+            max_hit_relevance=get_float("FAST_PATH_MAX_RELEVANCE", 0.5),
+            max_hits=get_int("FAST_PATH_MAX_HITS", 0)
+        )
+    
+    def evaluate(
+        self,
+        customer_name: str,
+        search_results: List[Dict],
+        watchlist_results: Dict
+    ) -> Tuple[bool, str]:
+        """
+        Check whether the inputs are provably clean.
+        
+        Args:
+            customer_name: The customer name
+            search_results: Results from adverse media searches
+            watchlist_results: Results from watchlist checks
+            
+        Returns:
+            Tuple of (is_clean, reason)
+        """
+        if not self.enabled:
+            return False, "fast path disabled"
+        if watchlist_results.get("matched") or watchlist_results.get("matches"):
+            return False, "watchlist match"
+        if not watchlist_results.get("watchlists_checked"):
+            return False, "no watchlists checked"
+        if search_failed(search_results):
+            # Simulated stand-ins for a failed search say nothing about the customer
+            return False, "search failed"
+        
+        real_hits = [result for result in search_results if not result.get("simulated")]
+        if len(real_hits) > self.max_hits:
+            return False, f"{len(real_hits)} search hits"
+        
+        top_relevance = max(
+            (calculate_hit_relevance(customer_name, hit) for hit in real_hits), default=0.0
+        )
+        if top_relevance > self.max_hit_relevance:
+            return False, f"relevant search hit (score {top_relevance:.2f})"
+        
+        return True, (
+            f"no watchlist match, {len(real_hits)} real search hit(s) "
+            f"with top relevance {top_relevance:.2f}"
+        )
+
+
+class EarlyExitRules:
+    """Decide whether a watchlist match is exact enough to skip analysis."""
+    
+    def __init__(self, enabled: bool = True, min_similarity: float = 0.99):
+        """
+        Initialize the rules.
+        
+        Args:
+            enabled: Whether the early exit may be taken at all
+            min_similarity: Lowest match similarity treated as an exact match
+        """
+        self.enabled = enabled
+        self.min_similarity = min_similarity
+    
+    @classmethod
+    def from_env(cls) -> "EarlyExitRules":
+        """Create rules from the EARLY_EXIT* environment variables."""
+        return cls(
+            enabled=get_flag("EARLY_EXIT", True),
+            min_similarity=get_float("EARLY_EXIT_SIMILARITY", 0.99)
+        )
+    
+    def exact_match(self, watchlist_results: Dict) -> Optional[Dict]:
+        """
+        Find the strongest exact watchlist match.
+        
+        Args:
+            watchlist_results: Results from watchlist checks
+            
+        Returns:
+            The match with the highest similarity at or above min_similarity,
+            or None
+        """
+        if not self.enabled:
+            return None
+        exact_matches = [
+            match for match in watchlist_results.get("matches", [])
+            if match.get("similarity", 0.0) >= self.min_similarity
+        ]
+        return max(exact_matches, key=lambda match: match.get("similarity", 0.0), default=None)
+
+
+def clean_assessment(customer_name: str, search_results: List[Dict], watchlist_results: Dict) -> Dict:
+    """
+    Build the LOW-risk assessment for a clean investigation.
+    
+    Args:
+        customer_name: The customer name
+        search_results: Results from adverse media searches
+        watchlist_results: Results from watchlist checks
+        
+    Returns:
+        Assessment dictionary with the reports.REPORT_SCHEMA fields
+    """
+    watchlists = watchlist_results.get("watchlists_checked", [])
+    real_hits = [result for result in search_results if not result.get("simulated")]
+    
+    return {
+        "executive_summary": (
+            f"{customer_name} was screened against {len(watchlists)} watchlists with no matches, "
+            "and the adverse media search returned no relevant findings. "
+            "The customer presents a low risk profile."
+        ),
+        "risk_level": "LOW",
+        "findings": [
+            f"Search Results: {len(real_hits)} item(s) found, none linking {customer_name} "
+            "to fraud, sanctions or financial crime"
+        ],
+        "watchlist_summary": f"Watchlists Checked: {', '.join(watchlists)}. Watchlist Matches: 0.",
+        "recommendations": [
+            "Proceed with standard due diligence and onboarding.",
+            "Re-screen periodically as part of ongoing monitoring."
+        ],
+        "overall_assessment": (
+            "LOW risk. This report was produced by the deterministic fast path for clean "
+            "screening results; no LLM analysis was required."
+        )
+    }
+
+
+def sanctions_assessment(customer_name: str, search_results: List[Dict], watchlist_results: Dict, match: Dict) -> Dict:
+    """
+    Build the HIGH-risk assessment for an exact watchlist match.
+    
+    Args:
+        customer_name: The customer name
+        search_results: Results from adverse media searches
+        watchlist_results: Results from watchlist checks
+        match: The exact match (see EarlyExitRules.exact_match)
+        
+    Returns:
+        Assessment dictionary with the reports.REPORT_SCHEMA fields
+    """
+    watchlists = watchlist_results.get("watchlists_checked", [])
+    matches = watchlist_results.get("matches", [])
+    real_hits = [result for result in search_results if not result.get("simulated")]
+    
+    findings = [
+        f"{match.get('watchlist', 'Watchlist')} listing: {match.get('name', customer_name)} "
+        f"(similarity {match.get('similarity', 0.0):.2f})"
+        + (f", reason: {match['reason']}" if match.get("reason") else "")
+        + (f", country: {match['country']}" if match.get("country") else "")
+    ]
+    findings.append(f"Search Results: {len(real_hits)} item(s) found; not required for this assessment")
+    
+    return {
+        "executive_summary": (
+            f"{customer_name} exactly matches an entry on the {match.get('watchlist', 'sanctions')} watchlist. "
+            "An exact sanctions match mandates a high risk rating regardless of adverse media."
+        ),
+        "risk_level": "HIGH",
+        "findings": findings,
+        "watchlist_summary": (
+            f"Watchlists Checked: {', '.join(watchlists)}. Watchlist Matches: {len(matches)}."
+        ),
+        "recommendations": [
+            "Do not onboard or transact with this customer.",
+            "Escalate to the compliance officer and file any required reports."
+        ],
+        "overall_assessment": (
+            "HIGH risk. This report was produced by the deterministic early exit for an exact "
+            "watchlist match; no LLM analysis was required."
+        )
+    }
+
@@ -0,0 +1,304 @@
+"""
+Local stand-in for the Google Custom Search JSON API.
+
+Serves GET /customsearch/v1 in the cse.list response format with configurable
+per-request latency, 429/5xx error injection and result fixtures, so retry and
+concurrency behaviour can be measured under realistic failure rates.
+
+Start it and point SearchAgent at it:
+
+    python search_stub_server.py --port 8765 --latency lognormal:0.3,0.4 --rate-429 0.05 --rate-5xx 0.02
+    GOOGLE_SEARCH_ENDPOINT=http://127.0.0.1:8765 python main.py --name "John Smith"
+
+GET /stats returns request and injected-error counters.
+"""
+
+import argparse
+import json
+import logging
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional
+from urllib.parse import urlsplit, parse_qs
+
+logger = logging.getLogger('kyc_bot.search_stub')
+
+
+def parse_latency_spec(spec: str, rng: Optional[random.Random] = None) -> Callable[[], float]:
+    """
+    Build a latency sampler from a "distribution:params" spec.
+    
+    Supported specs (seconds):
+    - fixed:S
+    - uniform:LOW,HIGH
+    - normal:MEAN,STDDEV (clipped at 0)
+    - lognormal:MEDIAN,SIGMA
+    - exponential:MEAN
+    
+    Args:
+        spec: Latency specification, e.g. "lognormal:0.3,0.4"
+        rng: Random generator to sample from
+    
+    Returns:
+        Function returning one latency sample in seconds
+    
+    Raises:
+        ValueError: If the spec is malformed or the distribution unknown
+    """
+    rng = rng or random.Random()
+    name, _, params = spec.partition(":")
+    try:
+        values = [float(value) for value in params.split(",")] if params else []
+    except ValueError:
+        raise ValueError(f"Invalid latency parameters: {spec}")
+    
+    samplers = {
+        "fixed": (1, lambda v: v[0]),
+        "uniform": (2, lambda v: rng.uniform(v[0], v[1])),
+        "normal": (2, lambda v: max(0.0, rng.gauss(v[0], v[1]))),
+        "lognormal": (2, lambda v: v[0] * rng.lognormvariate(0.0, v[1])),
+        "exponential": (1, lambda v: rng.expovariate(1.0 / v[0]) if v[0] > 0 else 0.0),
+    }
+    if name not in samplers:
+        raise ValueError(f"Unknown latency distribution: {name}. Use one of {', '.join(samplers)}.")
+    param_count, sampler = samplers[name]
+    if len(values) != param_count:
+        raise ValueError(f"Latency distribution '{name}' takes {param_count} parameter(s): {spec}")
+    return lambda: sampler(values)
+
+
+def load_fixtures(path: str) -> List[Dict]:
+    """
+    Load result fixtures from a JSON file.
+    
+    The file holds a list of {"match": "<substring of q>", "items": [...]}
+    entries. The first entry whose match string occurs in the query (case
+    insensitive) supplies the results; an entry with match "" is a catch-all.
+    
+    Args:
+        path: Path to the fixtures file
+    
+    Returns:
+        List of fixture entries
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        fixtures = json.load(f)
+    if not isinstance(fixtures, list):
+        raise ValueError("Fixtures file must contain a list of {\"match\", \"items\"} entries")
+    return fixtures
+
+
+class StubSearchServer:
+    """
+    Threaded HTTP server that answers Custom Search cse.list requests.
+    
+    Can be run from the command line or started in-process (start()/stop())
+    by tests and benchmarks.
+    """
+    
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: str = "fixed:0",
+        rate_429: float = 0.0,
+        rate_5xx: float = 0.0,
+        fixtures: Optional[List[Dict]] = None,
+        seed: Optional[int] = None
+    ):
+        """
+        Initialize the server.
+        
+        Args:
+            host: Interface to bind
+            port: Port to bind (0 picks a free port)
+            latency: Latency spec, see parse_latency_spec()
+            rate_429: Fraction of requests answered with HTTP 429
+            rate_5xx: Fraction of requests answered with HTTP 503
+            fixtures: Result fixtures, see load_fixtures(); no fixtures means
+                      every query returns no items
+            seed: Optional seed for latency and error sampling
+        """
+        self._random = random.Random(seed)
+        self._random_lock = threading.Lock()
+        self.sample_latency = parse_latency_spec(latency, self._random)
+        self.rate_429 = rate_429
+        self.rate_5xx = rate_5xx
+        self.fixtures = fixtures or []
+        self.stats = {"requests": 0, "responses_200": 0, "responses_429": 0, "responses_5xx": 0}
+        self._stats_lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+    
+    @property
+    def url(self) -> str:
+        """Base URL to use as GOOGLE_SEARCH_ENDPOINT."""
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+    
+    def _count(self, key: str):
+        with self._stats_lock:
+            self.stats[key] += 1
+    
+    def _draw(self) -> Dict[str, float]:
+        # Sample under a lock: handler threads share one generator
+        with self._random_lock:
+            return {"latency": self.sample_latency(), "roll": self._random.random()}
+    
+    def find_items(self, query: str) -> List[Dict]:
+        """
+        Find the fixture items for a query.
+        
+        Args:
+            query: The q parameter of the request
+        
+        Returns:
+            List of result items (empty when no fixture matches)
+        """
+        query_lower = query.lower()
+        for fixture in self.fixtures:
+            if fixture.get("match", "").lower() in query_lower:
+                return fixture.get("items", [])
+        return []
+    
+    def build_response(self, params: Dict[str, str]) -> Dict:
+        """
+        Build a cse.list JSON response for the request parameters.
+        
+        Args:
+            params: Query string parameters (q, num, start, ...)
+        
+        Returns:
+            Response body in the Custom Search format
+        """
+        query = params.get("q", "")
+        num = int(params.get("num", 10))
+        start = int(params.get("start", 1))
+        all_items = self.find_items(query)
+        page = all_items[start - 1:start - 1 + num]
+        
+        response = {
+            "kind": "customsearch#search",
+            "queries": {
+                "request": [{"searchTerms": query, "count": len(page), "startIndex": start}]
+            },
+            "searchInformation": {"totalResults": str(len(all_items))}
+        }
+        if page:
+            response["items"] = [
+                {
+                    "kind": "customsearch#result",
+                    "title": item.get("title", ""),
+                    "link": item.get("link", ""),
+                    "displayLink": urlsplit(item.get("link", "")).netloc,
+                    "snippet": item.get("snippet", "")
+                }
+                for item in page
+            ]
+        return response
+    
+    def _make_handler(self):
+        server = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            def _send_json(self, status: int, body: Dict):
+                payload = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json; charset=UTF-8")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+            
+            def do_GET(self):
+                parts = urlsplit(self.path)
+                if parts.path == "/stats":
+                    with server._stats_lock:
+                        self._send_json(200, dict(server.stats))
+                    return
+                if parts.path.rstrip("/") != "/customsearch/v1":
+                    self._send_json(404, {"error": {"code": 404, "message": "Not found"}})
+                    return
+                
+                server._count("requests")
+                draw = server._draw()
+                time.sleep(draw["latency"])
+                
+                if draw["roll"] < server.rate_429:
+                    server._count("responses_429")
+                    self._send_json(429, {"error": {
+                        "code": 429, "status": "RESOURCE_EXHAUSTED",
+                        "message": "Quota exceeded for quota metric 'Queries'"
+                    }})
+                    return
+                if draw["roll"] < server.rate_429 + server.rate_5xx:
+                    server._count("responses_5xx")
+                    self._send_json(503, {"error": {
+                        "code": 503, "status": "UNAVAILABLE", "message": "The service is currently unavailable."
+                    }})
+                    return
+                
+                params = {key: values[0] for key, values in parse_qs(parts.query).items()}
+                server._count("responses_200")
+                self._send_json(200, server.build_response(params))
+            
+            def log_message(self, format, *args):
+                logger.debug(format % args)
+        
+        return Handler
+    
+    def start(self) -> "StubSearchServer":
+        """Serve requests on a background thread."""
+        self._thread = threading.Thread(
+            target=self._httpd.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True
+        )
+        self._thread.start()
+        logger.info(f"Stub search server listening on {self.url}")
+        return self
+    
+    def stop(self):
+        """Stop serving and release the port."""
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread:
+            self._thread.join()
+    
+    def serve_forever(self):
+        """Serve requests on the current thread until interrupted."""
+        logger.info(f"Stub search server listening on {self.url}")
+        try:
+            self._httpd.serve_forever()
+        finally:
+            self._httpd.server_close()
+
+
+def main():
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Local stand-in for the Google Custom Search API")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to bind")
+    parser.add_argument("--port", type=int, default=8765, help="Port to bind")
+    parser.add_argument("--latency", default="fixed:0", help="Latency spec, e.g. lognormal:0.3,0.4")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="Fraction of requests answered with 429")
+    parser.add_argument("--rate-5xx", type=float, default=0.0, help="Fraction of requests answered with 503")
+    parser.add_argument("--fixtures", help="JSON file with [{\"match\": ..., \"items\": [...]}] entries")
+    parser.add_argument("--seed", type=int, help="Random seed")
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.INFO)
+    server = StubSearchServer(
+        host=args.host,
+        port=args.port,
+        latency=args.latency,
+        rate_429=args.rate_429,
+        rate_5xx=args.rate_5xx,
+        fixtures=load_fixtures(args.fixtures) if args.fixtures else None,
+        seed=args.seed
+    )
+    print(f"[+] Stub search server on {server.url} (set GOOGLE_SEARCH_ENDPOINT={server.url})")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
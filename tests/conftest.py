@@ -3,8 +3,10 @@ Pytest configuration and fixtures for KYC Bot tests.
 """
 
 import pytest
+import asyncio
 import os
-from unittest.mock import patch
+import json
+from unittest.mock import AsyncMock, Mock, patch
 
 
 @pytest.fixture(autouse=True)
@@ -12,7 +14,9 @@ def setup_test_environment():
     """Set up test environment variables."""
     with patch.dict(os.environ, {
         'GOOGLE_API_KEY': 'test_api_key_for_testing',
-        'GOOGLE_SEARCH_ENGINE_ID': 'test_search_engine_id'
+        'GOOGLE_SEARCH_ENGINE_ID': 'test_search_engine_id',
+        # Checkpoint tests opt in with a temporary file
+        'CHECKPOINTS': 'off'
     }):
         yield
 
@@ -62,3 +66,101 @@ def sample_watchlist_results_with_match():
         ]
     }
 
+
+
+@pytest.fixture
+def sample_assessment():
+    """Fixture providing a structured assessment as returned by Gemini."""
+    return {
+        "executive_summary": "Vladimir Petrov matches the OFAC sanctions list.",
+        "risk_level": "HIGH",
+        "findings": ["Listed on OFAC for sanctions evasion"],
+        "watchlist_summary": "1 match on OFAC.",
+        "recommendations": ["Do not onboard", "Escalate to compliance"],
+        "overall_assessment": "HIGH risk due to a confirmed sanctions match."
+    }
+
+
+@pytest.fixture
+def sample_assessment_json(sample_assessment):
+    """Fixture providing the structured assessment as Gemini response text."""
+    return json.dumps(sample_assessment)
+
+
+class MockAgents(tuple):
+    """
+    (search, watchlist, analysis) mock agents; patched() serves them from graph's agent getters.
+    
+    calls lists the agent methods called, in order; in_flight holds the
+    number of async searches running now and the most at once.
+    """
+    
+    def __new__(cls, agents, in_flight):
+        mock_agents = super().__new__(cls, agents)
+        mock_agents.manager = Mock()
+        for name, agent in zip(("search", "watchlist", "analysis"), agents):
+            mock_agents.manager.attach_mock(agent, name)
+        mock_agents.in_flight = in_flight
+        return mock_agents
+    
+    @property
+    def calls(self):
+        return [name.split(".")[-1] for name, _, _ in self.manager.mock_calls]
+    
+    def patched(self):
+        """Patch graph.get_search_agent, get_watchlist_agent, get_analysis_agent and get_agents."""
+        search, watchlist, analysis = self
+        return patch.multiple(
+            "graph",
+            get_search_agent=Mock(return_value=search),
+            get_watchlist_agent=Mock(return_value=watchlist),
+            get_analysis_agent=Mock(return_value=analysis),
+            get_agents=Mock(return_value=self)
+        )
+
+
+@pytest.fixture
+def make_agents():
+    """
+    Factory fixture for mock agents.
+    
+    make_agents(watchlist_results, search_results=None, assessment=None, delay=0.0)
+    returns MockAgents whose sync, async and batch methods answer with the
+    given results. Without an assessment, reports are LOW "Report for <name>";
+    async methods wait delay seconds first. Tests override single methods'
+    return_value or side_effect for other results, failures or timing.
+    """
+    def make(watchlist_results, search_results=None, assessment=None, delay=0.0):
+        in_flight = {"now": 0, "max": 0}
+        
+        def report(customer_name):
+            return dict(assessment) if assessment else {"risk_level": "LOW", "report": f"Report for {customer_name}"}
+        
+        async def asearch(customer_name, **kwargs):
+            in_flight["now"] += 1
+            in_flight["max"] = max(in_flight["max"], in_flight["now"])
+            await asyncio.sleep(delay)
+            in_flight["now"] -= 1
+            return list(search_results or [])
+        
+        async def aassess(customer_name, search, watchlist, **kwargs):
+            await asyncio.sleep(delay)
+            return report(customer_name)
+        
+        mock_search, mock_watchlist, mock_analysis = Mock(), Mock(), Mock()
+        mock_search.search_adverse_media.return_value = list(search_results or [])
+        mock_search.asearch_adverse_media = AsyncMock(side_effect=asearch)
+        mock_watchlist.check_watchlists.return_value = watchlist_results
+        mock_watchlist.acheck_watchlists = AsyncMock(return_value=watchlist_results)
+        mock_watchlist.check_watchlists_batch.side_effect = lambda names: [watchlist_results for _ in names]
+        if assessment:
+            mock_analysis.generate_assessment.return_value = assessment
+        else:
+            mock_analysis.generate_assessment.side_effect = lambda customer_name, *args, **kwargs: report(customer_name)
+        mock_analysis.agenerate_assessment = AsyncMock(side_effect=aassess)
+        mock_analysis.generate_reports_batch.side_effect = lambda customers: [
+            report(customer["customer_name"]) for customer in customers
+        ]
+        return MockAgents((mock_search, mock_watchlist, mock_analysis), in_flight)
+    
+    return make
@@ -3,10 +3,15 @@ Unit tests for agent classes (SearchAgent, WatchlistAgent, AnalysisAgent).
 """
 
 import pytest
+import asyncio
 import os
+import json
+import threading
+import time
 from unittest.mock import Mock, patch, MagicMock
 from agents import SearchAgent, WatchlistAgent, AnalysisAgent
 from error_handling import validate_customer_name
+from model_router import Route
 
 
 class TestSearchAgent:
@@ -62,7 +67,154 @@ class TestSearchAgent:
         results = agent.search_adverse_media("John Smith")
         assert isinstance(results, list)
         assert len(results) > 0  # Should have fallback results
+        # Error fallbacks are marked, unlike simulated results without a search engine
+        assert all(result["simulated"] and result["search_failed"] for result in results)
+    
+    @patch.dict(os.environ, {'GOOGLE_API_KEY': 'test_key', 'GOOGLE_SEARCH_ENGINE_ID': ''})
+    def test_search_without_engine_not_failed(self):
+        """Test simulated results without a search engine are not marked as a failed search."""
+        agent = SearchAgent()
+        agent.search_engine_id = None
+        
+        results = agent.search_adverse_media("John Smith")
+        assert all(result["simulated"] and "search_failed" not in result for result in results)
+    
+    @patch.dict(os.environ, {'GOOGLE_API_KEY': 'test_key', 'GOOGLE_SEARCH_ENGINE_ID': 'test_cx'})
+    def test_search_deduplicates_across_queries(self):
+        """Test the same article returned by every query appears once."""
+        agent = SearchAgent()
+        agent.search_service = Mock()
+        agent.search_service.cse.return_value.list.return_value.execute.return_value = {
+            'items': [
+                {'title': 'Test Result', 'snippet': 'Test snippet', 'link': 'https://example.com/a'}
+            ]
+        }
+        
+        results = agent.search_adverse_media("John Smith")
+        assert len(results) == 1
+        assert len(results[0]["queries"]) == 3
+        assert agent.get_search_stats()["duplicates_removed"] == 2
 
+    
+    @patch.dict(os.environ, {'GOOGLE_API_KEY': 'test_key', 'GOOGLE_SEARCH_ENGINE_ID': 'test_cx'})
+    def test_adaptive_search_clean_single_query(self):
+        """Test adaptive mode issues one query when no hit is relevant."""
+        agent = SearchAgent(search_mode="adaptive")
+        agent.search_service = Mock()
+        agent.search_service.cse.return_value.list.return_value.execute.return_value = {
+            'items': [
+                {'title': 'John Smith joins board', 'snippet': 'Appointed director', 'link': 'https://example.com'}
+            ]
+        }
+        
+        results = agent.search_adverse_media("John Smith")
+        assert len(results) == 1
+        assert agent.search_service.cse.return_value.list.call_count == 1
+        stats = agent.get_search_stats()
+        assert stats["fanouts"] == 0
+        assert stats["api_calls_per_search"] == 1
+    
+    @patch.dict(os.environ, {'GOOGLE_API_KEY': 'test_key', 'GOOGLE_SEARCH_ENGINE_ID': 'test_cx'})
+    def test_adaptive_search_fans_out_on_relevant_hit(self):
+        """Test adaptive mode runs narrower queries and an extra page on relevant hits."""
+        agent = SearchAgent(search_mode="adaptive")
+        agent.search_service = Mock()
+        agent.search_service.cse.return_value.list.return_value.execute.return_value = {
+            'items': [
+                {'title': 'John Smith charged with fraud', 'snippet': 'Embezzlement case', 'link': 'https://example.com'}
+            ]
+        }
+        
+        agent.search_adverse_media("John Smith")
+        list_calls = agent.search_service.cse.return_value.list.call_args_list
+        assert len(list_calls) == 4
+        assert list_calls[1].kwargs["start"] == 4
+        stats = agent.get_search_stats()
+        assert stats["fanouts"] == 1
+        assert stats["fanout_rate"] == 1.0
+    
+    @patch.dict(os.environ, {'GOOGLE_API_KEY': 'test_key', 'GOOGLE_SEARCH_ENGINE_ID': 'test_cx'})
+    def test_async_search_matches_sync(self):
+        """Test the async search issues the same queries and returns the same results."""
+        execute_result = {
+            'items': [
+                {'title': 'John Smith charged with fraud', 'snippet': 'Embezzlement case', 'link': 'https://example.com'}
+            ]
+        }
+        for search_mode in ("full", "adaptive"):
+            agent = SearchAgent(search_mode=search_mode)
+            agent.search_service = Mock()
+            agent.search_service.cse.return_value.list.return_value.execute.return_value = execute_result
+            
+            sync_results = agent.search_adverse_media("John Smith")
+            sync_calls = agent.search_service.cse.return_value.list.call_args_list
+            agent.search_service.cse.return_value.list.reset_mock()
+            async_results = asyncio.run(agent.asearch_adverse_media("John Smith"))
+            async_calls = agent.search_service.cse.return_value.list.call_args_list
+            
+            assert async_results == sync_results
+            # Queries run concurrently, so they may be issued in any order
+            assert sorted(map(str, async_calls)) == sorted(map(str, sync_calls))
+    
+    @patch.dict(os.environ, {'GOOGLE_API_KEY': 'test_key', 'GOOGLE_SEARCH_ENGINE_ID': 'test_cx'})
+    def test_planned_queries_replace_search_mode(self):
+        """Test planned queries are issued instead of the search mode's queries, sync and async."""
+        for search_mode in ("full", "adaptive"):
+            agent = SearchAgent(search_mode=search_mode)
+            agent.search_service = Mock()
+            agent.search_service.cse.return_value.list.return_value.execute.return_value = {
+                'items': [
+                    {'title': 'John Smith charged with fraud', 'snippet': 'Embezzlement case', 'link': 'https://example.com'}
+                ]
+            }
+            
+            agent.search_adverse_media("John Smith", queries=["planned query"])
+            asyncio.run(agent.asearch_adverse_media("John Smith", queries=["planned query"]))
+            
+            list_calls = agent.search_service.cse.return_value.list.call_args_list
+            assert [call.kwargs["q"] for call in list_calls] == ["planned query", "planned query"]
+            assert agent.get_search_stats()["fanouts"] == 0
+    
+    @patch.dict(os.environ, {'GOOGLE_API_KEY': 'test_key', 'GOOGLE_SEARCH_ENGINE_ID': 'test_cx', 'SEARCH_MAX_THREADS': '2'})
+    def test_async_search_thread_limit(self):
+        """Test async requests run in the agent's search pool, at most SEARCH_MAX_THREADS at once."""
+        agent = SearchAgent(search_mode="full")
+        lock = threading.Lock()
+        in_flight = {"now": 0, "max": 0, "threads": set()}
+        
+        def execute(**kwargs):
+            with lock:
+                in_flight["now"] += 1
+                in_flight["max"] = max(in_flight["max"], in_flight["now"])
+                in_flight["threads"].add(threading.current_thread().name)
+            time.sleep(0.02)
+            with lock:
+                in_flight["now"] -= 1
+            return {'items': []}
+        
+        agent.search_service = Mock()
+        agent.search_service.cse.return_value.list.return_value.execute.side_effect = execute
+        
+        async def investigate():
+            await asyncio.gather(*[agent.asearch_adverse_media(name) for name in ["John Smith", "Jane Roe", "Bob Brown"]])
+        
+        asyncio.run(investigate())
+        assert agent.max_threads == 2
+        assert in_flight["max"] == 2
+        assert all(name.startswith("search") for name in in_flight["threads"])
+    
+    @patch.dict(os.environ, {'GOOGLE_API_KEY': 'test_key', 'GOOGLE_SEARCH_ENGINE_ID': 'test_cx'})
+    def test_async_search_invalid_name(self):
+        """Test the async search rejects invalid names."""
+        agent = SearchAgent()
+        with pytest.raises(ValueError):
+            asyncio.run(agent.asearch_adverse_media(""))
+    
+    @patch.dict(os.environ, {'GOOGLE_API_KEY': 'test_key', 'GOOGLE_SEARCH_ENGINE_ID': 'test_cx'})
+    def test_invalid_search_mode(self):
+        """Test unknown search mode is rejected."""
+        with pytest.raises(ValueError, match="search mode"):
+            SearchAgent(search_mode="bogus")
 
 class TestWatchlistAgent:
     """Test WatchlistAgent functionality."""
@@ -100,6 +252,24 @@ class TestWatchlistAgent:
         results = agent.check_watchlists("John Smith")
         assert results["matched"] is False
         assert len(results["matches"]) == 0
+    
+    def test_acheck_watchlists(self):
+        """Test the async watchlist check returns the sync result."""
+        agent = WatchlistAgent()
+        assert asyncio.run(agent.acheck_watchlists("Vladimir Petrov")) == agent.check_watchlists("Vladimir Petrov")
+    
+    def test_check_watchlists_batch(self):
+        """Test batch watchlist checks match single checks, in order."""
+        agent = WatchlistAgent()
+        names = ["Vladimir Petrov", "John Smith"]
+        results = agent.check_watchlists_batch(names)
+        assert results == [agent.check_watchlists(name) for name in names]
+    
+    def test_check_watchlists_batch_invalid_name(self):
+        """Test batch watchlist check rejects an invalid name."""
+        agent = WatchlistAgent()
+        with pytest.raises(ValueError):
+            agent.check_watchlists_batch(["John Smith", ""])
 
 
 class TestAnalysisAgent:
@@ -119,13 +289,13 @@ class TestAnalysisAgent:
             AnalysisAgent()
     
     @patch.dict(os.environ, {'GOOGLE_API_KEY': 'test_key'})
-    def test_generate_report_valid_input(self):
+    def test_generate_report_valid_input(self, sample_assessment_json):
         """Test report generation with valid input."""
         agent = AnalysisAgent()
         
         # Mock the Gemini model
         mock_response = Mock()
-        mock_response.text = "Test report content with Risk Level: LOW"
+        mock_response.text = sample_assessment_json
         agent.model = Mock()
         agent.model.generate_content.return_value = mock_response
         
@@ -143,19 +313,12 @@ class TestAnalysisAgent:
         assert len(report) > 0
     
     @patch.dict(os.environ, {'GOOGLE_API_KEY': 'test_key'})
-    def test_generate_report_with_match(self):
+    def test_generate_report_with_match(self, sample_assessment_json):
         """Test report generation with watchlist match."""
         agent = AnalysisAgent()
         
-        # Create a longer mock response to pass validation (must be > 100 chars)
         mock_response = Mock()
-        mock_response.text = """## KYC Risk Assessment Report
-
-**Customer Name:** Vladimir Petrov
-
-**Risk Level:** HIGH
-
-This is a comprehensive risk assessment report that exceeds the minimum length requirement. The customer has been found on multiple watchlists and presents a high risk profile. Additional details and recommendations are provided below for compliance review."""
+        mock_response.text = sample_assessment_json
         agent.model = Mock()
         agent.model.generate_content.return_value = mock_response
         
@@ -170,7 +333,28 @@ This is a comprehensive risk assessment report that exceeds the minimum length r
         assert isinstance(report, str)
         assert "HIGH" in report or "high" in report.lower()
     
-    @patch.dict(os.environ, {'GOOGLE_API_KEY': 'test_key'})
+    @patch.dict(os.environ, {'GOOGLE_API_KEY': 'test_key', 'ANALYSIS_TOP_N': '1'})
+    def test_generate_report_forwards_most_relevant_results(self, sample_assessment_json):
+        """Test the prompt carries the highest-ranked results, not the first ones."""
+        agent = AnalysisAgent()
+        
+        mock_response = Mock()
+        mock_response.text = sample_assessment_json
+        agent.model = Mock()
+        agent.model.generate_content.return_value = mock_response
+        
+        search_results = [
+            {"title": "Unrelated", "snippet": "Weather report", "link": "https://a.com"},
+            {"title": "John Smith charged with fraud", "snippet": "Money laundering probe", "link": "https://b.com"}
+        ]
+        watchlist_results = {"matched": False, "watchlists_checked": ["OFAC"], "matches": []}
+        
+        agent.generate_report("John Smith", search_results, watchlist_results)
+        prompt = agent.model.generate_content.call_args[0][0]
+        assert "John Smith charged with fraud" in prompt
+        assert "Weather report" not in prompt
+    
+    @patch.dict(os.environ, {'GOOGLE_API_KEY': 'test_key', 'FAST_PATH': 'off'})
     def test_generate_report_fallback_on_error(self):
         """Test report generation falls back on error."""
         agent = AnalysisAgent()
@@ -190,3 +374,467 @@ This is a comprehensive risk assessment report that exceeds the minimum length r
         assert isinstance(report, str)
         assert "Error" in report or "error" in report.lower() or "UNABLE TO DETERMINE" in report
 
+
+
+class TestAnalysisAgentFastPath:
+    """Test the rule-based fast path in front of Gemini."""
+    
+    @patch.dict(os.environ, {'GOOGLE_API_KEY': 'test_key'})
+    def test_clean_inputs_skip_llm(self, sample_watchlist_results_no_match):
+        """Test simulated search results with no watchlist match skip Gemini."""
+        agent = AnalysisAgent()
+        agent.model = Mock()
+        
+        search_results = [{
+            "title": "News article about John Smith",
+            "snippet": "Recent news coverage related to John Smith and financial activities.",
+            "link": "https://example.com/news/John-Smith",
+            "simulated": True
+        }]
+        report = agent.generate_report("John Smith", search_results, sample_watchlist_results_no_match)
+        
+        assert "**2. Risk Level:** LOW" in report
+        agent.model.generate_content.assert_not_called()
+        assert agent.get_fast_path_stats() == {"reports": 1, "fast_path": 1, "fast_path_rate": 1.0}
+    
+    @patch.dict(os.environ, {'GOOGLE_API_KEY': 'test_key'})
+    def test_failed_search_uses_llm(self, sample_watchlist_results_no_match):
+        """Test simulated stand-ins for a failed search never take the fast path."""
+        agent = AnalysisAgent()
+        agent.model = Mock()
+        agent.model.generate_content.return_value = Mock(text="Risk Level: MEDIUM " + "x" * 100)
+        
+        search_results = [{
+            "title": "News article about John Smith",
+            "snippet": "Recent news coverage related to John Smith and financial activities.",
+            "link": "https://example.com/news/John-Smith",
+            "simulated": True,
+            "search_failed": True
+        }]
+        agent.generate_report("John Smith", search_results, sample_watchlist_results_no_match)
+        
+        agent.model.generate_content.assert_called_once()
+        assert agent.get_fast_path_stats()["fast_path"] == 0
+    
+    @patch.dict(os.environ, {'GOOGLE_API_KEY': 'test_key'})
+    def test_watchlist_match_uses_llm(self, sample_watchlist_results_with_match):
+        """Test a watchlist match always goes to Gemini."""
+        agent = AnalysisAgent()
+        agent.model = Mock()
+        agent.model.generate_content.return_value = Mock(text="Risk Level: HIGH " + "x" * 100)
+        
+        agent.generate_report("Vladimir Petrov", [], sample_watchlist_results_with_match)
+        agent.model.generate_content.assert_called_once()
+        assert agent.get_fast_path_stats()["fast_path"] == 0
+    
+    @patch.dict(os.environ, {'GOOGLE_API_KEY': 'test_key', 'FAST_PATH_MAX_HITS': '3', 'FAST_PATH_MAX_RELEVANCE': '0.0'})
+    def test_threshold_configurable(self, sample_watchlist_results_no_match):
+        """Test a stricter relevance threshold sends name-only hits to Gemini when real hits are allowed."""
+        agent = AnalysisAgent()
+        agent.model = Mock()
+        agent.model.generate_content.return_value = Mock(text="Risk Level: LOW " + "x" * 100)
+        
+        search_results = [{"title": "John Smith joins board", "snippet": "Appointed director", "link": "https://a.com"}]
+        agent.generate_report("John Smith", search_results, sample_watchlist_results_no_match)
+        agent.model.generate_content.assert_called_once()
+
+
+class TestAnalysisAgentStructuredOutput:
+    """Test schema-constrained report generation."""
+    
+    @patch.dict(os.environ, {'GOOGLE_API_KEY': 'test_key', 'FAST_PATH': 'off'})
+    def test_requests_json_schema(self, sample_search_results, sample_watchlist_results_with_match, sample_assessment_json):
+        """Test Gemini is asked for JSON matching the report schema."""
+        from reports import REPORT_SCHEMA
+        agent = AnalysisAgent()
+        agent.model = Mock()
+        agent.model.generate_content.return_value = Mock(text=sample_assessment_json)
+        
+        agent.generate_assessment("Vladimir Petrov", sample_search_results, sample_watchlist_results_with_match)
+        config = agent.model.generate_content.call_args.kwargs["generation_config"]
+        assert config["response_mime_type"] == "application/json"
+        assert config["response_schema"] is REPORT_SCHEMA
+    
+    @patch.dict(os.environ, {'GOOGLE_API_KEY': 'test_key', 'FAST_PATH': 'off', 'LLM_CACHE': 'off'})
+    def test_usage_metadata_tracked(self, sample_watchlist_results_with_match, sample_assessment_json):
+        """Test token counts from usage_metadata reach the LLM usage histograms."""
+        agent = AnalysisAgent()
+        response = Mock(text=sample_assessment_json)
+        response.usage_metadata.prompt_token_count = 321
+        response.usage_metadata.candidates_token_count = 123
+        agent.model = Mock()
+        agent.model.generate_content.return_value = response
+        
+        with patch('agents.performance_tracker') as mock_tracker:
+            agent.generate_assessment("Vladimir Petrov", [], sample_watchlist_results_with_match)
+        args = mock_tracker.track_llm_usage.call_args.args
+        assert args[0] == "generate_content (large)"
+        assert args[3:5] == (321, 123)
+    
+    @patch.dict(os.environ, {'GOOGLE_API_KEY': 'test_key', 'FAST_PATH': 'off'})
+    def test_risk_level_is_a_field(self, sample_search_results, sample_watchlist_results_with_match, sample_assessment_json):
+        """Test the risk level and rendered report come from the structured response."""
+        agent = AnalysisAgent()
+        agent.model = Mock()
+        agent.model.generate_content.return_value = Mock(text=sample_assessment_json)
+        
+        assessment = agent.generate_assessment("Vladimir Petrov", sample_search_results, sample_watchlist_results_with_match)
+        assert assessment["risk_level"] == "HIGH"
+        assert "**2. Risk Level:** HIGH" in assessment["report"]
+        assert "- Escalate to compliance" in assessment["report"]
+    
+    @patch.dict(os.environ, {'GOOGLE_API_KEY': 'test_key', 'FAST_PATH': 'off'})
+    def test_invalid_response_falls_back(self, sample_watchlist_results_with_match):
+        """Test a response that does not match the schema yields the fallback report."""
+        agent = AnalysisAgent()
+        agent.model = Mock()
+        agent.model.generate_content.return_value = Mock(text="Risk Level: HIGH")
+        
+        assessment = agent.generate_assessment("Vladimir Petrov", [], sample_watchlist_results_with_match)
+        assert assessment["risk_level"] == "UNKNOWN"
+        assert "UNABLE TO DETERMINE" in assessment["report"]
+    
+    @patch.dict(os.environ, {'GOOGLE_API_KEY': 'test_key'})
+    def test_fast_path_assessment(self, sample_watchlist_results_no_match):
+        """Test fast-path assessments carry a LOW risk level without calling Gemini."""
+        agent = AnalysisAgent()
+        agent.model = Mock()
+        
+        assessment = agent.generate_assessment("John Smith", [], sample_watchlist_results_no_match)
+        assert assessment["risk_level"] == "LOW"
+        agent.model.generate_content.assert_not_called()
+
+
+class TestAnalysisAgentStreaming:
+    """Test the streamed report path used by the SSE endpoint."""
+    
+    def stream_chunks(self, text, size=16):
+        return [Mock(text=text[i:i + size]) for i in range(0, len(text), size)]
+    
+    @patch.dict(os.environ, {'GOOGLE_API_KEY': 'test_key', 'LLM_CACHE': 'off'})
+    def test_sections_streamed(self, sample_watchlist_results_with_match, sample_assessment_json):
+        """Test report sections are passed on as they complete and add up to the report."""
+        agent = AnalysisAgent()
+        agent.model = Mock()
+        agent.model.generate_content.return_value = iter(self.stream_chunks(sample_assessment_json))
+        texts = []
+        
+        assessment = agent.generate_assessment(
+            "Vladimir Petrov", [], sample_watchlist_results_with_match, on_text=texts.append
+        )
+        assert assessment["risk_level"] == "HIGH"
+        assert len(texts) > 1
+        assert "".join(texts) == assessment["report"]
+        assert agent.model.generate_content.call_args.kwargs["stream"] is True
+    
+    @patch.dict(os.environ, {'GOOGLE_API_KEY': 'test_key', 'LLM_CACHE': 'off'})
+    def test_time_to_first_token_recorded(self, sample_watchlist_results_with_match, sample_assessment_json):
+        """Test the LLM usage histograms get the time to the first chunk, not the full latency."""
+        agent = AnalysisAgent()
+        
+        def slow_stream():
+            chunks = self.stream_chunks(sample_assessment_json, size=len(sample_assessment_json) // 2 + 1)
+            yield chunks[0]
+            time.sleep(0.2)
+            yield chunks[1]
+        
+        agent.model = Mock()
+        agent.model.generate_content.return_value = slow_stream()
+        
+        with patch('agents.performance_tracker') as mock_tracker:
+            agent.generate_assessment("Vladimir Petrov", [], sample_watchlist_results_with_match, on_text=lambda text: None)
+        call = mock_tracker.track_llm_usage.call_args
+        assert call.args[0] == "generate_content (stream, large)"
+        assert call.kwargs["ttft"] < 0.1 <= call.args[5]
+    
+    @patch.dict(os.environ, {'GOOGLE_API_KEY': 'test_key', 'LLM_CACHE': 'off'})
+    def test_failure_before_first_chunk_sends_fallback(self, sample_watchlist_results_with_match):
+        """Test the fallback report is passed on when the stream cannot start."""
+        agent = AnalysisAgent()
+        agent.model = Mock()
+        agent.model.generate_content.side_effect = Exception("Permanent failure")
+        texts = []
+        
+        with patch('time.sleep'):
+            assessment = agent.generate_assessment(
+                "Vladimir Petrov", [], sample_watchlist_results_with_match, on_text=texts.append
+            )
+        assert assessment["risk_level"] == "UNKNOWN"
+        assert texts == [assessment["report"]]
+    
+    @patch.dict(os.environ, {'GOOGLE_API_KEY': 'test_key', 'LLM_CACHE': 'off'})
+    def test_interrupted_stream(self, sample_watchlist_results_with_match, sample_assessment_json):
+        """Test a stream failing after sections were sent ends with an interruption note."""
+        agent = AnalysisAgent()
+        
+        def broken_stream():
+            yield Mock(text=sample_assessment_json[:sample_assessment_json.index('"findings"')])
+            raise ConnectionError("stream reset")
+        
+        agent.model = Mock()
+        agent.model.generate_content.return_value = broken_stream()
+        texts = []
+        
+        assessment = agent.generate_assessment(
+            "Vladimir Petrov", [], sample_watchlist_results_with_match, on_text=texts.append
+        )
+        assert assessment["risk_level"] == "UNKNOWN"
+        assert "Executive Summary" in texts[0]
+        assert "Report generation interrupted" in texts[-1]
+    
+    @patch.dict(os.environ, {'GOOGLE_API_KEY': 'test_key', 'LLM_CACHE': 'off', 'ANALYSIS_DEADLINE': '0.3'})
+    def test_stalled_stream_bounded_by_deadline(self, sample_watchlist_results_with_match, sample_assessment_json):
+        """Test a stream that stops sending chunks is abandoned at the analysis deadline."""
+        agent = AnalysisAgent()
+        
+        def stalled_stream():
+            yield Mock(text=sample_assessment_json[:sample_assessment_json.index('"findings"')])
+            time.sleep(2)
+            yield Mock(text=sample_assessment_json[sample_assessment_json.index('"findings"'):])
+        
+        agent.model = Mock()
+        agent.model.generate_content.return_value = stalled_stream()
+        texts = []
+        
+        start_time = time.monotonic()
+        assessment = agent.generate_assessment(
+            "Vladimir Petrov", [], sample_watchlist_results_with_match, on_text=texts.append
+        )
+        assert time.monotonic() - start_time < 1.5
+        assert assessment["risk_level"] == "UNKNOWN"
+        assert "Report generation interrupted" in texts[-1]
+    
+    @patch.dict(os.environ, {'GOOGLE_API_KEY': 'test_key'})
+    def test_fast_path_sent_in_one_piece(self, sample_watchlist_results_no_match):
+        """Test a fast-path report is passed on whole without calling Gemini."""
+        agent = AnalysisAgent()
+        agent.model = Mock()
+        texts = []
+        
+        assessment = agent.generate_assessment("John Smith", [], sample_watchlist_results_no_match, on_text=texts.append)
+        assert texts == [assessment["report"]]
+        agent.model.generate_content.assert_not_called()
+
+
+class TestAnalysisAgentBatch:
+    """Test batched multi-customer analysis."""
+    
+    def make_customers(self, watchlist_results, count):
+        return [
+            {"customer_name": f"Customer {i}", "search_results": [], "watchlist_results": watchlist_results}
+            for i in range(count)
+        ]
+    
+    def batch_response(self, assessment, customer_ids):
+        return Mock(text=json.dumps({"assessments": [{"customer_id": cid, **assessment} for cid in customer_ids]}))
+    
+    @patch.dict(os.environ, {'GOOGLE_API_KEY': 'test_key', 'LLM_CACHE': 'off'})
+    def test_one_call_per_batch(self, sample_watchlist_results_with_match, sample_assessment):
+        """Test customers are split back out of a single batched response."""
+        agent = AnalysisAgent()
+        agent.model = Mock()
+        agent.model.generate_content.return_value = self.batch_response(sample_assessment, ["C1", "C2", "C3"])
+        
+        assessments = agent.generate_reports_batch(self.make_customers(sample_watchlist_results_with_match, 3))
+        assert agent.model.generate_content.call_count == 1
+        assert [assessment["risk_level"] for assessment in assessments] == ["HIGH"] * 3
+        assert "Customer 2" in assessments[2]["report"]
+        prompt = agent.model.generate_content.call_args[0][0]
+        assert "customer_id: C1" in prompt and "customer_id: C3" in prompt
+    
+    @patch.dict(os.environ, {'GOOGLE_API_KEY': 'test_key', 'LLM_CACHE': 'off', 'ANALYSIS_BATCH_MAX': '2'})
+    def test_batch_size_limit(self, sample_watchlist_results_with_match, sample_assessment):
+        """Test customers are split into batches of at most ANALYSIS_BATCH_MAX."""
+        agent = AnalysisAgent()
+        agent.model = Mock()
+        agent.model.generate_content.side_effect = [
+            self.batch_response(sample_assessment, ["C1", "C2"]),
+            self.batch_response(sample_assessment, ["C3", "C4"])
+        ]
+        
+        agent.generate_reports_batch(self.make_customers(sample_watchlist_results_with_match, 4))
+        assert agent.model.generate_content.call_count == 2
+        assert agent.get_batch_stats()["batches"] == 2
+    
+    @patch.dict(os.environ, {'GOOGLE_API_KEY': 'test_key', 'LLM_CACHE': 'off'})
+    def test_fallback_on_parse_failure(self, sample_watchlist_results_with_match, sample_assessment_json):
+        """Test an unparseable batch response falls back to per-customer calls."""
+        agent = AnalysisAgent()
+        agent.model = Mock()
+        agent.model.generate_content.side_effect = [
+            Mock(text="not json"),
+            Mock(text=sample_assessment_json),
+            Mock(text=sample_assessment_json)
+        ]
+        
+        assessments = agent.generate_reports_batch(self.make_customers(sample_watchlist_results_with_match, 2))
+        assert agent.model.generate_content.call_count == 3
+        assert [assessment["risk_level"] for assessment in assessments] == ["HIGH", "HIGH"]
+        assert agent.get_batch_stats()["fallbacks"] == 2
+    
+    @patch.dict(os.environ, {'GOOGLE_API_KEY': 'test_key', 'LLM_CACHE': 'off'})
+    def test_only_missing_customers_retried(self, sample_watchlist_results_with_match, sample_assessment,
+                                            sample_assessment_json):
+        """Test customers missing from the batch response get individual calls."""
+        agent = AnalysisAgent()
+        agent.model = Mock()
+        agent.model.generate_content.side_effect = [
+            self.batch_response(sample_assessment, ["C1"]),
+            Mock(text=sample_assessment_json)
+        ]
+        
+        agent.generate_reports_batch(self.make_customers(sample_watchlist_results_with_match, 2))
+        assert agent.model.generate_content.call_count == 2
+        assert "customer_id" not in agent.model.generate_content.call_args[0][0]
+    
+    @patch.dict(os.environ, {'GOOGLE_API_KEY': 'test_key', 'LLM_CACHE': 'memory'})
+    def test_batch_answers_cached_under_customer_route(self, sample_watchlist_results_with_match, sample_assessment):
+        """Test batch answers are served from the cache later, except those from another tier's model."""
+        agent = AnalysisAgent()
+        agent.model = Mock()
+        agent.model.generate_content.return_value = self.batch_response(sample_assessment, ["C1", "C2"])
+        routes = {
+            "Customer 0": Route("large", agent.router.models["large"], "test"),
+            "Customer 1": Route("small", agent.router.models["small"], "test")
+        }
+        agent.router.route = Mock(side_effect=lambda name, *args: routes[name])
+        customers = self.make_customers(sample_watchlist_results_with_match, 2)
+        
+        agent.generate_reports_batch(customers)
+        assert agent.model.generate_content.call_count == 1
+        
+        # The large-tier answer is cached where it is looked up; the small-tier customer got the large model's
+        ready_assessment, _, _ = agent._prepare_report("Customer 0", [], sample_watchlist_results_with_match)
+        assert ready_assessment is not None and ready_assessment["risk_level"] == "HIGH"
+        ready_assessment, prompt, _ = agent._prepare_report("Customer 1", [], sample_watchlist_results_with_match)
+        assert ready_assessment is None
+        assert agent.response_cache.get(agent.router.models["large"], prompt) is None
+    
+    @patch.dict(os.environ, {'GOOGLE_API_KEY': 'test_key', 'LLM_CACHE': 'off', 'GEMINI_HEDGE': 'off'})
+    def test_batch_and_fallbacks_bounded_by_deadline(self, sample_watchlist_results_with_match, sample_assessment):
+        """Test a hanging batch call and the per-customer retries all end by the customers' deadline."""
+        agent = AnalysisAgent()
+        agent.model = Mock()
+        
+        def hang(*args, **kwargs):
+            time.sleep(2)
+            return self.batch_response(sample_assessment, ["C1", "C2", "C3"])
+        
+        agent.model.generate_content.side_effect = hang
+        customers = self.make_customers(sample_watchlist_results_with_match, 3)
+        for customer in customers:
+            customer["deadline"] = time.time() + 0.3
+        
+        start_time = time.monotonic()
+        assessments = agent.generate_reports_batch(customers)
+        assert time.monotonic() - start_time < 1.5
+        assert [assessment["risk_level"] for assessment in assessments] == ["UNKNOWN"] * 3
+    
+    @patch.dict(os.environ, {'GOOGLE_API_KEY': 'test_key', 'LLM_CACHE': 'off'})
+    def test_fast_path_customers_skip_model(self, sample_watchlist_results_no_match):
+        """Test clean customers are answered without a Gemini call."""
+        agent = AnalysisAgent()
+        agent.model = Mock()
+        
+        assessments = agent.generate_reports_batch(self.make_customers(sample_watchlist_results_no_match, 3))
+        assert [assessment["risk_level"] for assessment in assessments] == ["LOW"] * 3
+        agent.model.generate_content.assert_not_called()
+
+
+class TestAnalysisAgentAsync:
+    """Test the async generation path."""
+    
+    @patch.dict(os.environ, {'GOOGLE_API_KEY': 'test_key', 'LLM_CACHE': 'off', 'GEMINI_MAX_CONCURRENCY': '2'})
+    def test_concurrency_capped(self, sample_watchlist_results_with_match, sample_assessment_json):
+        """Test overlapping investigations never exceed GEMINI_MAX_CONCURRENCY calls in flight."""
+        agent = AnalysisAgent()
+        in_flight = []
+        peak = []
+        
+        async def fake_generate(prompt, **kwargs):
+            in_flight.append(1)
+            peak.append(len(in_flight))
+            await asyncio.sleep(0.01)
+            in_flight.pop()
+            return Mock(text=sample_assessment_json)
+        
+        agent.model = Mock()
+        agent.model.generate_content_async = fake_generate
+        
+        async def run_all():
+            return await asyncio.gather(*[
+                agent.agenerate_assessment(f"Customer {i}", [], sample_watchlist_results_with_match)
+                for i in range(6)
+            ])
+        
+        assessments = asyncio.run(run_all())
+        assert [assessment["risk_level"] for assessment in assessments] == ["HIGH"] * 6
+        assert max(peak) == 2
+    
+    @patch.dict(os.environ, {'GOOGLE_API_KEY': 'test_key', 'FAST_PATH': 'off'})
+    def test_async_fallback_on_error(self, sample_watchlist_results_no_match):
+        """Test the async path falls back to the manual-review report."""
+        agent = AnalysisAgent()
+        agent.model = Mock()
+        
+        async def failing_generate(prompt, **kwargs):
+            raise ValueError("API Error")
+        
+        agent.model.generate_content_async = failing_generate
+        
+        report = asyncio.run(agent.agenerate_report("John Smith", [], sample_watchlist_results_no_match))
+        assert "UNABLE TO DETERMINE" in report
+
+
+class TestTimeBudget:
+    """Test agents stop at the investigation deadline."""
+    
+    @patch.dict(os.environ, {'GOOGLE_API_KEY': 'test_key', 'GOOGLE_SEARCH_ENGINE_ID': 'test_cx'})
+    def test_search_skips_queries_past_deadline(self):
+        """Test no query is issued once the deadline has passed."""
+        agent = SearchAgent()
+        agent.search_service = Mock()
+        
+        results = agent.search_adverse_media("John Smith", deadline=time.time() - 1)
+        assert results == []
+        agent.search_service.cse.return_value.list.assert_not_called()
+    
+    @patch.dict(os.environ, {'GOOGLE_API_KEY': 'test_key', 'LLM_CACHE': 'off'})
+    def test_analysis_falls_back_past_deadline(self, sample_watchlist_results_with_match):
+        """Test the fallback report is returned without calling Gemini once the deadline has passed."""
+        agent = AnalysisAgent()
+        agent.model = Mock()
+        
+        assessment = agent.generate_assessment(
+            "Vladimir Petrov", [], sample_watchlist_results_with_match, deadline=time.time() - 1
+        )
+        assert assessment["risk_level"] == "UNKNOWN"
+        agent.model.generate_content.assert_not_called()
+    
+    @patch.dict(os.environ, {'GOOGLE_API_KEY': 'test_key', 'LLM_CACHE': 'off'})
+    def test_fast_path_past_deadline(self, sample_watchlist_results_no_match):
+        """Test the rule-based fast path still answers after the deadline."""
+        agent = AnalysisAgent()
+        agent.model = Mock()
+        
+        assessment = agent.generate_assessment("John Smith", [], sample_watchlist_results_no_match, deadline=time.time() - 1)
+        assert assessment["risk_level"] == "LOW"
+    
+    @patch.dict(os.environ, {'GOOGLE_API_KEY': 'test_key', 'LLM_CACHE': 'off'})
+    def test_async_attempt_cancelled_at_deadline(self, sample_watchlist_results_with_match, sample_assessment_json):
+        """Test an async Gemini call still running at the deadline is cancelled."""
+        agent = AnalysisAgent()
+        
+        async def slow_generate(prompt, **kwargs):
+            await asyncio.sleep(5)
+            return Mock(text=sample_assessment_json)
+        
+        agent.model = Mock()
+        agent.model.generate_content_async = slow_generate
+        
+        start_time = time.monotonic()
+        assessment = asyncio.run(agent.agenerate_assessment(
+            "Vladimir Petrov", [], sample_watchlist_results_with_match, deadline=time.time() + 0.1
+        ))
+        assert assessment["risk_level"] == "UNKNOWN"
+        assert time.monotonic() - start_time < 2
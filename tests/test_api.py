@@ -0,0 +1,232 @@
+"""
+Tests for the REST API endpoints.
+"""
+
+import pytest
+import json
+from unittest.mock import Mock, patch
+from api import app
+
+
+@pytest.fixture
+def client():
+    """Flask test client."""
+    app.config["TESTING"] = True
+    with app.test_client() as client:
+        yield client
+
+
+@pytest.fixture
+def mock_agents(make_agents, sample_search_results, sample_watchlist_results_no_match):
+    """Patch the workflow agents with mocks."""
+    agents = make_agents(
+        sample_watchlist_results_no_match, sample_search_results,
+        assessment={"risk_level": "LOW", "report": "Clean report"}
+    )
+    with agents.patched():
+        yield agents
+
+
+def parse_sse(body: str):
+    """Parse an SSE body into a list of (event, data) tuples."""
+    events = []
+    for message in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in message.split("\n"))
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+class TestInvestigateEndpoint:
+    """Test the blocking investigation endpoint."""
+    
+    def test_missing_name(self, client):
+        """Test customer_name is required."""
+        response = client.post('/api/v1/investigate', json={})
+        assert response.status_code == 400
+    
+    def test_investigation(self, client, mock_agents):
+        """Test a full investigation returns the report and structured risk level."""
+        response = client.post('/api/v1/investigate', json={"customer_name": "John Smith"})
+        assert response.status_code == 200
+        body = response.get_json()
+        assert body["risk_level"] == "LOW"
+        assert len(body["search_results"]) == 2
+        assert body["investigation_id"]
+        assert body["error"] == ""
+    
+    def test_investigation_id_echoed(self, client, mock_agents):
+        """Test a caller-supplied investigation ID is used and returned."""
+        response = client.post('/api/v1/investigate', json={"customer_name": "John Smith", "investigation_id": "case-42"})
+        assert response.get_json()["investigation_id"] == "case-42"
+    
+    def test_invalid_investigation_id(self, client):
+        """Test malformed investigation IDs are rejected."""
+        response = client.post('/api/v1/investigate', json={"customer_name": "John Smith", "investigation_id": "../x"})
+        assert response.status_code == 400
+    
+    def test_time_budget(self, client, mock_agents):
+        """Test the deadline comes from WORKFLOW_TIME_BUDGET and truncated nodes are reported."""
+        with patch.dict('os.environ', {"WORKFLOW_TIME_BUDGET": "0"}):
+            response = client.post('/api/v1/investigate', json={"customer_name": "John Smith"})
+        body = response.get_json()
+        assert response.status_code == 200
+        assert body["truncated_nodes"] == ["search_agent"]
+        assert body["search_results"] == []
+        mock_agents[0].search_adverse_media.assert_not_called()
+    
+    def test_no_truncation_within_budget(self, client, mock_agents):
+        """Test investigations within the budget report no truncated nodes."""
+        response = client.post('/api/v1/investigate', json={"customer_name": "John Smith"})
+        assert response.get_json()["truncated_nodes"] == []
+        assert mock_agents[2].generate_assessment.call_args.kwargs["deadline"] > 0
+    
+    def test_errors_joined(self, client, mock_agents):
+        """Test errors from both screening nodes are joined into one string."""
+        mock_agents[0].search_adverse_media.side_effect = RuntimeError("search down")
+        mock_agents[1].check_watchlists.side_effect = RuntimeError("watchlist down")
+        response = client.post('/api/v1/investigate', json={"customer_name": "John Smith"})
+        messages = response.get_json()["error"].split("; ")
+        assert sorted(messages) == ["SearchAgent error: search down", "WatchlistAgent error: watchlist down"]
+
+
+class TestInvestigateStreamEndpoint:
+    """Test the Server-Sent Events investigation endpoint."""
+    
+    def test_invalid_name(self, client):
+        """Test invalid names are rejected before streaming starts."""
+        response = client.post('/api/v1/investigate/stream', json={"customer_name": "<x>"})
+        assert response.status_code == 400
+    
+    def test_event_sequence(self, client, mock_agents):
+        """Test node events precede the report and a final done event."""
+        response = client.post('/api/v1/investigate/stream', json={"customer_name": "John Smith"})
+        assert response.status_code == 200
+        assert response.mimetype == "text/event-stream"
+        
+        events = parse_sse(response.get_data(as_text=True))
+        names = [event for event, _ in events]
+        assert names == ["node", "node", "token", "done"]
+        # Screening nodes run in parallel, so either may finish first
+        node_events = {data["node"]: data for _, data in events[:2]}
+        assert node_events["search_agent"] == {"node": "search_agent", "result_count": 2}
+        assert node_events["watchlist_agent"]["matched"] is False
+        assert events[2][1] == {"text": "Clean report"}
+        assert events[-1][1]["final_report"] == "Clean report"
+        assert events[-1][1]["risk_level"] == "LOW"
+    
+    def test_error_event(self, client, mock_agents):
+        """Test failures during streaming are reported as an error event."""
+        with patch('api.get_compiled_workflow', side_effect=RuntimeError("boom")):
+            response = client.post('/api/v1/investigate/stream', json={"customer_name": "John Smith"})
+        events = parse_sse(response.get_data(as_text=True))
+        assert events[-1][0] == "error"
+        assert "boom" in events[-1][1]["error"]
+    
+    def test_report_tokens_streamed(self, client, mock_agents):
+        """Test report text written by the analysis is sent as token events as it arrives."""
+        def generate_assessment(customer_name, search_results, watchlist_results, deadline=None, on_text=None):
+            on_text("## Report\n")
+            on_text("\n**1. Executive Summary:**\n\nClean\n")
+            return {"risk_level": "LOW", "report": "## Report\n\n**1. Executive Summary:**\n\nClean\n"}
+        
+        mock_agents[2].generate_assessment.side_effect = generate_assessment
+        response = client.post('/api/v1/investigate/stream', json={"customer_name": "John Smith"})
+        events = parse_sse(response.get_data(as_text=True))
+        
+        assert [event for event, _ in events] == ["node", "node", "token", "token", "done"]
+        assert "".join(data["text"] for event, data in events if event == "token") == events[-1][1]["final_report"]
+    
+    def test_analysis_failure_reported_in_done(self, client, mock_agents):
+        """Test an analysis error reaches the done event through the workflow's fallback."""
+        mock_agents[2].generate_assessment.side_effect = RuntimeError("boom")
+        response = client.post('/api/v1/investigate/stream', json={"customer_name": "John Smith"})
+        events = parse_sse(response.get_data(as_text=True))
+        assert events[-1][0] == "done"
+        assert events[-1][1]["risk_level"] == "UNKNOWN"
+        assert "AnalysisAgent error: boom" in events[-1][1]["error"]
+    
+    def test_screening_errors_merged(self, client, mock_agents):
+        """Test the done event keeps errors from both screening nodes."""
+        mock_agents[0].search_adverse_media.side_effect = RuntimeError("search down")
+        mock_agents[1].check_watchlists.side_effect = RuntimeError("watchlist down")
+        response = client.post('/api/v1/investigate/stream', json={"customer_name": "John Smith"})
+        events = parse_sse(response.get_data(as_text=True))
+        assert sorted(events[-1][1]["error"].split("; ")) == [
+            "SearchAgent error: search down", "WatchlistAgent error: watchlist down"
+        ]
+
+    
+    def test_exact_match_skips_analysis(self, client, mock_agents, sample_watchlist_results_with_match):
+        """Test the stream takes the same early exit as the workflow."""
+        mock_agents[1].check_watchlists.return_value = sample_watchlist_results_with_match
+        response = client.post('/api/v1/investigate/stream', json={"customer_name": "Vladimir Petrov"})
+        events = parse_sse(response.get_data(as_text=True))
+        assert [event for event, _ in events] == ["node", "node", "token", "done"]
+        assert events[-1][1]["risk_level"] == "HIGH"
+        assert events[2][1]["text"] == events[-1][1]["final_report"]
+        mock_agents[2].generate_assessment.assert_not_called()
+
+class TestMetricsEndpoint:
+    """Test the service metrics endpoint."""
+    
+    def test_llm_metrics(self, client):
+        """Test LLM usage histograms are exposed."""
+        with patch('logger.performance_tracker.get_llm_metrics', return_value={"histograms": {}}):
+            response = client.get('/api/v1/metrics')
+        assert response.status_code == 200
+        assert response.get_json()["llm"] == {"histograms": {}}
+    
+    def analysis_agent(self):
+        analysis_agent = Mock()
+        analysis_agent.response_cache.get_stats.return_value = {"hit_ratio": 0.5}
+        analysis_agent.get_fast_path_stats.return_value = {"fast_path_rate": 0.25}
+        analysis_agent.get_hedge_stats.return_value = {"hedge_rate": 0.05}
+        return analysis_agent
+    
+    def test_cache_stats(self, client):
+        """Test the LLM response cache counters are exposed once the analysis agent exists."""
+        with patch('api.get_analysis_agent', return_value=self.analysis_agent()):
+            assert client.get('/api/v1/metrics').get_json()["cache"] == {"hit_ratio": 0.5}
+        with patch('api.get_analysis_agent', return_value=None):
+            assert client.get('/api/v1/metrics').get_json()["cache"] is None
+    
+    def test_fast_path_stats(self, client):
+        """Test the fast path counters are exposed once the analysis agent exists."""
+        with patch('api.get_analysis_agent', return_value=self.analysis_agent()):
+            assert client.get('/api/v1/metrics').get_json()["fast_path"] == {"fast_path_rate": 0.25}
+        with patch('api.get_analysis_agent', return_value=None):
+            assert client.get('/api/v1/metrics').get_json()["fast_path"] is None
+    
+    def test_hedge_stats(self, client):
+        """Test the Gemini hedging counters are exposed once the analysis agent exists."""
+        with patch('api.get_analysis_agent', return_value=self.analysis_agent()):
+            assert client.get('/api/v1/metrics').get_json()["hedge"] == {"hedge_rate": 0.05}
+        with patch('api.get_analysis_agent', return_value=None):
+            assert client.get('/api/v1/metrics').get_json()["hedge"] is None
+
+
+class TestInvestigateBulkEndpoint:
+    """Test the bulk investigation endpoint."""
+    
+    def test_bulk_investigation(self, client, mock_agents):
+        """Test every customer gets a result and stage stats are returned."""
+        response = client.post('/api/v1/investigate/bulk', json={"customer_names": ["John Smith", "Jane Doe"]})
+        assert response.status_code == 200
+        
+        data = response.get_json()
+        assert [result["customer_name"] for result in data["results"]] == ["John Smith", "Jane Doe"]
+        assert all(result["risk_level"] == "LOW" for result in data["results"])
+        assert all(result["investigation_id"] for result in data["results"])
+        assert data["stage_stats"]["stages"]["analysis"]["items"] == 2
+    
+    def test_missing_names(self, client):
+        """Test a missing or empty customer_names list is rejected."""
+        assert client.post('/api/v1/investigate/bulk', json={"customer_names": []}).status_code == 400
+        assert client.post('/api/v1/investigate/bulk', json={"customer_name": "John"}).status_code == 400
+    
+    def test_too_many_customers(self, client):
+        """Test requests over BULK_MAX_CUSTOMERS are rejected."""
+        with patch.dict('os.environ', {"BULK_MAX_CUSTOMERS": "2"}):
+            response = client.post('/api/v1/investigate/bulk', json={"customer_names": ["A B", "C D", "E F"]})
+        assert response.status_code == 400
+        assert "At most 2" in response.get_json()["error"]
@@ -0,0 +1,176 @@
+"""
+Unit tests for bulk investigations.
+"""
+
+import pytest
+import os
+import threading
+import time
+from unittest.mock import patch
+from bulk import BulkInvestigator
+
+
+class TestBulkInvestigator:
+    """Test per-stage scheduling, routing and throughput stats."""
+    
+    def test_results_in_order(self, make_agents, sample_watchlist_results_no_match):
+        """Test every customer gets its report, in input order."""
+        agents = make_agents(sample_watchlist_results_no_match)
+        names = ["Alice Jones", "Bob Brown", "Carol White"]
+        with agents.patched():
+            states = BulkInvestigator().run(names)
+        
+        assert [state["customer_name"] for state in states] == names
+        assert [state["final_report"] for state in states] == [f"Report for {name}" for name in names]
+        # One batched analysis call, no per-customer calls
+        agents[2].generate_reports_batch.assert_called_once()
+        batch = agents[2].generate_reports_batch.call_args.args[0]
+        assert sorted(customer["customer_name"] for customer in batch) == sorted(names)
+        agents[2].generate_assessment.assert_not_called()
+    
+    def test_analysis_batch_size(self, make_agents, sample_watchlist_results_no_match):
+        """Test analysis batches hold at most the batch size."""
+        agents = make_agents(sample_watchlist_results_no_match)
+        with agents.patched():
+            BulkInvestigator(analysis_batch_size=2).run([f"Customer {letter}" for letter in "ABCDE"])
+        
+        sizes = sorted(len(call.args[0]) for call in agents[2].generate_reports_batch.call_args_list)
+        assert sum(sizes) == 5
+        assert max(sizes) <= 2
+    
+    def test_deadline_passed_to_analysis_batch(self, make_agents, sample_watchlist_results_no_match):
+        """Test the batched analysis gets each customer's deadline."""
+        agents = make_agents(sample_watchlist_results_no_match)
+        deadline = time.time() + 60
+        with agents.patched():
+            BulkInvestigator().run(["Alice Jones", "Bob Brown"], deadline=deadline)
+        
+        batch = agents[2].generate_reports_batch.call_args.args[0]
+        assert [customer["deadline"] for customer in batch] == [deadline, deadline]
+    
+    def test_analysis_error_degrades(self, make_agents, sample_watchlist_results_no_match):
+        """Test a failed analysis batch gets the workflow's fallback report per customer."""
+        agents = make_agents(sample_watchlist_results_no_match)
+        agents[2].generate_reports_batch.side_effect = RuntimeError("gemini down")
+        with agents.patched():
+            states = BulkInvestigator().run(["Alice Jones", "Bob Brown"])
+        
+        assert all(state["risk_level"] == "UNKNOWN" for state in states)
+        assert all(state["error"] == ["AnalysisAgent error: gemini down"] for state in states)
+        assert "Unable to generate full risk assessment report" in states[0]["final_report"]
+    
+    def test_watchlist_first_plans_search(self, make_agents, sample_watchlist_results_no_match):
+        """Test watchlist-first ordering searches only the queries planned from the watchlist result."""
+        agents = make_agents(sample_watchlist_results_no_match)
+        with agents.patched():
+            states = BulkInvestigator(watchlist_first=True).run(["Alice Jones"])
+        
+        queries = agents[0].search_adverse_media.call_args.kwargs["queries"]
+        assert queries == [
+            '"Alice Jones" (fraud OR sanctions OR financial crime OR scam OR embezzlement OR OFAC OR blacklist)'
+        ]
+        assert states[0]["final_report"] == "Report for Alice Jones"
+    
+    def test_watchlist_first_from_env(self):
+        """Test the ordering follows WATCHLIST_FIRST by default."""
+        with patch.dict(os.environ, {"WATCHLIST_FIRST": "on"}):
+            assert BulkInvestigator().watchlist_first is True
+        with patch.dict(os.environ, {"WATCHLIST_FIRST": "off"}):
+            assert BulkInvestigator().watchlist_first is False
+    
+    def test_watchlist_batched(self, make_agents, sample_watchlist_results_no_match):
+        """Test watchlist screening runs as one batch per concurrency slot."""
+        agents = make_agents(sample_watchlist_results_no_match)
+        with agents.patched():
+            BulkInvestigator(watchlist_concurrency=2).run(["Alice Jones", "Bob Brown", "Carol White"])
+        
+        batches = [call.args[0] for call in agents[1].check_watchlists_batch.call_args_list]
+        assert len(batches) == 2
+        assert sorted(name for batch in batches for name in batch) == ["Alice Jones", "Bob Brown", "Carol White"]
+        agents[1].check_watchlists.assert_not_called()
+    
+    def test_exact_match_skips_analysis(self, make_agents, sample_watchlist_results_with_match):
+        """Test an exact watchlist match takes the sanctions report path."""
+        agents = make_agents(sample_watchlist_results_with_match)
+        with agents.patched():
+            states = BulkInvestigator().run(["Vladimir Petrov"])
+        
+        assert states[0]["risk_level"] == "HIGH"
+        agents[2].generate_reports_batch.assert_not_called()
+    
+    def test_invalid_name_skips_agents(self, make_agents, sample_watchlist_results_no_match):
+        """Test an invalid name ends at once without failing the others."""
+        agents = make_agents(sample_watchlist_results_no_match)
+        with agents.patched():
+            states = BulkInvestigator().run(["   ", "Alice Jones"])
+        
+        assert states[0]["risk_level"] == "UNKNOWN"
+        assert states[0]["error"][0].startswith("Invalid input")
+        assert states[1]["final_report"] == "Report for Alice Jones"
+        assert agents[0].search_adverse_media.call_count == 1
+    
+    def test_watchlist_error_degrades(self, make_agents, sample_watchlist_results_no_match):
+        """Test a failed watchlist batch is reported per customer, like the node."""
+        agents = make_agents(sample_watchlist_results_no_match)
+        agents[1].check_watchlists_batch.side_effect = RuntimeError("watchlist down")
+        with agents.patched():
+            states = BulkInvestigator().run(["Alice Jones"])
+        
+        assert states[0]["error"] == ["WatchlistAgent error: watchlist down"]
+        assert states[0]["watchlist_results"]["matched"] is False
+    
+    def test_search_concurrency_limit(self, make_agents, sample_watchlist_results_no_match):
+        """Test no more searches run at once than the search limit."""
+        agents = make_agents(sample_watchlist_results_no_match)
+        lock = threading.Lock()
+        in_flight = {"now": 0, "max": 0}
+        
+        def slow_search(customer_name, **kwargs):
+            with lock:
+                in_flight["now"] += 1
+                in_flight["max"] = max(in_flight["max"], in_flight["now"])
+            time.sleep(0.02)
+            with lock:
+                in_flight["now"] -= 1
+            return []
+        
+        agents[0].search_adverse_media.side_effect = slow_search
+        with agents.patched():
+            BulkInvestigator(search_concurrency=2).run([f"Customer {letter}" for letter in "ABCDEF"])
+        
+        assert in_flight["max"] <= 2
+    
+    def test_stage_stats(self, make_agents, sample_watchlist_results_no_match):
+        """Test per-stage item counts, throughput and the bottleneck are reported."""
+        agents = make_agents(sample_watchlist_results_no_match)
+        
+        def slow_batch(customers):
+            time.sleep(0.1)
+            return [{"risk_level": "LOW", "report": "Clean report"} for _ in customers]
+        
+        agents[2].generate_reports_batch.side_effect = slow_batch
+        investigator = BulkInvestigator(analysis_concurrency=1)
+        with agents.patched():
+            investigator.run(["Alice Jones", "Bob Brown"])
+        
+        stats = investigator.get_stage_stats()
+        assert stats["customers"] == 2
+        assert stats["stages"]["search"]["items"] == 2
+        assert stats["stages"]["watchlist"]["items"] == 2
+        assert stats["stages"]["analysis"]["items"] == 2
+        assert stats["stages"]["analysis"]["mean_latency"] >= 0.05
+        assert stats["stages"]["analysis"]["items_per_minute"] > 0
+        assert stats["bottleneck"] == "analysis"
+    
+    def test_from_env(self):
+        """Test concurrency limits and the analysis batch size are read from the environment."""
+        env = {
+            "BULK_SEARCH_CONCURRENCY": "8", "BULK_WATCHLIST_CONCURRENCY": "2",
+            "BULK_ANALYSIS_CONCURRENCY": "3", "BULK_ANALYSIS_BATCH_SIZE": "5"
+        }
+        with patch.dict(os.environ, env):
+            investigator = BulkInvestigator.from_env()
+        assert investigator.search_concurrency == 8
+        assert investigator.watchlist_concurrency == 2
+        assert investigator.analysis_concurrency == 3
+        assert investigator.analysis_batch_size == 5
@@ -0,0 +1,201 @@
+"""
+Unit tests for investigation checkpoints.
+"""
+
+import pytest
+import asyncio
+import os
+from unittest.mock import Mock, patch
+from checkpoints import CheckpointStore, checkpointed, checkpointed_batch, is_successful
+
+
+class TestCheckpointStore:
+    """Test the SQLite checkpoint store."""
+    
+    def test_save_and_get(self, tmp_path):
+        """Test a saved update is returned for its investigation and node only."""
+        store = CheckpointStore(str(tmp_path / "checkpoints.sqlite3"))
+        store.save("inv1", "search_agent", "John Smith", {"search_results": [{"title": "T"}]})
+        
+        assert store.get("inv1", "search_agent", "John Smith") == {"search_results": [{"title": "T"}]}
+        assert store.get("inv1", "search_agent", " john  SMITH ") == {"search_results": [{"title": "T"}]}
+        assert store.get("inv1", "analysis_agent", "John Smith") is None
+        assert store.get("inv2", "search_agent", "John Smith") is None
+        store.delete("inv1")
+        assert store.get("inv1", "search_agent", "John Smith") is None
+    
+    def test_other_customer_is_a_miss(self, tmp_path):
+        """Test a reused investigation ID does not return another customer's results."""
+        store = CheckpointStore(str(tmp_path / "checkpoints.sqlite3"))
+        store.save("inv1", "search_agent", "John Smith", {"search_results": [{"title": "T"}]})
+        
+        assert store.get("inv1", "search_agent", "Vladimir Petrov") is None
+        assert store.get_stats()["customer_mismatches"] == 1
+    
+    def test_drops_checkpoints_without_customer(self, tmp_path):
+        """Test a table from before checkpoints carried the customer is replaced."""
+        import sqlite3
+        path = str(tmp_path / "checkpoints.sqlite3")
+        conn = sqlite3.connect(path)
+        conn.execute(
+            "CREATE TABLE checkpoints (investigation_id TEXT, node TEXT, update_json TEXT, state_json TEXT, "
+            "created_at REAL, PRIMARY KEY (investigation_id, node))"
+        )
+        conn.execute("INSERT INTO checkpoints VALUES ('inv1', 'search_agent', '{}', '{}', 1e12)")
+        conn.commit()
+        conn.close()
+        
+        store = CheckpointStore(path)
+        assert store.get("inv1", "search_agent", "John Smith") is None
+        store.save("inv1", "search_agent", "John Smith", {"search_results": []})
+        assert store.get("inv1", "search_agent", "John Smith") == {"search_results": []}
+    
+    def test_expired(self, tmp_path):
+        """Test checkpoints older than the TTL are ignored."""
+        store = CheckpointStore(str(tmp_path / "checkpoints.sqlite3"), ttl=0)
+        store.save("inv1", "search_agent", "John Smith", {"search_results": []})
+        assert store.get("inv1", "search_agent", "John Smith") is None
+    
+    def test_expired_purged_after_writes(self, tmp_path):
+        """Test a long-lived store deletes expired checkpoints every purge_every writes."""
+        import sqlite3
+        path = str(tmp_path / "checkpoints.sqlite3")
+        store = CheckpointStore(path, ttl=0, purge_every=3)
+        
+        def rows():
+            conn = sqlite3.connect(path)
+            try:
+                return conn.execute("SELECT COUNT(*) FROM checkpoints").fetchone()[0]
+            finally:
+                conn.close()
+        
+        store.save("inv1", "search_agent", "John Smith", {"search_results": []})
+        store.save("inv2", "search_agent", "John Smith", {"search_results": []})
+        assert rows() == 2
+        store.save("inv3", "search_agent", "John Smith", {"search_results": []})
+        assert rows() == 0
+    
+    def test_write_overhead_recorded(self, tmp_path):
+        """Test write latency is measured."""
+        store = CheckpointStore(str(tmp_path / "checkpoints.sqlite3"))
+        store.save("inv1", "search_agent", "John Smith", {"search_results": []})
+        stats = store.get_stats()
+        assert stats["writes"] == 1
+        assert stats["mean_write_ms"] > 0
+    
+    def test_is_successful(self):
+        """Test errors, truncated results and UNKNOWN risk levels are not checkpointed."""
+        assert is_successful({"search_results": []})
+        assert not is_successful({"search_results": [], "error": "SearchAgent error"})
+        assert not is_successful({"final_report": "...", "risk_level": "UNKNOWN"})
+        assert not is_successful({"search_results": [], "truncated_nodes": ["search_agent"]})
+        assert not is_successful({"search_results": [{"title": "T", "search_failed": True}]})
+
+
+class TestCheckpointedNode:
+    """Test resuming nodes from checkpoints."""
+    
+    def test_resumes_completed_node(self, tmp_path):
+        """Test a completed node is not run again for the same investigation."""
+        node = Mock(return_value={"search_results": [{"title": "T"}]})
+        wrapped = checkpointed("search_agent", node)
+        with patch.dict(os.environ, {"CHECKPOINTS": "on", "CHECKPOINT_PATH": str(tmp_path / "c.sqlite3")}):
+            first = wrapped({"investigation_id": "inv1", "customer_name": "John Smith"})
+            second = wrapped({"investigation_id": "inv1", "customer_name": "John Smith"})
+        assert first == second
+        assert node.call_count == 1
+    
+    def test_reused_id_for_other_customer_runs_again(self, tmp_path):
+        """Test an investigation ID reused for another customer does not resume."""
+        node = Mock(side_effect=lambda state: {"search_results": [{"title": state["customer_name"]}]})
+        wrapped = checkpointed("search_agent", node)
+        with patch.dict(os.environ, {"CHECKPOINTS": "on", "CHECKPOINT_PATH": str(tmp_path / "c.sqlite3")}):
+            wrapped({"investigation_id": "inv1", "customer_name": "John Smith"})
+            other = wrapped({"investigation_id": "inv1", "customer_name": "Vladimir Petrov"})
+        assert other == {"search_results": [{"title": "Vladimir Petrov"}]}
+        assert node.call_count == 2
+    
+    def test_failed_node_runs_again(self, tmp_path):
+        """Test a node that reported an error is retried."""
+        node = Mock(return_value={"search_results": [], "error": "SearchAgent error"})
+        wrapped = checkpointed("search_agent", node)
+        with patch.dict(os.environ, {"CHECKPOINTS": "on", "CHECKPOINT_PATH": str(tmp_path / "c.sqlite3")}):
+            wrapped({"investigation_id": "inv1"})
+            wrapped({"investigation_id": "inv1"})
+        assert node.call_count == 2
+    
+    def test_without_investigation_id(self, tmp_path):
+        """Test states without an investigation ID are never checkpointed."""
+        node = Mock(return_value={"search_results": []})
+        wrapped = checkpointed("search_agent", node)
+        with patch.dict(os.environ, {"CHECKPOINTS": "on", "CHECKPOINT_PATH": str(tmp_path / "c.sqlite3")}):
+            wrapped({"customer_name": "John Smith"})
+            wrapped({"customer_name": "John Smith"})
+        assert node.call_count == 2
+        assert not os.path.exists(tmp_path / "c.sqlite3")
+    
+    def test_async_node(self, tmp_path):
+        """Test async nodes get an async wrapper that resumes the same way."""
+        calls = []
+        
+        async def node(state):
+            calls.append(state)
+            return {"search_results": [{"title": "T"}]}
+        
+        wrapped = checkpointed("search_agent", node)
+        assert asyncio.iscoroutinefunction(wrapped)
+        with patch.dict(os.environ, {"CHECKPOINTS": "on", "CHECKPOINT_PATH": str(tmp_path / "c.sqlite3")}):
+            first = asyncio.run(wrapped({"investigation_id": "inv1", "customer_name": "John Smith"}))
+            second = asyncio.run(wrapped({"investigation_id": "inv1", "customer_name": "John Smith"}))
+        assert first == second
+        assert len(calls) == 1
+    
+    def test_batch_node_runs_only_unsaved_states(self, tmp_path):
+        """Test a batch node resumes each state from its own checkpoint, shared with the single node."""
+        node = Mock(side_effect=lambda state: {"final_report": state["customer_name"], "risk_level": "LOW"})
+        batch_node = Mock(side_effect=lambda states: [node(state) for state in states])
+        states = [
+            {"investigation_id": "inv1", "customer_name": "John Smith"},
+            {"investigation_id": "inv2", "customer_name": "Jane Roe"}
+        ]
+        with patch.dict(os.environ, {"CHECKPOINTS": "on", "CHECKPOINT_PATH": str(tmp_path / "c.sqlite3")}):
+            checkpointed("analysis_agent", node)(states[0])
+            updates = checkpointed_batch("analysis_agent", batch_node)(states)
+        
+        assert [update["final_report"] for update in updates] == ["John Smith", "Jane Roe"]
+        assert batch_node.call_args.args[0] == [states[1]]
+
+
+class TestResumableWorkflow:
+    """Test retrying an investigation restarts from the failed node."""
+    
+    def test_retry_skips_completed_search(self, tmp_path, sample_search_results, sample_watchlist_results_no_match):
+        """Test a retry after a failed analysis does not search again."""
+        from graph import create_workflow
+        
+        mock_search = Mock()
+        mock_search.search_adverse_media.return_value = sample_search_results
+        mock_watchlist = Mock()
+        mock_watchlist.check_watchlists.return_value = sample_watchlist_results_no_match
+        mock_analysis = Mock()
+        mock_analysis.generate_assessment.side_effect = [
+            TimeoutError("analysis timed out"),
+            {"risk_level": "LOW", "report": "Clean report"}
+        ]
+        
+        env = {"CHECKPOINTS": "on", "CHECKPOINT_PATH": str(tmp_path / "c.sqlite3")}
+        with patch.dict(os.environ, env), \
+             patch('graph.get_search_agent', return_value=mock_search), \
+             patch('graph.get_watchlist_agent', return_value=mock_watchlist), \
+             patch('graph.get_analysis_agent', return_value=mock_analysis):
+            workflow = create_workflow()
+            initial_state = {"investigation_id": "inv1", "customer_name": "John Smith", "error": []}
+            failed = workflow.invoke(initial_state)
+            retried = workflow.invoke(initial_state)
+        
+        assert failed["risk_level"] == "UNKNOWN"
+        assert retried["risk_level"] == "LOW"
+        assert retried["search_results"] == sample_search_results
+        mock_search.search_adverse_media.assert_called_once()
+        mock_watchlist.check_watchlists.assert_called_once()
+        assert mock_analysis.generate_assessment.call_count == 2
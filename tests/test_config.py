@@ -0,0 +1,116 @@
+"""
+Unit tests for environment configuration and lazy SDK imports.
+"""
+
+import pytest
+import os
+import subprocess
+import sys
+from unittest.mock import patch
+import config
+
+
+@pytest.fixture
+def env_file(tmp_path):
+    """Point config at a temporary .env file and reset its loaded flag."""
+    path = tmp_path / ".env"
+    path.write_text('KYC_TEST_SETTING="from-file"\n# comment\n', encoding="utf-8")
+    with patch.object(config, "ENV_PATHS", (str(path),)), \
+         patch.object(config, "_loaded", False), \
+         patch.object(config, "_env_path", None), \
+         patch.dict(os.environ):
+        yield path
+
+
+class TestLoadEnv:
+    """Test the .env file is loaded once per process."""
+    
+    def test_loads_file(self, env_file):
+        """Test values from the .env file reach os.environ."""
+        assert config.load_env() == str(env_file)
+        assert os.environ["KYC_TEST_SETTING"] == "from-file"
+    
+    def test_loads_once(self, env_file):
+        """Test later calls do not read the file again."""
+        config.load_env()
+        env_file.write_text("KYC_TEST_SETTING=changed\n", encoding="utf-8")
+        config.load_env()
+        assert os.environ["KYC_TEST_SETTING"] == "from-file"
+    
+    def test_file_overrides_environment(self, env_file):
+        """Test .env values take precedence, as before."""
+        os.environ["KYC_TEST_SETTING"] = "from-env"
+        config.load_env()
+        assert os.environ["KYC_TEST_SETTING"] == "from-file"
+    
+    def test_get_env(self, env_file):
+        """Test get_env loads the file first and falls back to the default."""
+        assert config.get_env("KYC_TEST_SETTING") == "from-file"
+        assert config.get_env("KYC_TEST_MISSING", "default") == "default"
+    
+    def test_no_file(self, tmp_path):
+        """Test a missing .env file is not an error."""
+        with patch.object(config, "ENV_PATHS", (str(tmp_path / ".env"),)), \
+             patch.object(config, "_loaded", False), \
+             patch.object(config, "_env_path", None):
+            assert config.load_env() is None
+
+
+class TestTypedSettings:
+    """Test the typed setting readers."""
+    
+    def test_get_flag(self, env_file):
+        """Test on/off values in any case, and the default for unset or other values."""
+        for value, expected in [("off", False), ("FALSE", False), ("0", False), ("no", False),
+                                ("on", True), ("True", True), ("1", True), ("yes", True)]:
+            os.environ["KYC_TEST_FLAG"] = value
+            assert config.get_flag("KYC_TEST_FLAG", not expected) is expected
+        os.environ["KYC_TEST_FLAG"] = "maybe"
+        assert config.get_flag("KYC_TEST_FLAG", True) is True
+        assert config.get_flag("KYC_TEST_MISSING", False) is False
+    
+    def test_get_int(self, env_file):
+        """Test integers are parsed and unset or empty values give the default."""
+        os.environ["KYC_TEST_INT"] = " 8 "
+        assert config.get_int("KYC_TEST_INT", 4) == 8
+        os.environ["KYC_TEST_INT"] = ""
+        assert config.get_int("KYC_TEST_INT", 4) == 4
+        assert config.get_int("KYC_TEST_MISSING", 4) == 4
+    
+    def test_get_float(self, env_file):
+        """Test numbers are parsed as floats and unset values give the default."""
+        os.environ["KYC_TEST_FLOAT"] = "0.75"
+        assert config.get_float("KYC_TEST_FLOAT", 0.5) == 0.75
+        os.environ["KYC_TEST_FLOAT"] = "60"
+        assert config.get_float("KYC_TEST_FLOAT", 0.5) == 60.0
+        assert config.get_float("KYC_TEST_MISSING", 0.5) == 0.5
+    
+    def test_invalid_number_names_setting(self, env_file):
+        """Test an invalid number raises ValueError naming the variable."""
+        os.environ["KYC_TEST_INT"] = "many"
+        with pytest.raises(ValueError, match="KYC_TEST_INT must be an integer"):
+            config.get_int("KYC_TEST_INT", 4)
+        with pytest.raises(ValueError, match="KYC_TEST_INT must be a number"):
+            config.get_float("KYC_TEST_INT", 0.5)
+    
+    def test_reads_env_file(self, env_file):
+        """Test the typed readers load the .env file first, like get_env."""
+        env_file.write_text("KYC_TEST_INT=12\nKYC_TEST_FLAG=off\n", encoding="utf-8")
+        assert config.get_int("KYC_TEST_INT", 4) == 12
+        assert config.get_flag("KYC_TEST_FLAG", True) is False
+
+
+class TestLazyImports:
+    """Test the Google SDKs are not imported until an agent needs them."""
+    
+    def test_workflow_import_skips_google_sdks(self):
+        """Test importing the workflow loads neither google.generativeai nor googleapiclient."""
+        code = (
+            "import sys, graph; "
+            "print(any(name.startswith(('google.generativeai', 'googleapiclient')) for name in sys.modules))"
+        )
+        completed = subprocess.run(
+            [sys.executable, "-c", code], cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+            capture_output=True, text=True, check=True
+        )
+        assert completed.stdout.strip() == "False"
@@ -3,9 +3,16 @@ Unit tests for error handling utilities.
 """
 
 import pytest
+import asyncio
+import time
+from unittest.mock import AsyncMock, patch
 from error_handling import (
     validate_customer_name,
     classify_error,
+    async_retry_with_backoff,
+    retry_with_backoff,
+    time_remaining,
+    deadline_passed,
     RetryableError,
     NonRetryableError
 )
@@ -144,3 +151,109 @@ class TestClassifyError:
         assert is_retryable is False
         assert "error occurred" in message.lower() or "invalid input" in message.lower()
 
+
+
+
+class TestAsyncRetryWithBackoff:
+    """Test the async retry decorator."""
+    
+    def test_retries_retryable_errors(self):
+        """Test transient errors are retried with asyncio.sleep until success."""
+        attempts = []
+        
+        @async_retry_with_backoff(max_retries=2, initial_delay=0.5)
+        async def flaky():
+            attempts.append(1)
+            if len(attempts) < 3:
+                raise TimeoutError("timeout")
+            return "ok"
+        
+        with patch('error_handling.asyncio.sleep', new=AsyncMock()) as mock_sleep:
+            assert asyncio.run(flaky()) == "ok"
+        
+        assert len(attempts) == 3
+        assert [call.args[0] for call in mock_sleep.call_args_list] == [0.5, 1.0]
+    
+    def test_non_retryable_error_raises_immediately(self):
+        """Test non-retryable errors are not retried."""
+        attempts = []
+        
+        @async_retry_with_backoff(max_retries=3, initial_delay=0.01)
+        async def broken():
+            attempts.append(1)
+            raise ValueError("Invalid input")
+        
+        with pytest.raises(NonRetryableError):
+            asyncio.run(broken())
+        assert len(attempts) == 1
+
+
+class TestRetryDeadline:
+    """Test retries respect the investigation's time budget."""
+    
+    def test_time_remaining(self):
+        """Test remaining time is None without a deadline and negative once passed."""
+        assert time_remaining(None) is None
+        assert time_remaining(time.time() + 60) > 59
+        assert time_remaining(time.time() - 1) < 0
+        assert deadline_passed(time.time() - 1)
+        assert not deadline_passed(None)
+    
+    def test_no_attempt_after_deadline(self):
+        """Test the call is not attempted once the deadline has passed."""
+        attempts = []
+        
+        @retry_with_backoff(max_retries=2, initial_delay=0.01, deadline=time.time() - 1)
+        def call():
+            attempts.append(1)
+            return "ok"
+        
+        with pytest.raises(NonRetryableError, match="Time budget exhausted"):
+            call()
+        assert attempts == []
+    
+    def test_no_retry_past_deadline(self):
+        """Test no retry is scheduled when its backoff delay would pass the deadline."""
+        attempts = []
+        
+        @retry_with_backoff(max_retries=3, initial_delay=5.0, deadline=time.time() + 1)
+        def flaky():
+            attempts.append(1)
+            raise TimeoutError("timeout")
+        
+        with patch('error_handling.time.sleep') as mock_sleep:
+            with pytest.raises(NonRetryableError):
+                flaky()
+        assert len(attempts) == 1
+        mock_sleep.assert_not_called()
+    
+    def test_retries_within_budget(self):
+        """Test retries proceed normally while the budget allows them."""
+        attempts = []
+        
+        @retry_with_backoff(max_retries=2, initial_delay=0.5, deadline=time.time() + 60)
+        def flaky():
+            attempts.append(1)
+            if len(attempts) < 3:
+                raise TimeoutError("timeout")
+            return "ok"
+        
+        with patch('error_handling.time.sleep'):
+            assert flaky() == "ok"
+        assert len(attempts) == 3
+    
+    def test_async_no_retry_past_deadline(self):
+        """Test the async decorator applies the same budget."""
+        attempts = []
+        
+        @async_retry_with_backoff(max_retries=3, initial_delay=5.0, deadline=time.time() + 1)
+        async def flaky():
+            attempts.append(1)
+            raise TimeoutError("timeout")
+        
+        with patch('error_handling.asyncio.sleep', new=AsyncMock()) as mock_sleep:
+            with pytest.raises(NonRetryableError):
+                asyncio.run(flaky())
+        assert len(attempts) == 1
+        mock_sleep.assert_not_called()
+
@@ -0,0 +1,171 @@
+"""
+Unit tests for hedged calls.
+"""
+
+import pytest
+import asyncio
+import os
+import threading
+import time
+from unittest.mock import Mock, patch
+from hedging import HedgedCaller, DeadlineExceededError
+
+
+def slow_then_fast(first_delay):
+    """Build a callable whose first invocation is slow and later ones are fast."""
+    calls = []
+    lock = threading.Lock()
+    
+    def func():
+        with lock:
+            calls.append(1)
+            attempt = len(calls)
+        if attempt == 1:
+            time.sleep(first_delay)
+            return "primary"
+        return "hedge"
+    
+    return func, calls
+
+
+class TestHedgedCaller:
+    """Test HedgedCaller hedging and deadlines."""
+    
+    def test_fast_call_not_hedged(self):
+        """Test calls that beat the hedge delay run once."""
+        caller = HedgedCaller(default_delay=1.0)
+        assert caller.call(lambda: "ok", deadline=5) == "ok"
+        assert caller.get_stats()["hedged"] == 0
+    
+    def test_slow_call_hedged(self):
+        """Test a slow primary is hedged and the faster hedge wins."""
+        caller = HedgedCaller(default_delay=0.05)
+        func, calls = slow_then_fast(0.5)
+        
+        assert caller.call(func, deadline=5) == "hedge"
+        stats = caller.get_stats()
+        assert stats["hedged"] == 1
+        assert stats["hedge_wins"] == 1
+        assert stats["hedge_rate"] == 1.0
+    
+    def test_disabled(self):
+        """Test disabled hedging waits for the single attempt."""
+        caller = HedgedCaller(enabled=False, default_delay=0.01)
+        func, calls = slow_then_fast(0.1)
+        assert caller.call(func, deadline=5) == "primary"
+        assert len(calls) == 1
+    
+    def test_deadline_exceeded(self):
+        """Test no result before the deadline raises DeadlineExceededError."""
+        caller = HedgedCaller(default_delay=0.02)
+        with pytest.raises(DeadlineExceededError):
+            caller.call(lambda: time.sleep(0.5), deadline=0.1)
+        assert caller.get_stats()["deadline_exceeded"] == 1
+    
+    def test_error_propagates(self):
+        """Test an attempt error is raised when no attempt is left."""
+        caller = HedgedCaller(default_delay=1.0)
+        with pytest.raises(ValueError):
+            caller.call(Mock(side_effect=ValueError("boom")), deadline=5)
+    
+    def test_hedge_delay_from_percentile(self):
+        """Test the hedge delay follows observed latencies once enough are seen."""
+        caller = HedgedCaller(percentile=50, default_delay=9.0, min_samples=3)
+        assert caller.hedge_delay() == 9.0
+        for _ in range(3):
+            caller.call(lambda: "ok", deadline=5)
+        assert caller.hedge_delay() < 1.0
+    
+    def test_p99_improvement_tracked(self):
+        """Test primary and observed tail latencies are both recorded."""
+        caller = HedgedCaller(default_delay=0.05)
+        func, calls = slow_then_fast(0.3)
+        caller.call(func, deadline=5)
+        time.sleep(0.35)  # let the abandoned primary finish
+        
+        stats = caller.get_stats()
+        assert stats["p99_primary_latency"] >= 0.3
+        assert stats["p99_improvement"] > 0.1
+
+
+class TestAsyncHedgedCaller:
+    """Test HedgedCaller.acall on the event loop."""
+    
+    def test_slow_call_hedged_and_loser_cancelled(self):
+        """Test a slow primary is hedged, the hedge wins and the primary is cancelled."""
+        caller = HedgedCaller(default_delay=0.05)
+        attempts = []
+        
+        async def func():
+            attempts.append(asyncio.current_task())
+            await asyncio.sleep(5 if len(attempts) == 1 else 0)
+            return "primary" if len(attempts) == 1 else "hedge"
+        
+        async def run():
+            result = await caller.acall(func, deadline=2)
+            await asyncio.sleep(0)
+            return result
+        
+        assert asyncio.run(run()) == "hedge"
+        assert attempts[0].cancelled()
+        assert caller.get_stats()["hedge_wins"] == 1
+    
+    def test_deadline_exceeded(self):
+        """Test no result before the deadline raises DeadlineExceededError."""
+        caller = HedgedCaller(default_delay=0.02)
+        start_time = time.monotonic()
+        with pytest.raises(DeadlineExceededError):
+            asyncio.run(caller.acall(lambda: asyncio.sleep(5), deadline=0.1))
+        assert time.monotonic() - start_time < 1
+        assert caller.get_stats()["deadline_exceeded"] == 1
+    
+    def test_error_propagates(self):
+        """Test an attempt error is raised when no attempt is left."""
+        caller = HedgedCaller(default_delay=1.0)
+        
+        async def fail():
+            raise ValueError("boom")
+        
+        with pytest.raises(ValueError):
+            asyncio.run(caller.acall(fail, deadline=5))
+
+
+class TestAnalysisAgentDeadline:
+    """Test AnalysisAgent falls back when Gemini misses the deadline."""
+    
+    @patch.dict(os.environ, {'GOOGLE_API_KEY': 'test_key', 'FAST_PATH': 'off', 'LLM_CACHE': 'off',
+                             'ANALYSIS_DEADLINE': '0.2', 'GEMINI_HEDGE_DELAY': '0.05'})
+    def test_deadline_fallback(self, sample_watchlist_results_with_match):
+        """Test a hung model yields the fallback report within the deadline."""
+        from agents import AnalysisAgent
+        agent = AnalysisAgent()
+        agent.model = Mock()
+        agent.model.generate_content.side_effect = lambda *args, **kwargs: time.sleep(1)
+        
+        start_time = time.monotonic()
+        assessment = agent.generate_assessment("Vladimir Petrov", [], sample_watchlist_results_with_match)
+        
+        assert time.monotonic() - start_time < 0.9
+        assert assessment["risk_level"] == "UNKNOWN"
+        assert "UNABLE TO DETERMINE" in assessment["report"]
+        assert agent.get_hedge_stats()["hedged"] == 1
+    
+    @patch.dict(os.environ, {'GOOGLE_API_KEY': 'test_key', 'FAST_PATH': 'off', 'LLM_CACHE': 'off',
+                             'ANALYSIS_DEADLINE': '0.2', 'GEMINI_HEDGE_DELAY': '0.05'})
+    def test_async_deadline_fallback(self, sample_watchlist_results_with_match):
+        """Test a hung async call is hedged and bounded by ANALYSIS_DEADLINE without an investigation deadline."""
+        from agents import AnalysisAgent
+        agent = AnalysisAgent()
+        
+        async def hang(*args, **kwargs):
+            await asyncio.sleep(5)
+        
+        agent.model = Mock()
+        agent.model.generate_content_async = hang
+        
+        start_time = time.monotonic()
+        assessment = asyncio.run(agent.agenerate_assessment("Vladimir Petrov", [], sample_watchlist_results_with_match))
+        
+        assert time.monotonic() - start_time < 0.9
+        assert assessment["risk_level"] == "UNKNOWN"
+        assert agent.get_hedge_stats()["hedged"] == 1
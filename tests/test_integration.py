@@ -3,9 +3,16 @@ Integration tests for the KYC Bot workflow.
 """
 
 import pytest
+import asyncio
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from unittest.mock import Mock, patch
-from graph import create_workflow, AgentState
+from graph import (
+    create_workflow, get_compiled_workflow, get_agents, watchlist_node,
+    merge_errors, format_errors, apply_update, AgentState
+)
 from agents import SearchAgent, WatchlistAgent, AnalysisAgent
 
 
@@ -34,11 +41,13 @@ class TestWorkflowIntegration:
             "search_results": [],
             "watchlist_results": {},
             "final_report": "",
-            "error": ""
+            "error": []
         }
         
         # Mock agents to avoid actual API calls
-        with patch('graph.get_agents') as mock_get_agents:
+        with patch('graph.get_search_agent') as mock_get_search, \
+             patch('graph.get_watchlist_agent') as mock_get_watchlist, \
+             patch('graph.get_analysis_agent') as mock_get_analysis:
             mock_search = Mock()
             mock_search.search_adverse_media.return_value = [
                 {"title": "Test", "snippet": "Test", "link": "https://example.com"}
@@ -54,7 +63,9 @@ class TestWorkflowIntegration:
             mock_analysis = Mock()
             mock_analysis.generate_report.return_value = "Test report"
             
-            mock_get_agents.return_value = (mock_search, mock_watchlist, mock_analysis)
+            mock_get_search.return_value = mock_search
+            mock_get_watchlist.return_value = mock_watchlist
+            mock_get_analysis.return_value = mock_analysis
             
             # Execute workflow
             final_state = workflow.invoke(initial_state)
@@ -77,10 +88,12 @@ class TestWorkflowIntegration:
             "search_results": [],
             "watchlist_results": {},
             "final_report": "",
-            "error": ""
+            "error": []
         }
         
-        with patch('graph.get_agents') as mock_get_agents:
+        with patch('graph.get_search_agent') as mock_get_search, \
+             patch('graph.get_watchlist_agent') as mock_get_watchlist, \
+             patch('graph.get_analysis_agent') as mock_get_analysis:
             mock_search = Mock()
             mock_search.search_adverse_media.return_value = []
             
@@ -96,7 +109,9 @@ class TestWorkflowIntegration:
             mock_analysis = Mock()
             mock_analysis.generate_report.return_value = "HIGH RISK report"
             
-            mock_get_agents.return_value = (mock_search, mock_watchlist, mock_analysis)
+            mock_get_search.return_value = mock_search
+            mock_get_watchlist.return_value = mock_watchlist
+            mock_get_analysis.return_value = mock_analysis
             
             final_state = workflow.invoke(initial_state)
             
@@ -116,10 +131,12 @@ class TestWorkflowIntegration:
             "search_results": [],
             "watchlist_results": {},
             "final_report": "",
-            "error": ""
+            "error": []
         }
         
-        with patch('graph.get_agents') as mock_get_agents:
+        with patch('graph.get_search_agent') as mock_get_search, \
+             patch('graph.get_watchlist_agent') as mock_get_watchlist, \
+             patch('graph.get_analysis_agent') as mock_get_analysis:
             mock_search = Mock()
             mock_search.search_adverse_media.side_effect = Exception("Search error")
             
@@ -133,7 +150,9 @@ class TestWorkflowIntegration:
             mock_analysis = Mock()
             mock_analysis.generate_report.return_value = "Test report"
             
-            mock_get_agents.return_value = (mock_search, mock_watchlist, mock_analysis)
+            mock_get_search.return_value = mock_search
+            mock_get_watchlist.return_value = mock_watchlist
+            mock_get_analysis.return_value = mock_analysis
             
             final_state = workflow.invoke(initial_state)
             
@@ -151,17 +170,405 @@ class TestWorkflowIntegration:
             "search_results": [],
             "watchlist_results": {},
             "final_report": "",
-            "error": ""
+            "error": []
         }
         
-        with patch('graph.get_agents') as mock_get_agents:
+        with patch('graph.get_search_agent') as mock_get_search, \
+             patch('graph.get_watchlist_agent') as mock_get_watchlist, \
+             patch('graph.get_analysis_agent') as mock_get_analysis:
             mock_search = Mock()
             mock_watchlist = Mock()
             mock_analysis = Mock()
-            mock_get_agents.return_value = (mock_search, mock_watchlist, mock_analysis)
+            mock_get_search.return_value = mock_search
+            mock_get_watchlist.return_value = mock_watchlist
+            mock_get_analysis.return_value = mock_analysis
             
             final_state = workflow.invoke(initial_state)
             
             # Should handle empty name gracefully
             assert "error" in final_state or len(final_state.get("error", "")) > 0
 
+    
+    def test_screening_runs_in_parallel(self):
+        """Test search and watchlist nodes run at the same time."""
+        workflow = create_workflow()
+        # Each node waits for the other; sequential execution would time out
+        barrier = threading.Barrier(2, timeout=5)
+        
+        def search(customer_name, **kwargs):
+            barrier.wait()
+            return [{"title": "Test", "snippet": "Test", "link": "https://example.com"}]
+        
+        def check(customer_name):
+            barrier.wait()
+            return {"matched": False, "watchlists_checked": ["OFAC"], "matches": []}
+        
+        with patch('graph.get_search_agent') as mock_get_search, \
+             patch('graph.get_watchlist_agent') as mock_get_watchlist, \
+             patch('graph.get_analysis_agent') as mock_get_analysis:
+            mock_search = Mock()
+            mock_search.search_adverse_media.side_effect = search
+            mock_watchlist = Mock()
+            mock_watchlist.check_watchlists.side_effect = check
+            mock_analysis = Mock()
+            mock_analysis.generate_assessment.return_value = {"risk_level": "LOW", "report": "Test report"}
+            mock_get_search.return_value = mock_search
+            mock_get_watchlist.return_value = mock_watchlist
+            mock_get_analysis.return_value = mock_analysis
+            
+            final_state = workflow.invoke({"customer_name": "John Smith", "error": []})
+        
+        assert final_state["error"] == []
+        assert len(final_state["search_results"]) == 1
+        assert final_state["risk_level"] == "LOW"
+        mock_analysis.generate_assessment.assert_called_once()
+    
+    def test_parallel_errors_merged(self):
+        """Test errors from both screening nodes are kept."""
+        workflow = create_workflow()
+        
+        with patch('graph.get_search_agent') as mock_get_search, \
+             patch('graph.get_watchlist_agent') as mock_get_watchlist, \
+             patch('graph.get_analysis_agent') as mock_get_analysis:
+            mock_search = Mock()
+            mock_search.search_adverse_media.side_effect = Exception("Search error")
+            mock_watchlist = Mock()
+            mock_watchlist.check_watchlists.side_effect = Exception("Watchlist error")
+            mock_analysis = Mock()
+            mock_analysis.generate_assessment.return_value = {"risk_level": "LOW", "report": "Test report"}
+            mock_get_search.return_value = mock_search
+            mock_get_watchlist.return_value = mock_watchlist
+            mock_get_analysis.return_value = mock_analysis
+            
+            final_state = workflow.invoke({"customer_name": "John Smith", "error": []})
+        
+        assert sorted(final_state["error"]) == ["SearchAgent error: Search error", "WatchlistAgent error: Watchlist error"]
+    
+    def test_failed_search_reported(self, make_agents, sample_watchlist_results_no_match):
+        """Test a search that fell back to simulated results after an API error reports the error."""
+        fallback = [{"title": "News", "snippet": "S", "link": "https://example.com", "simulated": True, "search_failed": True}]
+        agents = make_agents(sample_watchlist_results_no_match, fallback)
+        with agents.patched():
+            final_state = create_workflow().invoke({"customer_name": "John Smith", "error": []})
+        
+        assert final_state["error"] == ["SearchAgent error: search API failed, simulated results used"]
+
+
+class TestMergeErrors:
+    """Test the error reducer."""
+    
+    def test_appends_distinct_messages(self):
+        """Test messages are appended once each, in order."""
+        assert merge_errors([], []) == []
+        assert merge_errors(["a"], []) == ["a"]
+        assert merge_errors(["a"], ["b"]) == ["a", "b"]
+        assert merge_errors(["a", "b"], ["b"]) == ["a", "b"]
+    
+    def test_accepts_joined_strings(self):
+        """Test an initial "error": "" or a "; "-joined string still merges."""
+        assert merge_errors("", ["a"]) == ["a"]
+        assert merge_errors("a; b", ["c"]) == ["a", "b", "c"]
+    
+    def test_format_errors(self):
+        """Test errors are joined with "; " at the output boundary."""
+        assert format_errors(["a", "b"]) == "a; b"
+        assert format_errors([]) == ""
+        assert format_errors(None) == ""
+    
+    def test_apply_update_uses_reducers(self):
+        """Test apply_update merges error and truncated_nodes through their reducers and replaces the rest."""
+        state = {"customer_name": "John Smith", "error": ["a"], "truncated_nodes": ["search_agent"], "risk_level": ""}
+        merged = apply_update(state, {"error": ["a", "b"], "truncated_nodes": ["analysis_agent"], "risk_level": "LOW"})
+        
+        assert merged["error"] == ["a", "b"]
+        assert merged["truncated_nodes"] == ["search_agent", "analysis_agent"]
+        assert merged["risk_level"] == "LOW"
+        assert state["error"] == ["a"]
+
+
+class TestCompiledWorkflowRegistry:
+    """Test the shared compiled workflow."""
+    
+    def test_compiled_once(self):
+        """Test every caller gets the same compiled workflow per variant."""
+        assert get_compiled_workflow() is get_compiled_workflow()
+        assert get_compiled_workflow(watchlist_first=True) is not get_compiled_workflow(watchlist_first=False)
+    
+    def test_concurrent_invoke(self, make_agents, sample_watchlist_results_no_match):
+        """Test one compiled workflow serves concurrent investigations."""
+        workflow = get_compiled_workflow()
+        agents = make_agents(sample_watchlist_results_no_match)
+        agents[0].search_adverse_media.side_effect = lambda name, **kwargs: [{"title": name, "snippet": name, "link": "https://example.com"}]
+        
+        with agents.patched():
+            names = [f"Customer {i}" for i in range(8)]
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                states = list(executor.map(lambda name: workflow.invoke({"customer_name": name, "error": []}), names))
+        
+        assert [state["final_report"] for state in states] == [f"Report for {name}" for name in names]
+        assert [state["search_results"][0]["title"] for state in states] == names
+
+
+class TestAgentRegistry:
+    """Test the shared agents."""
+    
+    def test_concurrent_first_use_builds_once(self):
+        """Test parallel nodes reaching the agent getters together build each agent once."""
+        def slow_agent(*args, **kwargs):
+            time.sleep(0.05)
+            return Mock()
+        
+        with patch('graph._search_agent', None), patch('graph._watchlist_agent', None), \
+             patch('graph._analysis_agent', None), \
+             patch('graph.SearchAgent', side_effect=slow_agent) as search_cls, \
+             patch('graph.WatchlistAgent', side_effect=slow_agent) as watchlist_cls, \
+             patch('graph.AnalysisAgent', side_effect=slow_agent) as analysis_cls:
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                results = list(executor.map(lambda _: get_agents(), range(8)))
+        
+        assert search_cls.call_count == watchlist_cls.call_count == analysis_cls.call_count == 1
+        assert all(agents == results[0] for agents in results)
+    
+    def test_node_builds_only_its_agent(self, sample_watchlist_results_with_match):
+        """Test a watchlist-only run never builds the search or analysis agents."""
+        watchlist_agent = Mock()
+        watchlist_agent.check_watchlists.return_value = sample_watchlist_results_with_match
+        
+        with patch('graph._search_agent', None), patch('graph._watchlist_agent', None), \
+             patch('graph._analysis_agent', None), \
+             patch('graph.SearchAgent') as search_cls, \
+             patch('graph.WatchlistAgent', return_value=watchlist_agent), \
+             patch('graph.AnalysisAgent') as analysis_cls:
+            update = watchlist_node({"customer_name": "Vladimir Petrov", "error": []})
+        
+        assert update["watchlist_results"] == sample_watchlist_results_with_match
+        search_cls.assert_not_called()
+        analysis_cls.assert_not_called()
+
+
+class TestConditionalRouting:
+    """Test early exits and path metrics."""
+    
+    def test_exact_match_skips_analysis(self, make_agents, sample_watchlist_results_with_match):
+        """Test an exact watchlist match produces a HIGH report without AnalysisAgent."""
+        agents = make_agents(sample_watchlist_results_with_match)
+        with agents.patched(), \
+             patch('graph.performance_tracker') as mock_tracker:
+            final_state = create_workflow().invoke({"customer_name": "Vladimir Petrov", "error": []})
+        
+        assert final_state["risk_level"] == "HIGH"
+        assert "OFAC" in final_state["final_report"]
+        agents[2].generate_assessment.assert_not_called()
+        mock_tracker.track_graph_path.assert_called_once_with("sanctions_match")
+    
+    def test_fuzzy_match_runs_analysis(self, make_agents, sample_watchlist_results_with_match):
+        """Test a fuzzy watchlist match still goes to AnalysisAgent."""
+        sample_watchlist_results_with_match["matches"][0]["similarity"] = 0.9
+        agents = make_agents(sample_watchlist_results_with_match, assessment={"risk_level": "MEDIUM", "report": "LLM report"})
+        with agents.patched(), \
+             patch('graph.performance_tracker') as mock_tracker:
+            final_state = create_workflow(parallel=False).invoke({"customer_name": "Vladimir Petrov", "error": []})
+        
+        assert final_state["final_report"] == "LLM report"
+        mock_tracker.track_graph_path.assert_called_once_with("analysis")
+    
+    def test_invalid_input_skips_agents(self, make_agents, sample_watchlist_results_no_match):
+        """Test an invalid name ends the workflow before any agent runs."""
+        agents = make_agents(sample_watchlist_results_no_match)
+        with agents.patched(), \
+             patch('graph.performance_tracker') as mock_tracker:
+            final_state = create_workflow().invoke({"customer_name": "   ", "error": []})
+        
+        assert final_state["risk_level"] == "UNKNOWN"
+        assert final_state["error"][0].startswith("Invalid input")
+        agents[0].search_adverse_media.assert_not_called()
+        agents[1].check_watchlists.assert_not_called()
+        mock_tracker.track_graph_path.assert_called_once_with("invalid_input")
+
+
+
+class TestAsyncWorkflow:
+    """Test the async workflow driven by ainvoke/astream."""
+    
+    def test_ainvoke(self, make_agents, sample_watchlist_results_no_match):
+        """Test the async workflow produces the report through the async agent methods."""
+        agents = make_agents(sample_watchlist_results_no_match, search_results=[{"title": "T", "snippet": "S", "link": "https://example.com"}])
+        with agents.patched():
+            final_state = asyncio.run(
+                create_workflow(use_async=True).ainvoke({"customer_name": "John Smith", "error": []})
+            )
+        
+        assert final_state["final_report"] == "Report for John Smith"
+        assert final_state["risk_level"] == "LOW"
+        assert len(final_state["search_results"]) == 1
+        agents[0].search_adverse_media.assert_not_called()
+        agents[2].generate_assessment.assert_not_called()
+    
+    def test_investigations_share_one_loop(self, make_agents, sample_watchlist_results_no_match):
+        """Test many investigations are in flight together on one event loop."""
+        agents = make_agents(sample_watchlist_results_no_match, delay=0.05)
+        workflow = create_workflow(use_async=True)
+        
+        async def run_all():
+            return await asyncio.gather(*[
+                workflow.ainvoke({"customer_name": f"Customer {i}", "error": []}) for i in range(20)
+            ])
+        
+        with agents.patched():
+            final_states = asyncio.run(run_all())
+        
+        assert [state["final_report"] for state in final_states] == [f"Report for Customer {i}" for i in range(20)]
+        assert agents.in_flight["max"] == 20
+    
+    def test_exact_match_skips_analysis(self, make_agents, sample_watchlist_results_with_match):
+        """Test the async workflow takes the same early exit."""
+        agents = make_agents(sample_watchlist_results_with_match)
+        with agents.patched():
+            final_state = asyncio.run(
+                create_workflow(use_async=True).ainvoke({"customer_name": "Vladimir Petrov", "error": []})
+            )
+        assert final_state["risk_level"] == "HIGH"
+    
+    def test_astream_updates(self, make_agents, sample_watchlist_results_no_match):
+        """Test astream yields one update per node."""
+        agents = make_agents(sample_watchlist_results_no_match)
+        
+        async def collect():
+            workflow = create_workflow(use_async=True)
+            return [
+                node_name
+                async for update in workflow.astream({"customer_name": "John Smith", "error": []}, stream_mode="updates")
+                for node_name in update
+            ]
+        
+        with agents.patched():
+            node_names = asyncio.run(collect())
+        assert sorted(node_names[:2]) == ["search_agent", "watchlist_agent"]
+        assert node_names[2:] == ["screening_complete", "analysis_agent"]
+    
+    def test_analysis_error_falls_back(self, make_agents, sample_watchlist_results_no_match):
+        """Test async node failures produce the same fallback report as sync nodes."""
+        agents = make_agents(sample_watchlist_results_no_match)
+        agents[2].agenerate_assessment.side_effect = RuntimeError("model down")
+        with agents.patched():
+            final_state = asyncio.run(
+                create_workflow(use_async=True).ainvoke({"customer_name": "John Smith", "error": []})
+            )
+        assert final_state["risk_level"] == "UNKNOWN"
+        assert final_state["error"] == ["AnalysisAgent error: model down"]
+        assert "Please review the available data manually" in final_state["final_report"]
+    
+    def test_compiled_variants_are_separate(self):
+        """Test the registry keeps sync and async workflows apart."""
+        assert get_compiled_workflow(use_async=True) is get_compiled_workflow(use_async=True)
+        assert get_compiled_workflow(use_async=True) is not get_compiled_workflow()
+
+
+class TestTimeBudget:
+    """Test the workflow degrades to partial results at its deadline."""
+    
+    def test_passed_deadline_truncates_nodes(self, make_agents, sample_watchlist_results_no_match):
+        """Test a spent budget skips the search and reports the truncated nodes."""
+        agents = make_agents(
+            sample_watchlist_results_no_match, search_results=[{"title": "T", "snippet": "S", "link": "https://example.com"}],
+            assessment={"risk_level": "UNKNOWN", "report": "Fallback report"}
+        )
+        with agents.patched():
+            final_state = create_workflow().invoke(
+                {"customer_name": "John Smith", "error": [], "deadline": time.time() - 1}
+            )
+        
+        agents[0].search_adverse_media.assert_not_called()
+        agents[1].check_watchlists.assert_called_once()
+        assert final_state["final_report"] == "Fallback report"
+        assert sorted(final_state["truncated_nodes"]) == ["analysis_agent", "search_agent"]
+    
+    def test_deadline_passed_during_search(self, make_agents, sample_watchlist_results_no_match):
+        """Test a search that runs past the deadline is reported with its partial results."""
+        agents = make_agents(
+            sample_watchlist_results_no_match, search_results=[{"title": "T", "snippet": "S", "link": "https://example.com"}],
+            assessment={"risk_level": "LOW", "report": "Clean report"}
+        )
+        
+        def slow_search(customer_name, **kwargs):
+            time.sleep(0.1)
+            return [{"title": "Partial", "snippet": "S", "link": "https://example.com"}]
+        
+        agents[0].search_adverse_media.side_effect = slow_search
+        with agents.patched():
+            final_state = create_workflow().invoke(
+                {"customer_name": "John Smith", "error": [], "deadline": time.time() + 0.05}
+            )
+        
+        assert final_state["search_results"][0]["title"] == "Partial"
+        assert final_state["truncated_nodes"] == ["search_agent"]
+        # A complete (rule-based or LLM) assessment is not truncated
+        assert final_state["final_report"] == "Clean report"
+    
+    def test_deadline_passed_to_agents(self, make_agents, sample_watchlist_results_no_match):
+        """Test nodes hand the state's deadline to the agents."""
+        agents = make_agents(
+            sample_watchlist_results_no_match, search_results=[{"title": "T", "snippet": "S", "link": "https://example.com"}],
+            assessment={"risk_level": "LOW", "report": "Clean report"}
+        )
+        deadline = time.time() + 60
+        with agents.patched():
+            final_state = create_workflow().invoke({"customer_name": "John Smith", "error": [], "deadline": deadline})
+        
+        assert agents[0].search_adverse_media.call_args.kwargs["deadline"] == deadline
+        assert agents[2].generate_assessment.call_args.kwargs["deadline"] == deadline
+        assert final_state["truncated_nodes"] == []
+
+
+class TestWatchlistFirst:
+    """Test watchlist-first ordering with planned search queries."""
+    
+    def test_clean_result_single_query(self, make_agents, sample_watchlist_results_no_match):
+        """Test the watchlist runs first and a clean result plans one query."""
+        agents = make_agents(sample_watchlist_results_no_match, assessment={"risk_level": "LOW", "report": "Clean report"})
+        with agents.patched():
+            final_state = create_workflow(watchlist_first=True).invoke({"customer_name": "John Smith", "error": []})
+        
+        assert agents.calls == ["check_watchlists", "search_adverse_media", "generate_assessment"]
+        queries = agents[0].search_adverse_media.call_args.kwargs["queries"]
+        assert len(queries) == 1 and queries[0].startswith('"John Smith" (')
+        assert final_state["final_report"] == "Clean report"
+    
+    def test_match_searches_aliases(self, make_agents, sample_watchlist_results_with_match):
+        """Test a match plans the alias query and still exits through the sanctions report."""
+        agents = make_agents(sample_watchlist_results_with_match)
+        with agents.patched():
+            final_state = create_workflow(watchlist_first=True).invoke({"customer_name": "Vladimir Petrov", "error": []})
+        
+        queries = agents[0].search_adverse_media.call_args.kwargs["queries"]
+        assert len(queries) == 1 and '"Vlad Petrov"' in queries[0]
+        assert final_state["risk_level"] == "HIGH"
+        agents[2].generate_assessment.assert_not_called()
+    
+    def test_watchlist_failure_default_search(self, make_agents, sample_watchlist_results_no_match):
+        """Test a failed screening falls back to the SearchAgent's own queries."""
+        agents = make_agents(sample_watchlist_results_no_match)
+        agents[1].check_watchlists.side_effect = RuntimeError("watchlist down")
+        with agents.patched():
+            final_state = create_workflow(watchlist_first=True).invoke({"customer_name": "John Smith", "error": []})
+        
+        assert agents[0].search_adverse_media.call_args.kwargs["queries"] is None
+        assert final_state["error"] == ["WatchlistAgent error: watchlist down"]
+    
+    def test_async_workflow(self, make_agents, sample_watchlist_results_no_match):
+        """Test the async workflow plans the same queries."""
+        agents = make_agents(sample_watchlist_results_no_match)
+        with agents.patched():
+            asyncio.run(
+                create_workflow(use_async=True, watchlist_first=True).ainvoke({"customer_name": "John Smith", "error": []})
+            )
+        
+        assert agents.calls == ["acheck_watchlists", "asearch_adverse_media", "agenerate_assessment"]
+        assert len(agents[0].asearch_adverse_media.call_args.kwargs["queries"]) == 1
+    
+    def test_registry_reads_environment(self):
+        """Test WATCHLIST_FIRST selects the watchlist-first variant of the shared workflow."""
+        with patch.dict(os.environ, {"WATCHLIST_FIRST": "on"}):
+            watchlist_first = get_compiled_workflow()
+        assert watchlist_first is get_compiled_workflow(watchlist_first=True)
+        assert watchlist_first is not get_compiled_workflow(watchlist_first=False)
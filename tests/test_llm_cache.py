@@ -0,0 +1,163 @@
+"""
+Unit tests for the LLM response cache.
+"""
+
+import pytest
+import os
+from unittest.mock import Mock, patch
+from llm_cache import ResponseCache, template_fingerprint, create_response_cache
+
+
+class TestResponseCache:
+    """Test the two-tier response cache."""
+    
+    def test_miss_then_hit(self):
+        """Test a stored response is returned for the same model and prompt."""
+        cache = ResponseCache("v1")
+        assert cache.get("model", "prompt") is None
+        cache.put("model", "prompt", "report")
+        assert cache.get("model", "prompt") == "report"
+        
+        stats = cache.get_stats()
+        assert stats["memory_hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["hit_ratio"] == 0.5
+    
+    def test_key_includes_model(self):
+        """Test the same prompt for a different model is a miss."""
+        cache = ResponseCache("v1")
+        cache.put("model-a", "prompt", "report")
+        assert cache.get("model-b", "prompt") is None
+    
+    def test_ttl_expiry(self):
+        """Test expired entries are not returned."""
+        cache = ResponseCache("v1", ttl=10)
+        with patch("llm_cache.time.time", return_value=1000.0):
+            cache.put("model", "prompt", "report")
+        with patch("llm_cache.time.time", return_value=1011.0):
+            assert cache.get("model", "prompt") is None
+    
+    def test_lru_eviction(self):
+        """Test the least recently used entry is evicted at capacity."""
+        cache = ResponseCache("v1", max_entries=2)
+        cache.put("m", "a", "A")
+        cache.put("m", "b", "B")
+        cache.get("m", "a")
+        cache.put("m", "c", "C")
+        assert cache.get("m", "b") is None
+        assert cache.get("m", "a") == "A"
+    
+    def test_disk_tier_survives_restart(self, tmp_path):
+        """Test persisted responses are served by a new cache instance."""
+        path = str(tmp_path / "cache.sqlite3")
+        ResponseCache("v1", path=path).put("model", "prompt", "report")
+        
+        cache = ResponseCache("v1", path=path)
+        assert cache.get("model", "prompt") == "report"
+        assert cache.get_stats()["disk_hits"] == 1
+    
+    def test_delete(self, tmp_path):
+        """Test a deleted response is gone from both tiers."""
+        path = str(tmp_path / "cache.sqlite3")
+        cache = ResponseCache("v1", path=path)
+        cache.put("model", "prompt", "report")
+        cache.delete("model", "prompt")
+        assert cache.get("model", "prompt") is None
+        assert ResponseCache("v1", path=path).get("model", "prompt") is None
+    
+    def test_template_change_invalidates_disk_tier(self, tmp_path):
+        """Test entries from a previous template version are purged."""
+        path = str(tmp_path / "cache.sqlite3")
+        ResponseCache(template_fingerprint("old template"), path=path).put("model", "prompt", "report")
+        
+        cache = ResponseCache(template_fingerprint("new template"), path=path)
+        assert cache.get("model", "prompt") is None
+        # Switching back does not resurrect purged entries
+        assert ResponseCache(template_fingerprint("old template"), path=path).get("model", "prompt") is None
+
+
+class TestCreateResponseCache:
+    """Test cache configuration from the environment."""
+    
+    @patch.dict(os.environ, {'LLM_CACHE': 'off'})
+    def test_off(self):
+        """Test caching can be disabled."""
+        assert create_response_cache("template") is None
+    
+    @patch.dict(os.environ, {'LLM_CACHE': 'bogus'})
+    def test_invalid_mode(self):
+        """Test unknown modes are rejected."""
+        with pytest.raises(ValueError, match="LLM_CACHE"):
+            create_response_cache("template")
+    
+    def test_disk_mode(self, tmp_path):
+        """Test disk mode uses LLM_CACHE_PATH."""
+        path = str(tmp_path / "c.sqlite3")
+        with patch.dict(os.environ, {'LLM_CACHE': 'disk', 'LLM_CACHE_PATH': path}):
+            cache = create_response_cache("template")
+        assert cache.path == path
+
+
+class TestAnalysisAgentCaching:
+    """Test AnalysisAgent serves repeated inputs from the cache."""
+    
+    @patch.dict(os.environ, {'GOOGLE_API_KEY': 'test_key', 'LLM_CACHE': 'memory', 'FAST_PATH': 'off'})
+    def test_identical_inputs_call_model_once(self, sample_search_results, sample_watchlist_results_no_match,
+                                              sample_assessment_json):
+        """Test the second identical report request does not call Gemini."""
+        from agents import AnalysisAgent
+        
+        agent = AnalysisAgent()
+        agent.model = Mock()
+        agent.model.generate_content.return_value = Mock(text=sample_assessment_json)
+        
+        first = agent.generate_report("John Smith", sample_search_results, sample_watchlist_results_no_match)
+        second = agent.generate_report("John Smith", sample_search_results, sample_watchlist_results_no_match)
+        
+        assert first == second
+        assert agent.model.generate_content.call_count == 1
+        assert agent.response_cache.get_stats()["memory_hits"] == 1
+    
+    @patch.dict(os.environ, {'GOOGLE_API_KEY': 'test_key', 'LLM_CACHE': 'memory', 'FAST_PATH': 'off'})
+    def test_fallback_reports_not_cached(self, sample_watchlist_results_no_match):
+        """Test failed generations are retried on the next request."""
+        from agents import AnalysisAgent
+        
+        agent = AnalysisAgent()
+        agent.model = Mock()
+        agent.model.generate_content.side_effect = Exception("API Error")
+        
+        agent.generate_report("John Smith", [], sample_watchlist_results_no_match)
+        agent.generate_report("John Smith", [], sample_watchlist_results_no_match)
+        assert agent.response_cache.get_stats()["writes"] == 0
+    
+    @patch.dict(os.environ, {'GOOGLE_API_KEY': 'test_key', 'LLM_CACHE': 'memory', 'FAST_PATH': 'off'})
+    def test_unparseable_entry_evicted(self, sample_search_results, sample_watchlist_results_no_match,
+                                       sample_assessment_json):
+        """Test a cached response that no longer parses is evicted and regenerated."""
+        from agents import AnalysisAgent
+        
+        agent = AnalysisAgent()
+        agent.model = Mock()
+        agent.model.generate_content.return_value = Mock(text=sample_assessment_json)
+        prompt, _ = agent.prompt_builder.build("John Smith", sample_search_results, sample_watchlist_results_no_match)
+        model_name = agent.router.route("John Smith", sample_search_results, sample_watchlist_results_no_match).model_name
+        agent.response_cache.put(model_name, prompt, "Risk Level: HIGH")
+        
+        assessment = agent.generate_assessment("John Smith", sample_search_results, sample_watchlist_results_no_match)
+        assert assessment["risk_level"] == "HIGH"
+        assert agent.model.generate_content.call_count == 1
+        assert agent.response_cache.get(model_name, prompt) == sample_assessment_json
+    
+    @patch.dict(os.environ, {'GOOGLE_API_KEY': 'test_key', 'LLM_CACHE': 'memory'})
+    def test_schema_and_batch_templates_in_fingerprint(self):
+        """Test editing the response schema or a batch template changes the cache version."""
+        import agents
+        from agents import AnalysisAgent
+        
+        version = AnalysisAgent().response_cache.template_version
+        with patch.object(agents, "REPORT_SCHEMA", {**agents.REPORT_SCHEMA, "required": []}):
+            assert AnalysisAgent().response_cache.template_version != version
+        templates = agents.PROMPT_TEMPLATES[:-1] + ("edited batch section",)
+        with patch.object(agents, "PROMPT_TEMPLATES", templates):
+            assert AnalysisAgent().response_cache.template_version != version
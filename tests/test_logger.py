@@ -0,0 +1,64 @@
+"""
+Unit tests for performance tracking.
+"""
+
+import pytest
+from logger import Histogram, PerformanceTracker
+
+
+class TestHistogram:
+    """Test the fixed-bucket histogram."""
+    
+    def test_buckets_are_cumulative(self):
+        """Test bucket counts include every smaller bucket."""
+        histogram = Histogram((1, 10))
+        for value in (0.5, 5, 5, 50):
+            histogram.observe(value)
+        
+        snapshot = histogram.snapshot()
+        assert snapshot["buckets"] == {"1": 1, "10": 3, "+Inf": 4}
+        assert snapshot["count"] == 4
+        assert snapshot["mean"] == pytest.approx(15.125)
+        assert snapshot["p50"] == 5
+        assert snapshot["max"] == 50
+    
+    def test_empty(self):
+        """Test an empty histogram reports zeros."""
+        snapshot = Histogram((1,)).snapshot()
+        assert snapshot["count"] == 0
+        assert snapshot["p95"] == 0.0
+
+
+class TestLLMUsage:
+    """Test LLM token and latency accounting."""
+    
+    def test_track_llm_usage(self):
+        """Test a request feeds every histogram and the endpoint breakdown."""
+        tracker = PerformanceTracker()
+        tracker.track_llm_usage("generate_content (small)", "models/small", "prompt", 400, 100, 2.0)
+        
+        metrics = tracker.get_llm_metrics()
+        histograms = metrics["histograms"]
+        assert histograms["input_tokens"]["sum"] == 400
+        assert histograms["output_tokens"]["sum"] == 100
+        assert histograms["ttft_seconds"]["max"] == 2.0
+        assert histograms["tokens_per_second"]["max"] == pytest.approx(50.0)
+        assert metrics["endpoints"]["generate_content (small)"]["average_latency"] == 2.0
+        assert metrics["slowest"][0]["model"] == "models/small"
+        assert "prompt" not in metrics["slowest"][0]
+    
+    def test_slowest_requests_kept(self):
+        """Test only the slowest requests are kept, slowest first."""
+        tracker = PerformanceTracker(slowest_kept=2)
+        for latency in (1.0, 3.0, 2.0):
+            tracker.track_llm_usage("generate_content (large)", "models/large", f"p{latency}", 10, 10, latency)
+        
+        assert [request["latency"] for request in tracker.get_llm_metrics()["slowest"]] == [3.0, 2.0]
+    
+    def test_usage_survives_new_investigation(self):
+        """Test LLM usage is not reset per investigation."""
+        tracker = PerformanceTracker()
+        tracker.track_llm_usage("generate_content (small)", "models/small", "prompt", 10, 10, 1.0)
+        tracker.start_investigation("John Smith")
+        assert tracker.get_llm_metrics()["histograms"]["input_tokens"]["count"] == 1
+        assert tracker.get_summary()["llm"]["histograms"]["input_tokens"]["count"] == 1
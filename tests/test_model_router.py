@@ -0,0 +1,115 @@
+"""
+Unit tests for model tier routing.
+"""
+
+import pytest
+import os
+import json
+from unittest.mock import Mock, patch
+from model_router import ModelRouter
+from replay import ReplayStore
+
+
+class TestModelRouter:
+    """Test route decisions and per-tier statistics."""
+    
+    def test_clean_investigation_routes_small(self, sample_watchlist_results_no_match):
+        """Test no watchlist match and no hits go to the small tier."""
+        route = ModelRouter().route("John Smith", [], sample_watchlist_results_no_match)
+        assert route.tier == "small"
+        assert route.model_name == "models/gemini-2.0-flash-lite"
+    
+    def test_watchlist_match_routes_large(self, sample_watchlist_results_with_match):
+        """Test a watchlist match always goes to the large tier."""
+        route = ModelRouter().route("Vladimir Petrov", [], sample_watchlist_results_with_match)
+        assert route.tier == "large"
+        assert route.reason == "watchlist match"
+    
+    def test_many_hits_route_large(self, sample_watchlist_results_no_match):
+        """Test more real hits than ROUTER_MAX_SMALL_HITS go to the large tier."""
+        hits = [{"title": f"Article {i}", "snippet": "Unrelated", "link": f"https://example.com/{i}"} for i in range(3)]
+        router = ModelRouter(max_small_hits=2)
+        assert router.route("John Smith", hits, sample_watchlist_results_no_match).tier == "large"
+    
+    def test_simulated_hits_ignored(self, sample_watchlist_results_no_match):
+        """Test simulated search results do not count as hits."""
+        hits = [{"title": "Simulated", "snippet": "Simulated", "simulated": True} for _ in range(10)]
+        router = ModelRouter(max_small_hits=2)
+        assert router.route("John Smith", hits, sample_watchlist_results_no_match).tier == "small"
+    
+    def test_relevant_hit_routes_large(self, sample_watchlist_results_no_match):
+        """Test a hit naming the customer with risk terms goes to the large tier."""
+        hits = [{
+            "title": "John Smith charged with fraud",
+            "snippet": "John Smith was charged with fraud and money laundering.",
+            "link": "https://example.com/news"
+        }]
+        route = ModelRouter(max_small_relevance=0.3).route("John Smith", hits, sample_watchlist_results_no_match)
+        assert route.tier == "large"
+        assert "relevant search hit" in route.reason
+    
+    def test_routing_disabled(self, sample_watchlist_results_no_match):
+        """Test MODEL_ROUTING=off sends everything to the large tier."""
+        with patch.dict(os.environ, {"MODEL_ROUTING": "off", "GEMINI_LARGE_MODEL": "models/big"}):
+            route = ModelRouter.from_env().route("John Smith", [], sample_watchlist_results_no_match)
+        assert route == ("large", "models/big", "routing disabled")
+    
+    def test_record_uses_usage_metadata(self):
+        """Test token counts come from usage_metadata when the response has it."""
+        router = ModelRouter()
+        response = Mock(text="{}")
+        response.usage_metadata.prompt_token_count = 120
+        response.usage_metadata.candidates_token_count = 40
+        router.record("small", 0.5, "prompt", response)
+        router.record("small", 1.5, "prompt", response)
+        
+        stats = router.get_stats()
+        assert stats["small"]["requests"] == 2
+        assert stats["small"]["mean_latency"] == pytest.approx(1.0)
+        assert stats["small"]["max_latency"] == pytest.approx(1.5)
+        assert stats["small"]["prompt_tokens"] == 240
+        assert stats["small"]["output_tokens"] == 80
+        assert stats["large"]["requests"] == 0
+    
+    def test_record_estimates_tokens(self):
+        """Test token counts are estimated for responses without usage_metadata."""
+        router = ModelRouter()
+        response = type("Response", (), {"text": "x" * 40})()
+        router.record("large", 0.2, "y" * 400, response)
+        
+        stats = router.get_stats()["large"]
+        assert stats["prompt_tokens"] > 0
+        assert stats["output_tokens"] > 0
+
+
+class TestAnalysisAgentRouting:
+    """Test AnalysisAgent sends each investigation to its routed model."""
+    
+    def test_replay_uses_routed_model(self, tmp_path, sample_watchlist_results_no_match,
+                                      sample_watchlist_results_with_match, sample_assessment):
+        """Test replayed fixtures are looked up under the small and large model names."""
+        env = {
+            "REPLAY_MODE": "replay", "REPLAY_DIR": str(tmp_path), "REPLAY_SPEED": "0",
+            "LLM_CACHE": "off", "FAST_PATH": "off"
+        }
+        with patch.dict(os.environ, env):
+            from agents import AnalysisAgent
+            agent = AnalysisAgent()
+            
+            store = ReplayStore(str(tmp_path), speed=0)
+            clean_prompt, _ = agent.prompt_builder.build("John Smith", [], sample_watchlist_results_no_match)
+            match_prompt, _ = agent.prompt_builder.build("Vladimir Petrov", [], sample_watchlist_results_with_match)
+            low_assessment = {**sample_assessment, "risk_level": "LOW"}
+            store.record("gemini", {"model": "models/gemini-2.0-flash-lite", "prompt": clean_prompt},
+                         {"text": json.dumps(low_assessment)}, 0.1)
+            store.record("gemini", {"model": "models/gemini-2.0-flash-exp", "prompt": match_prompt},
+                         {"text": json.dumps(sample_assessment)}, 0.1)
+            
+            clean = agent.generate_assessment("John Smith", [], sample_watchlist_results_no_match)
+            match = agent.generate_assessment("Vladimir Petrov", [], sample_watchlist_results_with_match)
+        
+        assert clean["risk_level"] == "LOW"
+        assert match["risk_level"] == "HIGH"
+        stats = agent.get_router_stats()
+        assert stats["small"]["requests"] == 1
+        assert stats["large"]["requests"] == 1
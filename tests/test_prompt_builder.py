@@ -0,0 +1,128 @@
+"""
+Unit tests for token-budgeted prompt construction.
+"""
+
+import pytest
+from prompt_builder import PromptBuilder, truncate_snippet, REPORT_PROMPT_TEMPLATE
+from tools import estimate_tokens
+
+
+def make_results(count, snippet_words=20):
+    """Build distinct search results about John Smith."""
+    return [
+        {
+            "title": f"John Smith fraud case {i}",
+            "snippet": " ".join(f"word{i}x{j}" for j in range(snippet_words)),
+            "link": f"https://news{i}.example.com/story"
+        }
+        for i in range(count)
+    ]
+
+
+class TestTruncateSnippet:
+    """Test snippet truncation."""
+    
+    def test_short_snippet_unchanged(self):
+        """Test snippets within the limit are kept as is."""
+        assert truncate_snippet("short text", 50) == "short text"
+    
+    def test_cuts_at_word_boundary(self):
+        """Test long snippets are cut between words with an ellipsis."""
+        result = truncate_snippet("alpha beta gamma delta epsilon", 16)
+        assert result == "alpha beta..."
+        assert len(result) <= 16
+
+
+class TestPromptBuilder:
+    """Test PromptBuilder budget enforcement."""
+    
+    def test_respects_token_budget(self, sample_watchlist_results_no_match):
+        """Test the prompt stays within the budget by dropping low-ranked results."""
+        builder = PromptBuilder(token_budget=300, snippet_chars=1000, top_n=50)
+        prompt, stats = builder.build("John Smith", make_results(30), sample_watchlist_results_no_match)
+        
+        assert stats["prompt_tokens"] <= 300
+        assert stats["prompt_tokens"] == estimate_tokens(prompt)
+        assert 0 < stats["results_forwarded"] < 30
+    
+    def test_best_result_kept_under_tiny_budget(self, sample_watchlist_results_no_match):
+        """Test the most relevant result is forwarded even if it exceeds the budget."""
+        builder = PromptBuilder(token_budget=10)
+        prompt, stats = builder.build("John Smith", make_results(3), sample_watchlist_results_no_match)
+        assert stats["results_forwarded"] == 1
+    
+    def test_truncates_snippets(self, sample_watchlist_results_no_match):
+        """Test long snippets are truncated and counted."""
+        builder = PromptBuilder(snippet_chars=40)
+        prompt, stats = builder.build("John Smith", make_results(2, snippet_words=50), sample_watchlist_results_no_match)
+        assert stats["snippets_truncated"] == 2
+        assert "..." in prompt
+    
+    def test_dedupes_snippets(self, sample_watchlist_results_no_match):
+        """Test duplicate results are merged before ranking."""
+        results = make_results(2)
+        results.append({**results[0], "link": results[0]["link"] + "?utm_source=x"})
+        prompt, stats = PromptBuilder().build("John Smith", results, sample_watchlist_results_no_match)
+        assert stats["duplicates_removed"] == 1
+        assert stats["results_forwarded"] == 2
+    
+    def test_compact_template_without_evidence(self, sample_watchlist_results_no_match):
+        """Test no watchlist match and no relevant real hits use the compact prompt."""
+        results = [
+            {"title": "Weather today", "snippet": "Sunny", "link": "https://a.example.com"},
+            {"title": "John Smith fraud", "snippet": "Simulated", "link": "https://b.example.com", "simulated": True}
+        ]
+        prompt, stats = PromptBuilder().build("John Smith", results, sample_watchlist_results_no_match)
+        assert stats["compact"] is True
+        assert "Respond with a JSON object" not in prompt
+        assert "no matches on OFAC" in prompt
+    
+    def test_full_template_after_failed_search(self, sample_watchlist_results_no_match):
+        """Test a failed search keeps the full prompt: its stand-in results are no evidence of a clean search."""
+        results = [{"title": "News", "snippet": "Simulated", "link": "https://b.example.com", "simulated": True, "search_failed": True}]
+        assert PromptBuilder().is_compact("John Smith", results, sample_watchlist_results_no_match) is False
+    
+    def test_full_template_with_relevant_hits(self, sample_watchlist_results_no_match):
+        """Test relevant real hits keep the full prompt even without a watchlist match."""
+        prompt, stats = PromptBuilder().build("John Smith", make_results(1), sample_watchlist_results_no_match)
+        assert stats["compact"] is False
+        assert "Respond with a JSON object" in prompt
+    
+    def test_full_template_with_match(self, sample_watchlist_results_with_match):
+        """Test watchlist matches keep the full prompt."""
+        prompt, stats = PromptBuilder().build("Vladimir Petrov", [], sample_watchlist_results_with_match)
+        assert stats["compact"] is False
+        assert prompt.startswith(REPORT_PROMPT_TEMPLATE.split("\n")[0])
+        assert "No adverse media found." in prompt
+
+    
+    def test_batch_prompt_sections(self, sample_watchlist_results_no_match):
+        """Test batch prompts carry one tagged section per customer."""
+        builder = PromptBuilder()
+        sections = [
+            builder.build_section(f"C{i}", "John Smith", make_results(1), sample_watchlist_results_no_match)[0]
+            for i in (1, 2)
+        ]
+        prompt = builder.build_batch(sections)
+        assert "=== customer_id: C1 ===" in prompt
+        assert "=== customer_id: C2 ===" in prompt
+        assert '"assessments"' in prompt
+
+
+class TestPlanBatches:
+    """Test adaptive batch sizing."""
+    
+    def test_packs_up_to_max_size(self):
+        """Test small sections are packed up to max_batch_size."""
+        builder = PromptBuilder(batch_token_budget=10000, max_batch_size=3)
+        assert builder.plan_batches([50] * 7) == [[0, 1, 2], [3, 4, 5], [6]]
+    
+    def test_packs_by_token_budget(self):
+        """Test large sections get smaller batches."""
+        builder = PromptBuilder(batch_token_budget=1000, max_batch_size=8)
+        assert builder.plan_batches([600, 600, 100, 100]) == [[0], [1, 2, 3]]
+    
+    def test_oversized_section_gets_own_batch(self):
+        """Test a section larger than the budget is still planned."""
+        builder = PromptBuilder(batch_token_budget=100)
+        assert builder.plan_batches([500, 500]) == [[0], [1]]
@@ -0,0 +1,63 @@
+"""
+Unit tests for search query planning.
+"""
+
+import pytest
+import os
+from unittest.mock import patch
+from query_planner import QueryPlanner
+
+
+class TestQueryPlanner:
+    """Test plans chosen from the watchlist result."""
+    
+    def test_match_searches_names_and_aliases(self, sample_watchlist_results_with_match):
+        """Test a watchlist match yields one query over the listed name and its aliases."""
+        plan = QueryPlanner().plan("Vladimir Petrov", sample_watchlist_results_with_match)
+        
+        assert plan.kind == "watchlist_match"
+        assert len(plan.queries) == 1
+        for name in ["Vladimir Petrov", "Vlad Petrov", "V. Petrov", "Vladimir P. Petrov"]:
+            assert f'"{name}"' in plan.queries[0]
+        assert "sanctions" in plan.queries[0]
+        # The generic fraud template is skipped
+        assert "embezzlement" not in plan.queries[0]
+    
+    def test_clean_single_query(self, sample_watchlist_results_no_match):
+        """Test a clean watchlist result yields the single combined query."""
+        plan = QueryPlanner().plan("John Smith", sample_watchlist_results_no_match)
+        
+        assert plan.kind == "clean"
+        assert plan.queries == [
+            '"John Smith" (fraud OR sanctions OR financial crime OR scam OR embezzlement OR OFAC OR blacklist)'
+        ]
+    
+    def test_failed_screening_uses_default_search(self):
+        """Test a missing or failed watchlist result leaves the queries to the SearchAgent."""
+        planner = QueryPlanner()
+        assert planner.plan("John Smith", {}).queries is None
+        failed = {"matched": False, "watchlists_checked": [], "matches": []}
+        assert planner.plan("John Smith", failed).kind == "default"
+    
+    def test_match_names(self):
+        """Test the customer's spelling comes first, duplicates are dropped and the list is capped."""
+        matches = [
+            {"watchlist": "UN_Sanctions", "name": "Vladimir Petrov", "similarity": 0.9},
+            {"watchlist": "OFAC", "name": "Vladimir Petrov", "similarity": 0.95}
+        ]
+        names = QueryPlanner(max_names=3).match_names("vladimir  petrov", matches)
+        assert names == ["vladimir  petrov", "Vlad Petrov", "V. Petrov"]
+    
+    def test_stats(self, sample_watchlist_results_with_match, sample_watchlist_results_no_match):
+        """Test plans are counted per kind with the queries planned."""
+        planner = QueryPlanner()
+        planner.plan("Vladimir Petrov", sample_watchlist_results_with_match)
+        planner.plan("John Smith", sample_watchlist_results_no_match)
+        planner.plan("John Smith", {})
+        
+        assert planner.get_stats() == {"watchlist_match": 1, "clean": 1, "default": 1, "queries": 2}
+    
+    def test_from_env(self):
+        """Test the name cap is read from the environment."""
+        with patch.dict(os.environ, {"PLANNER_MAX_NAMES": "2"}):
+            assert QueryPlanner.from_env().max_names == 2
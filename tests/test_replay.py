@@ -0,0 +1,125 @@
+"""
+Unit tests for the record/replay layer.
+"""
+
+import pytest
+import asyncio
+import os
+from unittest.mock import AsyncMock, Mock, patch
+from replay import (
+    ReplayStore, ReplaySearchService, ReplayModel, ReplayMissError,
+    get_replay_mode
+)
+
+
+class TestReplayStore:
+    """Test fixture recording and lookup."""
+    
+    def test_record_then_lookup(self, tmp_path):
+        """Test a recorded response is returned with a recorded latency."""
+        store = ReplayStore(str(tmp_path), speed=0)
+        store.record("search", {"q": "test"}, {"items": []}, 0.25)
+        store.record("search", {"q": "test"}, {"items": []}, 0.75)
+        
+        response, latency = store.lookup("search", {"q": "test"})
+        assert response == {"items": []}
+        assert latency in (0.25, 0.75)
+    
+    def test_lookup_miss(self, tmp_path):
+        """Test an unrecorded request raises ReplayMissError."""
+        store = ReplayStore(str(tmp_path), speed=0)
+        with pytest.raises(ReplayMissError):
+            store.lookup("search", {"q": "unknown"})
+    
+    def test_key_independent_of_param_order(self):
+        """Test request keys are canonical."""
+        assert ReplayStore.make_key("search", {"q": "a", "num": 3}) == ReplayStore.make_key("search", {"num": 3, "q": "a"})
+    
+    def test_replay_sleeps_scaled_latency(self, tmp_path):
+        """Test replay waits for the recorded latency times the speed factor."""
+        store = ReplayStore(str(tmp_path), speed=0.5)
+        store.record("gemini", {"prompt": "p"}, {"text": "r"}, 0.2)
+        with patch("replay.time.sleep") as mock_sleep:
+            assert store.replay("gemini", {"prompt": "p"}) == {"text": "r"}
+        mock_sleep.assert_called_once_with(pytest.approx(0.1))
+
+
+class TestReplaySearchService:
+    """Test the Custom Search stand-in."""
+    
+    def test_record_and_replay_search(self, tmp_path):
+        """Test recorded cse().list() responses replay without the real service."""
+        store = ReplayStore(str(tmp_path), speed=0)
+        inner = Mock()
+        inner.cse.return_value.list.return_value.execute.return_value = {"items": [{"title": "T"}]}
+        
+        recorder = ReplaySearchService(store, inner=inner)
+        recorder.cse().list(q="John", cx="cx1", num=3).execute()
+        
+        # Search engine ID is not part of the key
+        replayer = ReplaySearchService(store)
+        assert replayer.cse().list(q="John", cx="other", num=3).execute() == {"items": [{"title": "T"}]}
+
+
+class TestReplayModel:
+    """Test the Gemini model stand-in."""
+    
+    def test_record_and_replay_generation(self, tmp_path):
+        """Test recorded generate_content() text replays without the real model."""
+        store = ReplayStore(str(tmp_path), speed=0)
+        inner = Mock()
+        inner.generate_content.return_value = Mock(text="Report text")
+        
+        ReplayModel(store, "model-a", inner=inner).generate_content("prompt")
+        
+        assert ReplayModel(store, "model-a").generate_content("prompt").text == "Report text"
+        with pytest.raises(ReplayMissError):
+            ReplayModel(store, "model-b").generate_content("prompt")
+    
+    def test_record_and_replay_async_generation(self, tmp_path):
+        """Test generate_content_async() records and replays like generate_content()."""
+        store = ReplayStore(str(tmp_path), speed=0)
+        inner = Mock()
+        inner.generate_content_async = AsyncMock(return_value=Mock(text="Async report"))
+        
+        asyncio.run(ReplayModel(store, "model-a", inner=inner).generate_content_async("prompt"))
+        
+        replayed = asyncio.run(ReplayModel(store, "model-a").generate_content_async("prompt"))
+        assert replayed.text == "Async report"
+        assert ReplayModel(store, "model-a").generate_content("prompt").text == "Async report"
+    
+    def test_record_and_replay_stream(self, tmp_path):
+        """Test a streamed response is recorded once complete and replays as one chunk."""
+        store = ReplayStore(str(tmp_path), speed=0)
+        inner = Mock()
+        inner.generate_content.return_value = iter([Mock(text="Streamed "), Mock(text="report")])
+        
+        chunks = ReplayModel(store, "model-a", inner=inner).generate_content("prompt", stream=True)
+        assert [chunk.text for chunk in chunks] == ["Streamed ", "report"]
+        
+        replayed = ReplayModel(store, "model-a").generate_content("prompt", stream=True)
+        assert [chunk.text for chunk in replayed] == ["Streamed report"]
+
+
+class TestReplayMode:
+    """Test replay mode configuration and agent wiring."""
+    
+    @patch.dict(os.environ, {'REPLAY_MODE': 'bogus'})
+    def test_invalid_mode(self):
+        """Test unknown REPLAY_MODE is rejected."""
+        with pytest.raises(ValueError, match="REPLAY_MODE"):
+            get_replay_mode()
+    
+    def test_agents_replay_without_api_key(self, tmp_path):
+        """Test agents run from fixtures without an API key or network."""
+        from agents import SearchAgent, AnalysisAgent
+        
+        with patch.dict(os.environ, {'REPLAY_MODE': 'replay', 'REPLAY_DIR': str(tmp_path), 'REPLAY_SPEED': '0'}, clear=True):
+            search_agent = SearchAgent()
+            analysis_agent = AnalysisAgent()
+            
+            assert isinstance(search_agent.search_service, ReplaySearchService)
+            assert isinstance(analysis_agent.model, ReplayModel)
+            # Unrecorded queries fall back to simulated results instead of calling the API
+            results = search_agent.search_adverse_media("John Smith")
+            assert len(results) > 0
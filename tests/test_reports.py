@@ -0,0 +1,145 @@
+"""
+Unit tests for structured assessments and report rendering.
+"""
+
+import pytest
+import json
+from reports import (
+    AssessmentStreamParser, parse_assessment, parse_batch_assessments, render_report, render_section
+)
+
+
+class TestParseAssessment:
+    """Test validation of structured model responses."""
+    
+    def test_valid_response(self, sample_assessment_json):
+        """Test a schema-conforming response is parsed."""
+        assessment = parse_assessment(sample_assessment_json)
+        assert assessment["risk_level"] == "HIGH"
+        assert assessment["recommendations"] == ["Do not onboard", "Escalate to compliance"]
+    
+    def test_risk_level_normalized(self, sample_assessment):
+        """Test the risk level is upper-cased."""
+        sample_assessment["risk_level"] = " medium "
+        assert parse_assessment(json.dumps(sample_assessment))["risk_level"] == "MEDIUM"
+    
+    def test_not_json(self):
+        """Test free-text responses are rejected."""
+        with pytest.raises(ValueError):
+            parse_assessment("Risk Level: HIGH")
+    
+    def test_missing_field(self, sample_assessment):
+        """Test responses missing schema fields are rejected."""
+        del sample_assessment["findings"]
+        with pytest.raises(ValueError, match="findings"):
+            parse_assessment(json.dumps(sample_assessment))
+    
+    def test_invalid_risk_level(self, sample_assessment):
+        """Test risk levels outside LOW/MEDIUM/HIGH are rejected."""
+        sample_assessment["risk_level"] = "UNKNOWN"
+        with pytest.raises(ValueError):
+            parse_assessment(json.dumps(sample_assessment))
+
+
+class TestParseBatchAssessments:
+    """Test splitting batched responses into per-customer assessments."""
+    
+    def test_split_by_customer_id(self, sample_assessment):
+        """Test each assessment is keyed by its customer ID."""
+        response = json.dumps({"assessments": [
+            {"customer_id": "C2", **sample_assessment},
+            {"customer_id": "C1", **sample_assessment, "risk_level": "LOW"}
+        ]})
+        assessments = parse_batch_assessments(response, ["C1", "C2"])
+        assert assessments["C1"]["risk_level"] == "LOW"
+        assert assessments["C2"]["risk_level"] == "HIGH"
+        assert "customer_id" not in assessments["C1"]
+    
+    def test_invalid_items_left_out(self, sample_assessment):
+        """Test malformed and unknown assessments are skipped."""
+        response = json.dumps({"assessments": [
+            {"customer_id": "C1", "risk_level": "HIGH"},
+            {"customer_id": "C9", **sample_assessment},
+            {"customer_id": "C2", **sample_assessment}
+        ]})
+        assert list(parse_batch_assessments(response, ["C1", "C2"])) == ["C2"]
+    
+    def test_malformed_response(self):
+        """Test responses without an assessments list are rejected."""
+        with pytest.raises(ValueError):
+            parse_batch_assessments('{"foo": []}', ["C1"])
+        with pytest.raises(ValueError):
+            parse_batch_assessments("not json", ["C1"])
+
+
+class TestRenderReport:
+    """Test markdown rendering of assessments."""
+    
+    def test_sections(self, sample_assessment):
+        """Test all six sections are rendered."""
+        report = render_report("Vladimir Petrov", sample_assessment)
+        assert "## KYC Risk Assessment Report - Vladimir Petrov" in report
+        assert "**2. Risk Level:** HIGH" in report
+        assert "- Listed on OFAC for sanctions evasion" in report
+        assert "**6. Overall Assessment:**" in report
+    
+    def test_empty_lists(self, sample_assessment):
+        """Test empty findings render as a placeholder bullet."""
+        sample_assessment["findings"] = []
+        assert "- None" in render_report("John Smith", sample_assessment)
+
+
+class TestAssessmentStreamParser:
+    """Test rendering report sections from a streamed response."""
+    
+    def test_chunks_concatenate_to_report(self, sample_assessment):
+        """Test the text returned across chunks is the rendered report."""
+        response_text = json.dumps(sample_assessment, indent=2)
+        parser = AssessmentStreamParser("Vladimir Petrov")
+        texts = [parser.feed(response_text[i:i + 5]) for i in range(0, len(response_text), 5)]
+        
+        assert "".join(texts) == render_report("Vladimir Petrov", parse_assessment(response_text))
+        assert texts[0].startswith("## KYC Risk Assessment Report - Vladimir Petrov")
+    
+    def test_sections_sent_before_response_ends(self, sample_assessment):
+        """Test a section is returned as soon as its field is complete."""
+        response_text = json.dumps(sample_assessment)
+        cut = response_text.index('"risk_level"')
+        parser = AssessmentStreamParser("Vladimir Petrov")
+        
+        text = parser.feed(response_text[:cut])
+        assert "**1. Executive Summary:**" in text
+        assert "Risk Level" not in text
+        assert "**2. Risk Level:** HIGH" in parser.feed(response_text[cut:])
+    
+    def test_alphabetical_fields_streamed_incrementally(self, sample_assessment):
+        """Test fields arriving in alphabetical order are each sent as soon as they complete."""
+        response_text = json.dumps(sample_assessment, sort_keys=True)
+        parser = AssessmentStreamParser("Vladimir Petrov")
+        
+        # Feed the response up to the start of each next field
+        fields = sorted(sample_assessment)
+        cuts = [response_text.index(f'"{field}"') for field in fields[1:]] + [len(response_text)]
+        texts = []
+        fed = 0
+        for cut in cuts:
+            texts.append(parser.feed(response_text[fed:cut]))
+            fed = cut
+        
+        assert texts[0].startswith("## KYC Risk Assessment Report")
+        assert "**1. Executive Summary:**" in texts[0]
+        assert "Key Findings" in texts[1] and "Risk Level" not in texts[1]
+        assert "**2. Risk Level:** HIGH" in texts[4]
+        assert all(texts)
+        # Same header and sections as the rendered report, in arrival order
+        assessment = parse_assessment(response_text)
+        streamed = "".join(texts)
+        assert len(streamed) == len(render_report("Vladimir Petrov", assessment))
+        assert all(render_section(field, assessment[field]) in streamed for field in fields)
+    
+    def test_invalid_field_rejected(self, sample_assessment):
+        """Test a completed field outside the schema raises before it is sent."""
+        sample_assessment["risk_level"] = "SEVERE"
+        response_text = json.dumps(sample_assessment)
+        with pytest.raises(ValueError, match="risk_level"):
+            AssessmentStreamParser("Vladimir Petrov").feed(response_text)
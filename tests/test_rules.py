@@ -0,0 +1,114 @@
+"""
+Unit tests for the rule-based fast path.
+"""
+
+import pytest
+from rules import FastPathRules, EarlyExitRules, clean_assessment, sanctions_assessment
+
+
+class TestFastPathRules:
+    """Test clean-input detection."""
+    
+    def test_no_hits_no_match_is_clean(self, sample_watchlist_results_no_match):
+        """Test an empty search with no watchlist match is clean."""
+        is_clean, _ = FastPathRules().evaluate("John Smith", [], sample_watchlist_results_no_match)
+        assert is_clean
+    
+    def test_watchlist_match_not_clean(self, sample_watchlist_results_with_match):
+        """Test a watchlist match is never clean."""
+        is_clean, reason = FastPathRules().evaluate("Vladimir Petrov", [], sample_watchlist_results_with_match)
+        assert not is_clean
+        assert reason == "watchlist match"
+    
+    def test_unscreened_not_clean(self):
+        """Test a failed watchlist check (nothing checked) is not clean."""
+        is_clean, _ = FastPathRules().evaluate("John Smith", [], {"matched": False, "watchlists_checked": [], "matches": []})
+        assert not is_clean
+    
+    def test_relevant_hit_not_clean(self, sample_watchlist_results_no_match):
+        """Test a hit naming the customer with risk keywords is not clean."""
+        hits = [{"title": "John Smith charged with fraud", "snippet": "", "link": "https://a.com"}]
+        is_clean, _ = FastPathRules().evaluate("John Smith", hits, sample_watchlist_results_no_match)
+        assert not is_clean
+    
+    def test_simulated_results_ignored(self, sample_watchlist_results_no_match):
+        """Test simulated fallback results do not count as hits."""
+        hits = [{"title": "John Smith fraud", "snippet": "", "link": "https://example.com", "simulated": True}] * 5
+        is_clean, _ = FastPathRules().evaluate("John Smith", hits, sample_watchlist_results_no_match)
+        assert is_clean
+    
+    def test_failed_search_not_clean(self, sample_watchlist_results_no_match):
+        """Test simulated results standing in for a failed search are not clean."""
+        hits = [{"title": "News", "snippet": "", "link": "https://example.com", "simulated": True, "search_failed": True}]
+        is_clean, reason = FastPathRules().evaluate("John Smith", hits, sample_watchlist_results_no_match)
+        assert not is_clean
+        assert reason == "search failed"
+    
+    def test_real_hits_not_clean_by_default(self, sample_watchlist_results_no_match):
+        """Test real hits go to the model even when the relevance heuristic scores them low."""
+        hits = [
+            {"title": "John Smith jailed over Ponzi scheme", "snippet": "He stole $40m", "link": "https://a.com"},
+            {"title": "J. Smith convicted of fraud and money laundering", "snippet": "", "link": "https://b.com"}
+        ]
+        for hit in hits:
+            is_clean, reason = FastPathRules().evaluate("John Smith", [hit], sample_watchlist_results_no_match)
+            assert not is_clean
+            assert reason == "1 search hits"
+    
+    def test_relevance_threshold_opt_in(self, sample_watchlist_results_no_match):
+        """Test allowing real hits applies the relevance threshold to them."""
+        hits = [{"title": "John Smith joins board", "snippet": "Appointed director", "link": "https://a.com"}]
+        is_clean, _ = FastPathRules(max_hits=3).evaluate("John Smith", hits, sample_watchlist_results_no_match)
+        assert is_clean
+        is_clean, _ = FastPathRules(max_hits=3, max_hit_relevance=0.0).evaluate(
+            "John Smith", hits, sample_watchlist_results_no_match
+        )
+        assert not is_clean
+    
+    def test_max_hits(self, sample_watchlist_results_no_match, sample_search_results):
+        """Test more real hits than max_hits is not clean."""
+        is_clean, _ = FastPathRules(max_hits=1).evaluate("John Smith", sample_search_results, sample_watchlist_results_no_match)
+        assert not is_clean
+    
+    def test_disabled(self, sample_watchlist_results_no_match):
+        """Test the fast path can be disabled."""
+        is_clean, _ = FastPathRules(enabled=False).evaluate("John Smith", [], sample_watchlist_results_no_match)
+        assert not is_clean
+
+
+class TestCleanAssessment:
+    """Test the templated LOW assessment."""
+    
+    def test_assessment_content(self, sample_watchlist_results_no_match):
+        """Test the assessment names the customer, risk level and watchlists."""
+        assessment = clean_assessment("John Smith", [], sample_watchlist_results_no_match)
+        assert "John Smith" in assessment["executive_summary"]
+        assert assessment["risk_level"] == "LOW"
+        assert "OFAC" in assessment["watchlist_summary"]
+
+
+class TestEarlyExitRules:
+    """Test exact watchlist match detection."""
+    
+    def test_exact_match(self, sample_watchlist_results_with_match):
+        """Test a similarity of 1.0 is an exact match."""
+        match = EarlyExitRules().exact_match(sample_watchlist_results_with_match)
+        assert match["watchlist"] == "OFAC"
+    
+    def test_fuzzy_match_not_exact(self, sample_watchlist_results_with_match):
+        """Test matches below the similarity threshold go to analysis."""
+        sample_watchlist_results_with_match["matches"][0]["similarity"] = 0.9
+        assert EarlyExitRules().exact_match(sample_watchlist_results_with_match) is None
+    
+    def test_disabled(self, sample_watchlist_results_with_match):
+        """Test EARLY_EXIT=off never exits early."""
+        assert EarlyExitRules(enabled=False).exact_match(sample_watchlist_results_with_match) is None
+    
+    def test_sanctions_assessment(self, sample_watchlist_results_with_match):
+        """Test the early-exit assessment is HIGH and cites the match."""
+        match = sample_watchlist_results_with_match["matches"][0]
+        assessment = sanctions_assessment("Vladimir Petrov", [], sample_watchlist_results_with_match, match)
+        assert assessment["risk_level"] == "HIGH"
+        assert "OFAC" in assessment["findings"][0]
+        assert "Sanctions evasion" in assessment["findings"][0]
+
@@ -0,0 +1,133 @@
+"""
+Tests for the local stand-in Custom Search server.
+"""
+
+import pytest
+import os
+import json
+import urllib.request
+import urllib.error
+from unittest.mock import patch
+from search_stub_server import StubSearchServer, parse_latency_spec, load_fixtures
+
+
+FIXTURES = [
+    {
+        "match": "Vladimir Petrov",
+        "items": [
+            {"title": f"Petrov story {i}", "snippet": "Sanctions evasion", "link": f"https://news.example.com/{i}"}
+            for i in range(5)
+        ]
+    }
+]
+
+
+@pytest.fixture
+def stub_server():
+    """Start a stub server on a free port."""
+    server = StubSearchServer(fixtures=FIXTURES, seed=1).start()
+    yield server
+    server.stop()
+
+
+def fetch(url):
+    """GET a URL and return (status, json_body)."""
+    try:
+        with urllib.request.urlopen(url, timeout=5) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+class TestParseLatencySpec:
+    """Test latency distribution specs."""
+    
+    def test_fixed(self):
+        """Test fixed latency."""
+        assert parse_latency_spec("fixed:0.25")() == 0.25
+    
+    def test_uniform_within_bounds(self):
+        """Test uniform samples stay within bounds."""
+        sample = parse_latency_spec("uniform:0.1,0.2")
+        assert all(0.1 <= sample() <= 0.2 for _ in range(50))
+    
+    def test_normal_never_negative(self):
+        """Test normal samples are clipped at zero."""
+        sample = parse_latency_spec("normal:0.0,1.0")
+        assert all(sample() >= 0 for _ in range(50))
+    
+    def test_invalid_specs(self):
+        """Test malformed specs are rejected."""
+        with pytest.raises(ValueError):
+            parse_latency_spec("pareto:1")
+        with pytest.raises(ValueError):
+            parse_latency_spec("uniform:0.1")
+        with pytest.raises(ValueError):
+            parse_latency_spec("fixed:abc")
+
+
+class TestStubSearchServer:
+    """Test the cse.list stand-in."""
+    
+    def test_fixture_results_paged(self, stub_server):
+        """Test matching fixtures are returned and paged with num/start."""
+        status, body = fetch(f"{stub_server.url}/customsearch/v1?q=%22Vladimir+Petrov%22+fraud&num=3&start=4")
+        assert status == 200
+        assert body["searchInformation"]["totalResults"] == "5"
+        assert [item["title"] for item in body["items"]] == ["Petrov story 3", "Petrov story 4"]
+    
+    def test_no_match_has_no_items(self, stub_server):
+        """Test unknown queries return a response without items, like the real API."""
+        status, body = fetch(f"{stub_server.url}/customsearch/v1?q=John+Smith&num=3")
+        assert status == 200
+        assert "items" not in body
+    
+    def test_error_injection(self):
+        """Test injected 429s are counted in /stats."""
+        server = StubSearchServer(rate_429=1.0).start()
+        try:
+            status, body = fetch(f"{server.url}/customsearch/v1?q=test")
+            assert status == 429
+            assert body["error"]["code"] == 429
+            _, stats = fetch(f"{server.url}/stats")
+            assert stats["responses_429"] == 1
+        finally:
+            server.stop()
+    
+    def test_load_fixtures(self, tmp_path):
+        """Test fixtures load from a JSON file."""
+        path = tmp_path / "fixtures.json"
+        path.write_text(json.dumps(FIXTURES))
+        assert load_fixtures(str(path)) == FIXTURES
+
+
+class TestSearchAgentWithStubServer:
+    """Test SearchAgent pointed at the stub server via GOOGLE_SEARCH_ENDPOINT."""
+    
+    def test_search_agent_uses_stub(self, stub_server):
+        """Test real HTTP requests from SearchAgent are served by the stub."""
+        from agents import SearchAgent
+        
+        with patch.dict(os.environ, {'GOOGLE_SEARCH_ENDPOINT': stub_server.url}):
+            agent = SearchAgent()
+            results = agent.search_adverse_media("Vladimir Petrov")
+        
+        assert any(result["title"].startswith("Petrov story") for result in results)
+        assert stub_server.stats["requests"] == 3
+    
+    def test_retries_on_injected_errors(self):
+        """Test 5xx responses from the stub go through retry_with_backoff."""
+        from agents import SearchAgent
+        
+        server = StubSearchServer(rate_5xx=1.0).start()
+        try:
+            with patch.dict(os.environ, {'GOOGLE_SEARCH_ENDPOINT': server.url}), \
+                    patch('error_handling.time.sleep'):
+                agent = SearchAgent()
+                results = agent.search_adverse_media("John Smith")
+        finally:
+            server.stop()
+        
+        # Each of the 3 queries is tried 3 times before falling back to simulated results
+        assert server.stats["responses_5xx"] == 9
+        assert len(results) > 0
@@ -3,12 +3,25 @@ Unit tests for custom tools (watchlist checking, search query formatting).
 """
 
 import pytest
+from datetime import date
 from tools import (
     check_watchlist,
+    check_watchlist_batch,
     format_search_query,
     normalize_name,
     calculate_similarity,
     check_name_match,
+    format_combined_search_query,
+    format_alias_search_query,
+    get_watchlist_aliases,
+    calculate_hit_relevance,
+    canonicalize_url,
+    minhash_signature,
+    estimate_similarity,
+    deduplicate_search_results,
+    estimate_snippet_age_days,
+    score_search_results,
+    rank_search_results,
     WATCHLIST_DATA
 )
 
@@ -190,6 +203,17 @@ class TestCheckWatchlist:
         result_low = check_watchlist("Vlad Petrov", similarity_threshold=0.5)
         # Lower threshold should find at least as many matches
         assert len(result_low["matches"]) >= len(result_high["matches"])
+    
+    def test_batch_matches_single_checks(self):
+        """Test batch checks return the same results as single checks at any threshold."""
+        names = ["Vladimir Petrov", "Vlad Petrov", "John Smith", "Maria Garcia", "Petrov"]
+        for threshold in (0.85, 0.6, 0.3):
+            batch = check_watchlist_batch(names, similarity_threshold=threshold)
+            assert batch == [check_watchlist(name, similarity_threshold=threshold) for name in names]
+    
+    def test_batch_empty(self):
+        """Test an empty batch returns no results."""
+        assert check_watchlist_batch([]) == []
 
 
 class TestFormatSearchQuery:
@@ -228,3 +252,255 @@ class TestFormatSearchQuery:
         query = format_search_query("O'Brien", "adverse_media")
         assert "O'Brien" in query or "obrien" in query.lower()
 
+
+
+class TestFormatCombinedSearchQuery:
+    """Test combined OR query construction."""
+    
+    def test_combines_template_terms(self):
+        """Test combined query contains the terms of all default templates."""
+        query = format_combined_search_query("John Smith")
+        assert query.startswith('"John Smith" (')
+        for term in ["fraud", "sanctions", "financial crime", "scam", "embezzlement", "OFAC", "blacklist"]:
+            assert term in query
+    
+    def test_terms_not_duplicated(self):
+        """Test terms shared between templates appear once."""
+        query = format_combined_search_query("John Smith")
+        assert query.count("fraud") == 1
+        assert query.count("sanctions") == 1
+    
+    def test_custom_query_types(self):
+        """Test combining a custom set of query types."""
+        query = format_combined_search_query("John Smith", ["general"])
+        assert query == '"John Smith" (news OR investigation OR charges)'
+
+
+class TestFormatAliasSearchQuery:
+    """Test the name-variant OR query and the alias lookup."""
+    
+    def test_names_ored(self):
+        """Test every name is quoted and OR'ed before the combined terms."""
+        query = format_alias_search_query(["Vladimir Petrov", "Vlad Petrov"], ["general"])
+        assert query == '("Vladimir Petrov" OR "Vlad Petrov") (news OR investigation OR charges)'
+    
+    def test_watchlist_aliases(self):
+        """Test aliases are looked up per watchlist entry."""
+        assert get_watchlist_aliases("OFAC", "Vladimir Petrov") == ["Vlad Petrov", "V. Petrov", "Vladimir P. Petrov"]
+        assert get_watchlist_aliases("OFAC", "Nobody") == []
+        assert get_watchlist_aliases("Unknown", "Vladimir Petrov") == []
+
+
+class TestCalculateHitRelevance:
+    """Test search hit relevance scoring."""
+    
+    def test_name_and_keywords(self):
+        """Test hit with name and several risk keywords scores high."""
+        hit = {"title": "John Smith charged with fraud", "snippet": "Money laundering investigation"}
+        assert calculate_hit_relevance("John Smith", hit) == 1.0
+    
+    def test_name_only(self):
+        """Test hit with name but no risk keywords scores 0.5."""
+        hit = {"title": "News article about John Smith", "snippet": "Recent coverage of financial activities."}
+        assert calculate_hit_relevance("John Smith", hit) == 0.5
+    
+    def test_keywords_without_name(self):
+        """Test risk keywords without the customer name stay below the name weight."""
+        hit = {"title": "Fraud scandal", "snippet": "Sanctions and embezzlement"}
+        assert calculate_hit_relevance("John Smith", hit) == 0.5
+    
+    def test_empty_hit(self):
+        """Test empty hit scores zero."""
+        assert calculate_hit_relevance("John Smith", {}) == 0.0
+
+
+class TestCanonicalizeUrl:
+    """Test link canonicalization."""
+    
+    def test_scheme_www_and_trailing_slash(self):
+        """Test scheme, www prefix and trailing slash are ignored."""
+        assert canonicalize_url("https://www.example.com/news/story/") == "example.com/news/story"
+        assert canonicalize_url("http://example.com/news/story") == "example.com/news/story"
+    
+    def test_tracking_params_removed(self):
+        """Test utm_* and click ID parameters are removed, others kept."""
+        url = "https://example.com/story?utm_source=twitter&id=7&fbclid=abc#comments"
+        assert canonicalize_url(url) == "example.com/story?id=7"
+    
+    def test_amp_variants(self):
+        """Test AMP URLs map to the canonical article."""
+        expected = "example.com/news/story"
+        assert canonicalize_url("https://amp.example.com/news/story") == expected
+        assert canonicalize_url("https://example.com/news/story/amp/") == expected
+        assert canonicalize_url("https://example.com/news/story?amp=1") == expected
+        assert canonicalize_url("https://example.com/news/story.amp.html") == "example.com/news/story.html"
+    
+    def test_empty_url(self):
+        """Test empty link canonicalizes to empty string."""
+        assert canonicalize_url("") == ""
+
+
+class TestMinhash:
+    """Test MinHash near-duplicate estimation."""
+    
+    def test_identical_text(self):
+        """Test identical texts have similarity 1.0."""
+        signature = minhash_signature("John Smith charged with fraud")
+        assert estimate_similarity(signature, signature) == 1.0
+    
+    def test_near_duplicate_text(self):
+        """Test the same snippet with a date prefix scores high."""
+        a = minhash_signature("John Smith, former CEO of Acme Corp, was charged with securities fraud on Tuesday.")
+        b = minhash_signature("Jan 5, 2024 ... John Smith, former CEO of Acme Corp, was charged with securities fraud on Tuesday.")
+        assert estimate_similarity(a, b) >= 0.6
+    
+    def test_different_text(self):
+        """Test unrelated snippets score low."""
+        a = minhash_signature("John Smith, former CEO of Acme Corp, was charged with securities fraud on Tuesday.")
+        b = minhash_signature("The Treasury added a shipping company to the SDN list for sanctions evasion.")
+        assert estimate_similarity(a, b) < 0.3
+    
+    def test_empty_text(self):
+        """Test empty text never matches."""
+        assert estimate_similarity(minhash_signature(""), minhash_signature("")) == 0.0
+
+
+class TestDeduplicateSearchResults:
+    """Test cross-query deduplication."""
+    
+    def test_same_link_merged_with_queries(self):
+        """Test results with equivalent links are merged and annotated with both queries."""
+        results = [
+            {"title": "Story", "snippet": "Short", "link": "https://example.com/a?utm_medium=x", "query": "q1"},
+            {"title": "Story", "snippet": "Longer snippet", "link": "http://www.example.com/a/", "query": "q2"},
+        ]
+        deduped, stats = deduplicate_search_results(results)
+        assert len(deduped) == 1
+        assert deduped[0]["queries"] == ["q1", "q2"]
+        assert deduped[0]["snippet"] == "Longer snippet"
+        assert "query" not in deduped[0]
+        assert stats["duplicates_removed"] == 1
+        assert stats["prompt_chars_after"] < stats["prompt_chars_before"]
+    
+    def test_near_duplicate_snippets_merged(self):
+        """Test syndicated copies of the same article on different sites are merged."""
+        snippet = "John Smith, former CEO of Acme Corp, was charged with securities fraud on Tuesday."
+        results = [
+            {"title": "John Smith charged", "snippet": snippet, "link": "https://news-a.com/1", "query": "q1"},
+            {"title": "John Smith charged", "snippet": "Jan 5, 2024 ... " + snippet, "link": "https://news-b.com/2", "query": "q2"},
+        ]
+        deduped, _ = deduplicate_search_results(results)
+        assert len(deduped) == 1
+        assert deduped[0]["queries"] == ["q1", "q2"]
+        assert deduped[0]["snippet"] == snippet
+    
+    def test_contradictory_titles_kept(self):
+        """Test ~20-word results differing in one verdict word are not merged."""
+        snippet = "former CEO of Acme Corp in the securities fraud case brought by state prosecutors on Tuesday in Boston"
+        results = [
+            {"title": "John Smith charged", "snippet": "Jury hears John Smith charged, " + snippet, "link": "https://news-a.com/1"},
+            {"title": "John Smith acquitted", "snippet": "Jury hears John Smith acquitted, " + snippet, "link": "https://news-b.com/2"},
+        ]
+        deduped, stats = deduplicate_search_results(results)
+        assert [result["title"] for result in deduped] == ["John Smith charged", "John Smith acquitted"]
+        assert deduped[0]["snippet"].startswith("Jury hears John Smith charged")
+        assert stats["duplicates_removed"] == 0
+    
+    def test_short_contradictory_titles_kept(self):
+        """Test short results one word apart are not merged, however similar."""
+        results = [
+            {"title": "John Smith charged", "snippet": "Acme CEO fraud case", "link": "https://news-a.com/1"},
+            {"title": "John Smith acquitted", "snippet": "Acme CEO fraud case", "link": "https://news-b.com/2"},
+        ]
+        deduped, stats = deduplicate_search_results(results, similarity_threshold=0.5)
+        assert [result["title"] for result in deduped] == ["John Smith charged", "John Smith acquitted"]
+        assert stats["duplicates_removed"] == 0
+    
+    def test_short_identical_texts_merged(self):
+        """Test short results with the same words on different sites are still merged."""
+        results = [
+            {"title": "John Smith charged", "snippet": "Acme CEO fraud case", "link": "https://news-a.com/1"},
+            {"title": "John Smith Charged", "snippet": "Acme CEO fraud case.", "link": "https://news-b.com/2"},
+        ]
+        deduped, _ = deduplicate_search_results(results)
+        assert len(deduped) == 1
+    
+    def test_min_words(self):
+        """Test similarity matching applies to texts with at least min_words distinct words."""
+        results = [
+            {"title": "John Smith charged", "snippet": "Acme CEO fraud case", "link": "https://news-a.com/1"},
+            {"title": "John Smith charged", "snippet": "Acme CEO fraud case Tuesday", "link": "https://news-b.com/2"},
+        ]
+        assert len(deduplicate_search_results(results)[0]) == 2
+        assert len(deduplicate_search_results(results, min_words=5)[0]) == 1
+    
+    def test_distinct_results_kept(self, sample_search_results):
+        """Test distinct results are all kept."""
+        deduped, stats = deduplicate_search_results(sample_search_results)
+        assert len(deduped) == len(sample_search_results)
+        assert stats["duplicates_removed"] == 0
+        assert deduped[0]["queries"] == []
+
+
+class TestEstimateSnippetAgeDays:
+    """Test snippet date extraction."""
+    
+    TODAY = date(2024, 6, 1)
+    
+    def test_relative_age(self):
+        """Test Google's "N days ago" prefix."""
+        assert estimate_snippet_age_days("3 days ago ... John Smith", self.TODAY) == 3
+        assert estimate_snippet_age_days("2 weeks ago ... John Smith", self.TODAY) == 14
+    
+    def test_month_day_year(self):
+        """Test "Mon D, YYYY" dates."""
+        assert estimate_snippet_age_days("May 22, 2024 ... John Smith", self.TODAY) == 10
+    
+    def test_day_month_year(self):
+        """Test "D Month YYYY" dates."""
+        assert estimate_snippet_age_days("Published 1 June 2023", self.TODAY) == 366
+    
+    def test_bare_year(self):
+        """Test a bare year is taken as mid-year."""
+        assert estimate_snippet_age_days("In 2020 the company", self.TODAY) == (self.TODAY - date(2020, 7, 1)).days
+    
+    def test_undated(self):
+        """Test text without dates returns None."""
+        assert estimate_snippet_age_days("John Smith joins board", self.TODAY) is None
+
+
+class TestRankSearchResults:
+    """Test relevance scoring and ranking of search hits."""
+    
+    TODAY = date(2024, 6, 1)
+    RESULTS = [
+        {"title": "Weather today", "snippet": "Sunny with light wind", "link": "https://a.com"},
+        {"title": "John Smith charged with fraud", "snippet": "May 30, 2024 ... money laundering probe", "link": "https://b.com"},
+        {"title": "John Smith fraud case", "snippet": "Jan 5, 2015 ... embezzlement and bribery", "link": "https://c.com"},
+    ]
+    
+    def test_scores_aligned_with_results(self):
+        """Test one score per result, irrelevant hit lowest."""
+        scores = score_search_results("John Smith", self.RESULTS, self.TODAY)
+        assert len(scores) == 3
+        assert scores[0] < scores[2] < scores[1]
+    
+    def test_rank_orders_by_score(self):
+        """Test ranking puts recent, name-matching adverse hits first."""
+        ranked = rank_search_results("John Smith", self.RESULTS, today=self.TODAY)
+        assert [result["link"] for result in ranked] == ["https://b.com", "https://c.com", "https://a.com"]
+        assert ranked[0]["relevance"] > ranked[-1]["relevance"]
+        assert "relevance" not in self.RESULTS[0]
+    
+    def test_top_n(self):
+        """Test only top_n results are forwarded."""
+        assert len(rank_search_results("John Smith", self.RESULTS, top_n=1, today=self.TODAY)) == 1
+    
+    def test_token_budget(self):
+        """Test the token budget limits results but keeps the best one."""
+        ranked = rank_search_results("John Smith", self.RESULTS, token_budget=1, today=self.TODAY)
+        assert [result["link"] for result in ranked] == ["https://b.com"]
+    
+    def test_empty_results(self):
+        """Test ranking no results."""
+        assert rank_search_results("John Smith", []) == []
@@ -5,9 +5,14 @@ This module contains custom tools that agents can use, including
 the watchlist checking tool with fuzzy matching and alias support.
 """
 
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 import json
+import math
+import re
+import hashlib
+from datetime import date
 from difflib import SequenceMatcher
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
 
 
 # Realistic sample watchlist data (fictional but realistic)
@@ -261,6 +266,77 @@ def check_watchlist(customer_name: str, similarity_threshold: float = 0.85) -> D
     return result
 
 
+def check_watchlist_batch(customer_names: List[str], similarity_threshold: float = 0.85) -> List[Dict]:
+    """
+    Check many customer names against the watchlists in one pass.
+    
+    Returns exactly what check_watchlist() returns for each name, but every
+    watchlist name and alias is normalized once per batch and keeps its own
+    SequenceMatcher, so the matcher's index of the watchlist side is built
+    once instead of once per customer, and candidates whose quick upper
+    bounds are below the threshold skip the full ratio() computation.
+    
+    Args:
+        customer_names: Names to check
+        similarity_threshold: Minimum similarity score for a match (0.0-1.0, default 0.85)
+        
+    Returns:
+        One result dictionary per name, in order (see check_watchlist)
+    """
+    watchlists_checked = list(WATCHLIST_DATA.keys())
+    
+    # Index: per entry, the main name first and then the aliases, as in check_name_match
+    index = []
+    for watchlist_name, entries in WATCHLIST_DATA.items():
+        for entry in entries:
+            candidates = []
+            for candidate in [entry["name"]] + entry.get("aliases", []):
+                normalized = normalize_name(candidate)
+                matcher = SequenceMatcher(None, "", normalized)
+                candidates.append((normalized, matcher))
+            index.append((watchlist_name, entry, candidates))
+    
+    results = []
+    for customer_name in customer_names:
+        if not customer_name or not customer_name.strip():
+            results.append({"matched": False, "watchlists_checked": list(watchlists_checked), "matches": []})
+            continue
+        
+        customer_norm = normalize_name(customer_name)
+        matches = []
+        for watchlist_name, entry, candidates in index:
+            for candidate_norm, matcher in candidates:
+                if customer_norm == candidate_norm:
+                    similarity = 1.0
+                elif customer_norm in candidate_norm or candidate_norm in customer_norm:
+                    matcher.set_seq1(customer_norm)
+                    similarity = max(matcher.ratio(), 0.85)
+                else:
+                    matcher.set_seq1(customer_norm)
+                    # Cheap upper bounds of ratio() rule out most candidates
+                    if matcher.real_quick_ratio() < similarity_threshold or matcher.quick_ratio() < similarity_threshold:
+                        continue
+                    similarity = matcher.ratio()
+                if similarity >= similarity_threshold:
+                    matches.append({
+                        "watchlist": watchlist_name,
+                        "name": entry["name"],
+                        "similarity": round(similarity, 3),
+                        "reason": entry.get("reason", "Not specified"),
+                        "date_added": entry.get("date_added", "Unknown"),
+                        "country": entry.get("country", "Unknown")
+                    })
+                    break
+        
+        results.append({
+            "matched": len(matches) > 0,
+            "watchlists_checked": list(watchlists_checked),
+            "matches": matches
+        })
+    
+    return results
+
+
 def format_search_query(customer_name: str, query_type: str = "adverse_media") -> str:
     """
     Helper function to format search queries for adverse media searches.
@@ -281,3 +357,498 @@ def format_search_query(customer_name: str, query_type: str = "adverse_media") -
     
     return query_templates.get(query_type, query_templates["adverse_media"])
 
+
+
+def format_alias_search_query(names: List[str], query_types: List[str] = None) -> str:
+    """
+    Build one combined OR query over several spellings of a name.
+    
+    Args:
+        names: Name variants to search for (e.g. a watchlist name and its aliases)
+        query_types: Query types whose terms should be combined
+                     (see format_combined_search_query)
+        
+    Returns:
+        Search query string, e.g. '("Vladimir Petrov" OR "Vlad Petrov") (sanctions OR ...)'
+    """
+    combined_query = format_combined_search_query(names[0], query_types)
+    # Drop the '"<name>" ' prefix of the combined query, keep its terms
+    terms = combined_query[len(names[0]) + 3:]
+    return "(" + " OR ".join(f'"{name}"' for name in names) + ") " + terms
+
+
+def get_watchlist_aliases(watchlist: str, name: str) -> List[str]:
+    """
+    Look up the known aliases of a watchlist entry.
+    
+    Args:
+        watchlist: Watchlist name (e.g. "OFAC")
+        name: Listed name of the entry
+        
+    Returns:
+        The entry's aliases, or an empty list if the entry is unknown
+    """
+    for entry in WATCHLIST_DATA.get(watchlist, []):
+        if entry["name"] == name:
+            return list(entry.get("aliases", []))
+    return []
+
+
+# Keywords that indicate a search hit is about financial crime or sanctions
+RISK_KEYWORDS = [
+    "fraud", "scam", "embezzlement", "sanction", "ofac", "blacklist",
+    "money laundering", "laundering", "financial crime", "bribery",
+    "corruption", "terrorism", "indicted", "convicted", "charged",
+    "arrested", "investigation", "lawsuit", "penalty", "seized"
+]
+
+
+def format_combined_search_query(customer_name: str, query_types: List[str] = None) -> str:
+    """
+    Build a single OR query covering the terms of several query templates.
+    
+    The terms are taken from the format_search_query templates so the combined
+    query stays in sync with the narrower queries used for fan-out.
+    
+    Args:
+        customer_name: The customer name to search for
+        query_types: Query types whose terms should be combined
+                     (default: adverse_media, fraud, sanctions)
+        
+    Returns:
+        Combined search query string, e.g. '"John Smith" (fraud OR scam OR ...)'
+    """
+    if query_types is None:
+        query_types = ["adverse_media", "fraud", "sanctions"]
+    
+    prefix = f'"{customer_name}" '
+    terms = []
+    for query_type in query_types:
+        query = format_search_query(customer_name, query_type)
+        for term in query[len(prefix):].split(" OR "):
+            term = term.strip()
+            if term and term not in terms:
+                terms.append(term)
+    
+    return f'{prefix}({" OR ".join(terms)})'
+
+
+def search_failed(search_results: List[Dict]) -> bool:
+    """
+    Check whether a search fell back to simulated results after an API error.
+    
+    Simulated results also stand in when no search engine is configured;
+    only those are evidence of a clean search.
+    
+    Args:
+        search_results: Results from adverse media searches
+    
+    Returns:
+        True if any result is marked search_failed
+    """
+    return any(result.get("search_failed") for result in search_results)
+
+
+def calculate_hit_relevance(customer_name: str, hit: Dict[str, str]) -> float:
+    """
+    Score how relevant a search hit is to an adverse media investigation.
+    
+    Half of the score comes from the customer name appearing in the title or
+    snippet, the other half from risk keyword density (saturating at 3 keywords).
+    
+    Args:
+        customer_name: The customer name being investigated
+        hit: Search result with 'title' and 'snippet'
+        
+    Returns:
+        Relevance score between 0.0 and 1.0
+    """
+    text = normalize_name(f"{hit.get('title', '')} {hit.get('snippet', '')}")
+    name = normalize_name(customer_name)
+    
+    score = 0.5 if name and name in text else 0.0
+    score += 0.5 * min(count_risk_keywords(text), 3) / 3
+    
+    return round(score, 3)
+
+
+# One alternation over all keywords (longest first) so a text is scanned once
+_RISK_KEYWORD_PATTERN = re.compile(
+    "|".join(re.escape(keyword) for keyword in sorted(RISK_KEYWORDS, key=len, reverse=True))
+)
+
+
+def count_risk_keywords(text: str) -> int:
+    """
+    Count the distinct risk keywords in a normalized (lowercase) text.
+    
+    Args:
+        text: Text to scan, already lowercased
+        
+    Returns:
+        Number of distinct RISK_KEYWORDS found
+    """
+    return len(set(_RISK_KEYWORD_PATTERN.findall(text)))
+
+
+# Query parameters that only track where a click came from
+TRACKING_PARAMS = {
+    "fbclid", "gclid", "dclid", "msclkid", "mc_cid", "mc_eid", "igshid",
+    "ref", "ref_src", "referrer", "source", "cmpid", "ito", "ncid", "ocid",
+    "amp", "outputtype", "_ga", "_gl"
+}
+
+
+def canonicalize_url(url: str) -> str:
+    """
+    Canonicalize a link so different URLs for the same article compare equal.
+    
+    Drops the scheme, "www." and "amp." host prefixes, fragments, tracking
+    parameters (utm_* and common click IDs), AMP path variants and trailing
+    slashes. Remaining query parameters are sorted.
+    
+    Args:
+        url: Link to canonicalize
+        
+    Returns:
+        Canonical form of the link (e.g. "example.com/news/story?id=1")
+    """
+    if not url:
+        return ""
+    
+    parts = urlsplit(url.strip())
+    if not parts.netloc:
+        # No scheme given: treat the whole thing as host + path
+        parts = urlsplit(f"//{url.strip()}")
+    
+    host = parts.netloc.lower()
+    for prefix in ("www.", "amp.", "m."):
+        if host.startswith(prefix):
+            host = host[len(prefix):]
+    if host.endswith(":80") or host.endswith(":443"):
+        host = host.rsplit(":", 1)[0]
+    
+    path = parts.path
+    path = re.sub(r"/amp/?$", "", path)
+    path = re.sub(r"\.amp(\.html?)$", r"\1", path)
+    path = path.rstrip("/")
+    
+    query_params = sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.lower().startswith("utm_") and key.lower() not in TRACKING_PARAMS
+    )
+    
+    return urlunsplit(("", host, path, urlencode(query_params), "")).lstrip("/")
+
+
+# Parameters of the hash permutations used for MinHash signatures
+_MINHASH_PRIME = (1 << 61) - 1
+_MINHASH_PERMUTATIONS = [
+    (
+        int(hashlib.md5(f"a{i}".encode()).hexdigest()[:15], 16) | 1,
+        int(hashlib.md5(f"b{i}".encode()).hexdigest()[:15], 16)
+    )
+    for i in range(64)
+]
+
+
+def _words(text: str) -> set:
+    return set(re.findall(r"\w+", text.lower()))
+
+
+def minhash_signature(text: str) -> List[int]:
+    """
+    Compute a 64-value MinHash signature of the words in a text.
+    
+    The fraction of equal positions in two signatures estimates the Jaccard
+    similarity of the two word sets, so near-duplicate snippets (same article
+    with a date prefix, different ellipsis or source suffix) score high.
+    
+    Args:
+        text: Text to fingerprint
+        
+    Returns:
+        List of 64 integers (empty list for text without words)
+    """
+    tokens = _words(text)
+    if not tokens:
+        return []
+    
+    token_hashes = [int(hashlib.md5(token.encode("utf-8")).hexdigest()[:15], 16) for token in tokens]
+    return [
+        min((a * token_hash + b) % _MINHASH_PRIME for token_hash in token_hashes)
+        for a, b in _MINHASH_PERMUTATIONS
+    ]
+
+
+def estimate_similarity(signature1: List[int], signature2: List[int]) -> float:
+    """
+    Estimate the Jaccard similarity of two texts from their MinHash signatures.
+    
+    Args:
+        signature1: First signature
+        signature2: Second signature
+        
+    Returns:
+        Estimated similarity between 0.0 and 1.0
+    """
+    if not signature1 or not signature2:
+        return 0.0
+    return sum(1 for x, y in zip(signature1, signature2) if x == y) / len(signature1)
+
+
+def deduplicate_search_results(
+    results: List[Dict[str, str]],
+    similarity_threshold: float = 0.8,
+    min_words: int = 8
+) -> Tuple[List[Dict], Dict]:
+    """
+    Merge duplicate search results returned by different queries.
+    
+    Two results are duplicates when their canonical links are equal, or when
+    their titles are identical (ignoring case and punctuation) and the MinHash
+    estimate of their title+snippet similarity reaches the threshold. One word
+    can reverse the story ("charged" / "acquitted") while the similarity stays
+    high, so text similarity alone never merges results with different titles,
+    and a result with fewer than min_words distinct words is only a
+    near-duplicate of one with the same words. The first occurrence is kept
+    and annotated with every query that produced it in a 'queries' list; it
+    takes the longer snippet only from a result with the same link, so title
+    and snippet always come from the same article.
+    
+    Args:
+        results: Search results, optionally carrying the producing 'query'
+        similarity_threshold: Minimum estimated similarity for near-duplicate snippets
+        min_words: Fewest distinct title+snippet words for similarity matching
+        
+    Returns:
+        Tuple of (deduplicated_results, stats) where stats contains:
+        - input_results / output_results / duplicates_removed: int
+        - prompt_chars_before / prompt_chars_after: int - Size of the
+          "- title: snippet" lines these results contribute to the analysis prompt
+    """
+    merged: List[Dict] = []
+    canonical_links: List[str] = []
+    titles: List[str] = []
+    word_sets: List[set] = []
+    signatures: List[List[int]] = []
+    
+    def near_duplicate(words: set, signature: List[int], other_words: set, other_signature: List[int]) -> bool:
+        if len(words) < min_words or len(other_words) < min_words:
+            return bool(words) and words == other_words
+        return estimate_similarity(signature, other_signature) >= similarity_threshold
+    
+    for result in results:
+        link = canonicalize_url(result.get("link", ""))
+        title = " ".join(re.findall(r"\w+", result.get("title", "").lower()))
+        text = f"{result.get('title', '')} {result.get('snippet', '')}"
+        words = _words(text)
+        signature = minhash_signature(text)
+        query = result.get("query")
+        
+        duplicate_index = None
+        same_link = False
+        for index, (other_link, other_title, other_words, other_signature) in enumerate(
+            zip(canonical_links, titles, word_sets, signatures)
+        ):
+            same_link = bool(link) and link == other_link
+            if same_link or (
+                title == other_title and near_duplicate(words, signature, other_words, other_signature)
+            ):
+                duplicate_index = index
+                break
+        
+        if duplicate_index is None:
+            entry = {key: value for key, value in result.items() if key != "query"}
+            entry["queries"] = [query] if query else []
+            merged.append(entry)
+            canonical_links.append(link)
+            titles.append(title)
+            word_sets.append(words)
+            signatures.append(signature)
+            continue
+        
+        entry = merged[duplicate_index]
+        if query and query not in entry["queries"]:
+            entry["queries"].append(query)
+        if same_link and len(result.get("snippet", "")) > len(entry.get("snippet", "")):
+            entry["snippet"] = result["snippet"]
+    
+    def prompt_chars(items: List[Dict]) -> int:
+        return sum(len(f"- {item.get('title', 'N/A')}: {item.get('snippet', 'N/A')}\n") for item in items)
+    
+    stats = {
+        "input_results": len(results),
+        "output_results": len(merged),
+        "duplicates_removed": len(results) - len(merged),
+        "prompt_chars_before": prompt_chars(results),
+        "prompt_chars_after": prompt_chars(merged)
+    }
+    return merged, stats
+
+
+_MONTHS = {
+    month: index + 1 for index, month in enumerate(
+        ["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"]
+    )
+}
+_RELATIVE_AGE_PATTERN = re.compile(r"\b(\d+)\s+(minute|hour|day|week|month|year)s?\s+ago\b", re.IGNORECASE)
+_MONTH_DAY_YEAR_PATTERN = re.compile(r"\b([a-z]{3})[a-z]*\.?\s+(\d{1,2}),\s+(\d{4})\b", re.IGNORECASE)
+_DAY_MONTH_YEAR_PATTERN = re.compile(r"\b(\d{1,2})\s+([a-z]{3})[a-z]*\.?\s+(\d{4})\b", re.IGNORECASE)
+_YEAR_PATTERN = re.compile(r"\b(19[5-9]\d|20\d{2})\b")
+_UNIT_DAYS = {"minute": 1 / 1440, "hour": 1 / 24, "day": 1, "week": 7, "month": 30, "year": 365}
+
+
+def estimate_snippet_age_days(text: str, today: Optional[date] = None) -> Optional[float]:
+    """
+    Estimate how old a search hit is from dates in its snippet.
+    
+    Recognizes Google's relative prefixes ("3 days ago"), "Jan 5, 2024",
+    "5 Jan 2024" and, as a last resort, a bare year (taken as mid-year).
+    
+    Args:
+        text: Title and/or snippet text
+        today: Reference date (default: today)
+        
+    Returns:
+        Age in days, or None if the text carries no recognizable date
+    """
+    today = today or date.today()
+    
+    relative = _RELATIVE_AGE_PATTERN.search(text)
+    if relative:
+        return int(relative.group(1)) * _UNIT_DAYS[relative.group(2).lower()]
+    
+    for pattern, month_group, day_group in (
+        (_MONTH_DAY_YEAR_PATTERN, 1, 2),
+        (_DAY_MONTH_YEAR_PATTERN, 2, 1),
+    ):
+        for match in pattern.finditer(text):
+            month = _MONTHS.get(match.group(month_group).lower())
+            if not month:
+                continue
+            try:
+                published = date(int(match.group(3)), month, int(match.group(day_group)))
+            except ValueError:
+                continue
+            return max(0.0, float((today - published).days))
+    
+    years = [int(year) for year in _YEAR_PATTERN.findall(text) if int(year) <= today.year]
+    if years:
+        return max(0.0, float((today - date(max(years), 7, 1)).days))
+    
+    return None
+
+
+def score_search_results(
+    customer_name: str,
+    results: List[Dict[str, str]],
+    today: Optional[date] = None
+) -> List[float]:
+    """
+    Score all search results against the customer in a single pass.
+    
+    Each score combines exact-name presence (0.4), risk keyword density
+    (0.4, saturating at 3 distinct keywords) and recency (0.2, decaying with
+    a one-year time constant; undated hits get a neutral 0.25).
+    
+    Args:
+        customer_name: The customer name being investigated
+        results: Search results with 'title' and 'snippet'
+        today: Reference date for recency (default: today)
+        
+    Returns:
+        List of scores between 0.0 and 1.0, aligned with results
+    """
+    today = today or date.today()
+    name = normalize_name(customer_name)
+    
+    scores = []
+    for result in results:
+        raw_text = f"{result.get('title', '')} {result.get('snippet', '')}"
+        text = normalize_name(raw_text)
+        
+        name_score = 1.0 if name and name in text else 0.0
+        keyword_score = min(count_risk_keywords(text), 3) / 3
+        age_days = estimate_snippet_age_days(raw_text, today)
+        recency_score = 0.25 if age_days is None else math.exp(-age_days / 365)
+        
+        scores.append(round(0.4 * name_score + 0.4 * keyword_score + 0.2 * recency_score, 3))
+    return scores
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Roughly estimate the LLM token count of a text (about 4 characters per token).
+    
+    Args:
+        text: Text to measure
+        
+    Returns:
+        Estimated token count
+    """
+    return (len(text) + 3) // 4
+
+
+def response_token_counts(prompt: str, response: object) -> Tuple[int, int]:
+    """
+    Get the input and output token counts of a Gemini call.
+    
+    Counts come from the response's usage_metadata when available and are
+    estimated from the text otherwise (e.g. replayed responses).
+    
+    Args:
+        prompt: Prompt sent to the model
+        response: Model response
+        
+    Returns:
+        Tuple of (input_tokens, output_tokens)
+    """
+    usage = getattr(response, "usage_metadata", None)
+    input_tokens = getattr(usage, "prompt_token_count", None)
+    output_tokens = getattr(usage, "candidates_token_count", None)
+    if not isinstance(input_tokens, int):
+        input_tokens = estimate_tokens(prompt)
+    if not isinstance(output_tokens, int):
+        output_tokens = estimate_tokens(getattr(response, "text", "") or "")
+    return input_tokens, output_tokens
+
+
+def rank_search_results(
+    customer_name: str,
+    results: List[Dict[str, str]],
+    top_n: int = 10,
+    token_budget: Optional[int] = None,
+    today: Optional[date] = None
+) -> List[Dict]:
+    """
+    Select the most relevant search results for the analysis prompt.
+    
+    Results are ordered by score_search_results() (ties keep arrival order)
+    and taken until top_n results are selected or the next result's
+    "- title: snippet" line would exceed the token budget. The best result
+    is always kept.
+    
+    Args:
+        customer_name: The customer name being investigated
+        results: Search results with 'title', 'snippet' and 'link'
+        top_n: Maximum number of results to forward
+        token_budget: Maximum estimated tokens for the forwarded lines (None = no limit)
+        today: Reference date for recency (default: today)
+        
+    Returns:
+        Copies of the selected results, best first, each with a 'relevance' score
+    """
+    scores = score_search_results(customer_name, results, today)
+    order = sorted(range(len(results)), key=lambda index: -scores[index])
+    
+    selected = []
+    tokens_used = 0
+    for index in order[:top_n]:
+        result = results[index]
+        tokens = estimate_tokens(f"- {result.get('title', 'N/A')}: {result.get('snippet', 'N/A')}\n")
+        if selected and token_budget is not None and tokens_used + tokens > token_budget:
+            break
+        selected.append({**result, "relevance": scores[index]})
+        tokens_used += tokens
+    return selected